@@ -0,0 +1,149 @@
+"""
+Registry dùng chung cho các agent
+- Các hàm create_* dựng agent mới mỗi lần gọi (build_agent); muốn dùng chung một bản
+  theo tên thì gọi get_agent (dựng ở lần dùng đầu tiên rồi dùng lại)
+- Instruction và JSON schema chỉ render một lần
+- Tool được tra theo tên và import lười, mọi agent dùng chung cùng một đối tượng tool
+  (tool y tế dùng chung một kho dữ liệu của yte_tool)
+- google.adk, schemas.* và tools.* chỉ được import khi một agent được dựng lần đầu
+"""
+import functools
+import importlib
+import json
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+MODEL_NAME = "gemini-2.0-flash"
+
+# Tool theo tên -> 'module:thuộc tính'
+TOOL_PATHS = {
+    'get_capital_city': 'tools.capital_tools:get_capital_city',
+    'analyze_medical_data': 'tools.medical_tools:analyze_medical_data',
+    'get_data_statistics': 'tools.medical_tools:get_data_statistics',
+    'yte': 'yte_tool:yte_async',
+    'yte_result': 'yte_tool:yte_result_async',
+    'yte_info': 'yte_tool:yte_info_async',
+    'yte_query': 'yte_tool:yte_query_async',
+    'get_weather': 'city_tool:get_weather',
+    'get_current_time': 'city_tool:get_current_time',
+}
+SCHEMA_MODULE = 'schemas.base_schemas'
+
+# Module khai báo từng agent, import khi agent được yêu cầu lần đầu
+AGENT_MODULES = {
+    'capital_agent_tool': 'agents.capital_agent',
+    'medical_data_agent': 'agents.medical_agent',
+    'structured_info_agent_schema': 'agents.structured_agent',
+}
+
+
+class AgentSpec(NamedTuple):
+    """Mô tả một agent; tool và schema ghi theo tên để chưa phải import gì"""
+    name: str
+    description: str
+    # Chuỗi, hoặc hàm trả về chuỗi (vd. cần chèn JSON schema) - chỉ gọi một lần
+    instruction: Union[str, Callable[[], str]]
+    tools: Tuple[str, ...] = ()
+    input_schema: Optional[str] = None
+    output_schema: Optional[str] = None
+    output_key: Optional[str] = None
+    model: str = MODEL_NAME
+
+
+_specs: Dict[str, AgentSpec] = {}
+_agents: Dict[str, Any] = {}
+_lock = threading.RLock()
+
+
+def register(spec: AgentSpec) -> AgentSpec:
+    """Khai báo agent (không dựng gì); khai báo lại thì bỏ bản đã dựng"""
+    with _lock:
+        _specs[spec.name] = spec
+        _agents.pop(spec.name, None)
+        render_instruction.cache_clear()
+    return spec
+
+
+def registered_agents() -> List[str]:
+    """Tên các agent đã khai báo hoặc biết module khai báo"""
+    return sorted(set(_specs) | set(AGENT_MODULES))
+
+
+@functools.lru_cache(maxsize=None)
+def resolve(path: str) -> Any:
+    """Đối tượng tại 'module:thuộc tính', import ở lần gọi đầu tiên"""
+    module, _, attribute = path.partition(':')
+    return getattr(importlib.import_module(module), attribute)
+
+
+def get_tool(name: str) -> Callable:
+    """Tool dùng chung theo tên (cùng một đối tượng cho mọi agent)"""
+    return resolve(TOOL_PATHS[name])
+
+
+def get_schema(name: str) -> type:
+    """Lớp pydantic trong schemas.base_schemas"""
+    return resolve(f"{SCHEMA_MODULE}:{name}")
+
+
+@functools.lru_cache(maxsize=None)
+def schema_json(name: str) -> str:
+    """JSON schema (đã định dạng) của một lớp schema, render một lần"""
+    return json.dumps(get_schema(name).model_json_schema(), indent=2)
+
+
+def get_spec(name: str) -> AgentSpec:
+    if name not in _specs and name in AGENT_MODULES:
+        importlib.import_module(AGENT_MODULES[name])
+    try:
+        return _specs[name]
+    except KeyError:
+        raise KeyError(f"Agent '{name}' chưa được khai báo. Có: {', '.join(registered_agents())}") from None
+
+
+@functools.lru_cache(maxsize=None)
+def render_instruction(name: str) -> str:
+    """Instruction của agent, render một lần"""
+    instruction = get_spec(name).instruction
+    return instruction() if callable(instruction) else instruction
+
+
+def build_agent(name: str):
+    """Dựng một LlmAgent mới (dùng instruction, schema và tool đã cache)
+
+    Các hàm create_* dùng hàm này; mỗi lần gọi là một bản riêng, vd. để gắn cùng một
+    agent làm sub-agent của nhiều agent cha.
+    """
+    from google.adk.agents import LlmAgent
+
+    spec = get_spec(name)
+    options = {}
+    if spec.input_schema:
+        options['input_schema'] = get_schema(spec.input_schema)
+    if spec.output_schema:
+        options['output_schema'] = get_schema(spec.output_schema)
+    if spec.output_key:
+        options['output_key'] = spec.output_key
+    if spec.tools:
+        options['tools'] = [get_tool(tool) for tool in spec.tools]
+    return LlmAgent(model=spec.model, name=spec.name, description=spec.description,
+                    instruction=render_instruction(name), **options)
+
+
+def get_agent(name: str):
+    """Agent dùng chung theo tên (tùy chọn), dựng ở lần gọi đầu tiên (an toàn khi gọi đồng thời)"""
+    agent = _agents.get(name)
+    if agent is None:
+        with _lock:
+            agent = _agents.get(name)
+            if agent is None:
+                agent = _agents[name] = build_agent(name)
+    return agent
+
+
+def warm_up(names: Optional[List[str]] = None) -> List[str]:
+    """Dựng trước các agent (vd. trong process cha trước khi fork), trả về tên đã dựng"""
+    names = names or registered_agents()
+    for name in names:
+        get_agent(name)
+    return names
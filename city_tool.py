@@ -0,0 +1,290 @@
+"""
+Tool thời tiết & thời gian theo thành phố
+- Chỉ mục thành phố -> múi giờ offline (multi_tool_agent/cities.csv), tra không phân biệt dấu
+- ZoneInfo được cache theo múi giờ, thời tiết được cache có TTL trước nguồn thời tiết
+- Nguồn thời tiết thay được (set_weather_provider); mặc định là nguồn cố định cục bộ
+"""
+
+import abc
+import argparse
+import csv
+import datetime
+import functools
+import os
+import threading
+from typing import Dict, List, Any, NamedTuple, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from yte_common import ReportCache, fold_text
+from yte_telemetry import traced
+
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Bảng thành phố: key (tên đã bỏ dấu, sắp xếp tăng dần), name, timezone, country
+CITY_CSV_PATH = os.environ.get('YTE_CITIES_PATH', os.path.join(_MODULE_DIR, 'multi_tool_agent', 'cities.csv'))
+CITY_CSV_HEADER = ['key', 'name', 'timezone', 'country']
+
+# Cache thời tiết: số thành phố tối đa và thời gian sống của một kết quả (giây)
+WEATHER_CACHE_SIZE = int(os.environ.get('YTE_WEATHER_CACHE_SIZE', '1024'))
+WEATHER_TTL = float(os.environ.get('YTE_WEATHER_TTL', '600'))
+
+# Nguồn tz database dùng để dựng lại cities.csv (python city_tool.py build)
+ZONE_TAB_PATH = '/usr/share/zoneinfo/zone.tab'
+ISO3166_TAB_PATH = '/usr/share/zoneinfo/iso3166.tab'
+
+# Tên gọi khác / thành phố lớn không có múi giờ riêng trong tz database: (tên, múi giờ)
+CITY_ALIASES = [
+    ('Hà Nội', 'Asia/Ho_Chi_Minh'), ('Hanoi', 'Asia/Ho_Chi_Minh'), ('Sài Gòn', 'Asia/Ho_Chi_Minh'),
+    ('Saigon', 'Asia/Ho_Chi_Minh'), ('TP Hồ Chí Minh', 'Asia/Ho_Chi_Minh'), ('Đà Nẵng', 'Asia/Ho_Chi_Minh'),
+    ('Huế', 'Asia/Ho_Chi_Minh'), ('Hải Phòng', 'Asia/Ho_Chi_Minh'), ('Cần Thơ', 'Asia/Ho_Chi_Minh'),
+    ('Nha Trang', 'Asia/Ho_Chi_Minh'),
+    ('NYC', 'America/New_York'), ('New York City', 'America/New_York'), ('Washington', 'America/New_York'),
+    ('Boston', 'America/New_York'), ('Philadelphia', 'America/New_York'), ('Atlanta', 'America/New_York'),
+    ('Miami', 'America/New_York'), ('Houston', 'America/Chicago'), ('Dallas', 'America/Chicago'),
+    ('Austin', 'America/Chicago'), ('San Francisco', 'America/Los_Angeles'), ('Seattle', 'America/Los_Angeles'),
+    ('San Diego', 'America/Los_Angeles'), ('Las Vegas', 'America/Los_Angeles'), ('Montreal', 'America/Toronto'),
+    ('Ottawa', 'America/Toronto'), ('Rio de Janeiro', 'America/Sao_Paulo'),
+    ('Beijing', 'Asia/Shanghai'), ('Bắc Kinh', 'Asia/Shanghai'), ('Thượng Hải', 'Asia/Shanghai'),
+    ('Osaka', 'Asia/Tokyo'), ('Kyoto', 'Asia/Tokyo'), ('Busan', 'Asia/Seoul'), ('Delhi', 'Asia/Kolkata'),
+    ('New Delhi', 'Asia/Kolkata'), ('Mumbai', 'Asia/Kolkata'), ('Bangalore', 'Asia/Kolkata'),
+    ('Munich', 'Europe/Berlin'), ('Frankfurt', 'Europe/Berlin'), ('Milan', 'Europe/Rome'),
+    ('Barcelona', 'Europe/Madrid'), ('Geneva', 'Europe/Zurich'), ('Manchester', 'Europe/London'),
+    ('Saint Petersburg', 'Europe/Moscow'), ('Canberra', 'Australia/Sydney'), ('Phnom Penh', 'Asia/Phnom_Penh'),
+]
+
+# Dữ liệu của nguồn thời tiết cố định (theo tên thành phố chuẩn)
+STUB_WEATHER = {
+    'New York': {'condition': 'sunny', 'temperature_c': 25},
+}
+
+
+class City(NamedTuple):
+    key: str
+    name: str
+    timezone: str
+    country: str
+
+
+class CityIndex:
+    """Chỉ mục thành phố dạng cột, tra bằng tìm kiếm nhị phân trên khóa đã bỏ dấu
+
+    - `keys`: mảng bytes (UTF-8) của tên đã bỏ dấu, sắp xếp tăng dần
+    - `timezones`/`countries`: mã hóa từ điển (int16 + danh sách nhãn), như cột văn bản của PatientStore
+    """
+
+    def __init__(self, keys: np.ndarray, names: List[str], zone_codes: np.ndarray, zones: List[str],
+                 country_codes: np.ndarray, countries: List[str]):
+        self.keys = keys
+        self.names = names
+        self.zone_codes = zone_codes
+        self.zones = zones
+        self.country_codes = country_codes
+        self.countries = countries
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def from_rows(cls, rows: List[List[str]]) -> "CityIndex":
+        """Dựng chỉ mục từ các dòng (key, name, timezone, country); sắp xếp nếu chưa sắp"""
+        if any(rows[i][0] > rows[i + 1][0] for i in range(len(rows) - 1)):
+            rows = sorted(rows, key=lambda row: row[0])
+        zones, zone_codes = np.unique([row[2] for row in rows], return_inverse=True)
+        countries, country_codes = np.unique([row[3] for row in rows], return_inverse=True)
+        return cls(np.array([row[0].encode('utf-8') for row in rows], dtype=bytes), [row[1] for row in rows],
+                   zone_codes.astype(np.int16), zones.tolist(), country_codes.astype(np.int16), countries.tolist())
+
+    def lookup(self, city: str) -> Optional[City]:
+        """Tìm thành phố theo tên (không phân biệt hoa thường, dấu và khoảng trắng thừa)"""
+        key = normalize_city(city)
+        encoded = key.encode('utf-8')
+        position = int(np.searchsorted(self.keys, encoded))
+        if position >= len(self.keys) or self.keys[position] != encoded:
+            return None
+        return City(key, self.names[position], self.zones[self.zone_codes[position]],
+                    self.countries[self.country_codes[position]])
+
+
+def normalize_city(city: str) -> str:
+    """Khóa tra cứu: chữ thường, bỏ dấu, '_'/'-' thành khoảng trắng, gộp khoảng trắng"""
+    return ' '.join(fold_text(city).replace('_', ' ').replace('-', ' ').split())
+
+
+def load_city_index(path: str = CITY_CSV_PATH) -> CityIndex:
+    """Load bảng thành phố (đã sắp xếp sẵn theo khóa nên không phải sắp lại)"""
+    with open(path, encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        if header != CITY_CSV_HEADER:
+            raise ValueError(f"Sai định dạng {os.path.basename(path)}: cần cột {', '.join(CITY_CSV_HEADER)}")
+        return CityIndex.from_rows(list(reader))
+
+
+_city_index: Optional[CityIndex] = None
+_city_lock = threading.Lock()
+
+
+def get_city_index() -> CityIndex:
+    """Chỉ mục thành phố, load ở lần gọi đầu tiên (an toàn khi gọi đồng thời)"""
+    global _city_index
+    if _city_index is None:
+        with _city_lock:
+            if _city_index is None:
+                _city_index = load_city_index()
+    return _city_index
+
+
+def find_city(city: str) -> Optional[City]:
+    return get_city_index().lookup(city)
+
+
+@functools.lru_cache(maxsize=None)
+def get_zone(timezone: str) -> ZoneInfo:
+    """ZoneInfo của múi giờ, mỗi múi giờ chỉ dựng một lần"""
+    return ZoneInfo(timezone)
+
+
+class WeatherProvider(abc.ABC):
+    """Nguồn thời tiết: current() trả về {'condition', 'temperature_c'} hoặc None nếu không có dữ liệu"""
+
+    @abc.abstractmethod
+    def current(self, city: City) -> Optional[Dict[str, Any]]:
+        """Thời tiết hiện tại của thành phố; lớp con bắt buộc cài đặt"""
+
+
+class StubWeatherProvider(WeatherProvider):
+    """Nguồn thời tiết cố định, không cần mạng (mặc định, dùng cho test)"""
+
+    def __init__(self, reports: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.reports = {normalize_city(name): report for name, report in (reports or STUB_WEATHER).items()}
+
+    def current(self, city: City) -> Optional[Dict[str, Any]]:
+        return self.reports.get(city.key)
+
+
+_weather_provider: WeatherProvider = StubWeatherProvider()
+_weather_cache = ReportCache(WEATHER_CACHE_SIZE, WEATHER_TTL)
+
+
+def set_weather_provider(provider: WeatherProvider):
+    """Đổi nguồn thời tiết (xóa cache của nguồn cũ)"""
+    global _weather_provider
+    _weather_provider = provider
+    _weather_cache.clear()
+
+
+def weather_cache_stats() -> Dict[str, Any]:
+    """Thống kê hit/miss của cache thời tiết"""
+    return _weather_cache.stats()
+
+
+def current_weather(city: City) -> Optional[Dict[str, Any]]:
+    """Thời tiết hiện tại của thành phố qua cache TTL"""
+    provider = _weather_provider
+    return _weather_cache.get_or_compute((id(provider), city.key), lambda: provider.current(city))
+
+
+@traced()
+def get_weather(city: str) -> dict:
+    """Retrieves the current weather report for a specified city.
+
+    Args:
+        city (str): The name of the city for which to retrieve the weather report.
+
+    Returns:
+        dict: status and result or error msg.
+    """
+    found = find_city(city)
+    weather = current_weather(found) if found is not None else None
+    if weather is None:
+        return {
+            "status": "error",
+            "error_message": f"Weather information for '{city}' is not available.",
+        }
+    celsius = weather['temperature_c']
+    return {
+        "status": "success",
+        "report": (
+            f"The weather in {found.name} is {weather['condition']} with a temperature of {celsius:g} degrees"
+            f" Celsius ({celsius * 9 / 5 + 32:g} degrees Fahrenheit)."
+        ),
+    }
+
+
+@traced()
+def get_current_time(city: str) -> dict:
+    """Returns the current time in a specified city.
+
+    Args:
+        city (str): The name of the city for which to retrieve the current time.
+
+    Returns:
+        dict: status and result or error msg.
+    """
+    found = find_city(city)
+    if found is None:
+        return {
+            "status": "error",
+            "error_message": (
+                f"Sorry, I don't have timezone information for {city}."
+            ),
+        }
+
+    now = datetime.datetime.now(get_zone(found.timezone))
+    report = (
+        f'The current time in {city} is {now.strftime("%Y-%m-%d %H:%M:%S %Z%z")}'
+    )
+    return {"status": "success", "report": report}
+
+
+def build_city_rows(zone_tab: str = ZONE_TAB_PATH, iso_tab: str = ISO3166_TAB_PATH,
+                    aliases=CITY_ALIASES) -> List[List[str]]:
+    """Bảng thành phố từ tz database (thành phố đại diện của mỗi múi giờ) + các tên gọi khác"""
+    with open(iso_tab, encoding='utf-8') as f:
+        country_names = dict(line.rstrip('\n').split('\t')[:2] for line in f if not line.startswith('#'))
+
+    rows: Dict[str, List[str]] = {}
+    zone_countries = {}
+    with open(zone_tab, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            country, _, timezone = line.rstrip('\n').split('\t')[:3]
+            zone_countries[timezone] = country_names.get(country, country)
+            name = timezone.rsplit('/', 1)[-1].replace('_', ' ')
+            rows.setdefault(normalize_city(name), [normalize_city(name), name, timezone, zone_countries[timezone]])
+    # Tên gọi khác ghi đè tên trùng từ tz database
+    for name, timezone in aliases:
+        rows[normalize_city(name)] = [normalize_city(name), name, timezone, zone_countries.get(timezone, '')]
+    return [rows[key] for key in sorted(rows)]
+
+
+def write_city_csv(rows: List[List[str]], path: str = CITY_CSV_PATH):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(CITY_CSV_HEADER)
+        writer.writerows(rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Tool thời tiết & thời gian theo thành phố")
+    commands = parser.add_subparsers(dest='command')
+    build_parser = commands.add_parser('build', help="Dựng lại bảng thành phố từ tz database của hệ thống")
+    build_parser.add_argument('--out', default=CITY_CSV_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        rows = build_city_rows()
+        write_city_csv(rows, args.out)
+        print(f"✅ Đã ghi {len(rows)} thành phố vào {args.out}")
+        return 0
+
+    print(get_current_time("New York"))
+    print(get_weather("New York"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
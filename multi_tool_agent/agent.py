@@ -1,62 +1,9 @@
-import datetime
-from zoneinfo import ZoneInfo
 from google.adk.agents import Agent
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from yte import yte, yte_info
-
-def get_weather(city: str) -> dict:
-    """Retrieves the current weather report for a specified city.
-
-    Args:
-        city (str): The name of the city for which to retrieve the weather report.
-
-    Returns:
-        dict: status and result or error msg.
-    """
-    if city.lower() == "new york":
-        return {
-            "status": "success",
-            "report": (
-                "The weather in New York is sunny with a temperature of 25 degrees"
-                " Celsius (77 degrees Fahrenheit)."
-            ),
-        }
-    else:
-        return {
-            "status": "error",
-            "error_message": f"Weather information for '{city}' is not available.",
-        }
-
-
-def get_current_time(city: str) -> dict:
-    """Returns the current time in a specified city.
-
-    Args:
-        city (str): The name of the city for which to retrieve the current time.
-
-    Returns:
-        dict: status and result or error msg.
-    """
-
-    if city.lower() == "new york":
-        tz_identifier = "America/New_York"
-    else:
-        return {
-            "status": "error",
-            "error_message": (
-                f"Sorry, I don't have timezone information for {city}."
-            ),
-        }
-
-    tz = ZoneInfo(tz_identifier)
-    now = datetime.datetime.now(tz)
-    report = (
-        f'The current time in {city} is {now.strftime("%Y-%m-%d %H:%M:%S %Z%z")}'
-    )
-    return {"status": "success", "report": report}
-
+from yte_tool import yte_async, yte_info_async, yte_query_async, yte_result_async
+from city_tool import get_current_time, get_weather
 
 app = Agent(
     name="yte_medical_agent",
@@ -71,9 +18,17 @@ app = Agent(
    - Sử dụng tool 'yte' để phân tích dữ liệu bệnh nhân sỏi thận từ OK-2.csv
    - Có 9 bệnh nhân với 107 cột dữ liệu chi tiết
    - Các loại phân tích: tổng quan, giới tính, sỏi, phẫu thuật, bmi, chi tiết bệnh nhân
+   - Với câu hỏi có điều kiện lọc (giới tính, độ tuổi, loại sỏi, khoảng ngày, HU) hoặc cần nhóm
+     theo một trường, dùng tool 'yte_query' với các tham số lọc, group_by và metric
+   - Câu hỏi phân tích sâu (vd. tỷ lệ sạch sỏi theo tư thế, theo nhóm tuổi, theo nhóm HU) dùng group_by
+     với một hoặc nhiều chiều cách nhau bởi dấu phẩy: age_band, bmi_class, hu_band, complications, month, ...
+   - Khi chỉ cần số liệu để trả lời (không cần báo cáo định dạng sẵn), ưu tiên tool 'yte_result':
+     cùng câu hỏi như 'yte' nhưng trả về số liệu JSON gọn
+   - Danh sách bệnh nhân dài được chia trang: gọi lại 'yte' với cùng câu hỏi và cursor được gợi ý để xem trang tiếp
    
 2. 🌤️ THỜI TIẾT & THỜI GIAN:
-   - Trả lời về thời tiết và thời gian tại New York
+   - Giờ hiện tại của hầu hết các thành phố lớn (tên có dấu hay không dấu đều được)
+   - Thời tiết của các thành phố có trong nguồn dữ liệu thời tiết
    
 📋 CÁCH SỬ DỤNG:
 - Với câu hỏi y tế: Sử dụng tool yte("câu hỏi")
@@ -81,7 +36,8 @@ app = Agent(
 
 💡 Luôn trả lời bằng tiếng Việt thân thiện và chuyên nghiệp."""
     ),
-    tools=[get_weather, get_current_time, yte, yte_info],
+    # Tool y tế bất đồng bộ: phân tích nặng chạy trong pool luồng, không chặn các phiên khác
+    tools=[get_weather, get_current_time, yte_async, yte_result_async, yte_info_async, yte_query_async],
 )
 
 # Giữ lại root_agent để tương thích
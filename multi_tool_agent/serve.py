@@ -0,0 +1,331 @@
+"""
+Chạy root_agent với nhiều worker pre-fork dùng chung dữ liệu y tế
+
+Process cha load và index dữ liệu một lần (yte_tool.warm_up), đóng băng GC
+(gc.freeze) để các trang bộ nhớ của dữ liệu không bị chép lại, mở socket rồi fork
+các worker. Worker chỉ đọc dữ liệu nên dùng chung copy-on-write với process cha;
+dữ liệu từ snapshot (memmap) thì dùng chung qua page cache của hệ điều hành.
+
+- Kiểm tra sức khỏe: mỗi worker ghi nhịp tim từ event loop vào vùng nhớ chung;
+  worker chết hoặc treo quá HEALTH_TIMEOUT giây sẽ bị thay.
+- Khởi động lại nhẹ nhàng (SIGHUP, hoặc khi CSV nguồn thay đổi): process cha load
+  lại dữ liệu rồi thay lần lượt từng worker; worker cũ xử lý xong request đang chạy
+  rồi mới thoát.
+- SIGTERM/SIGINT: dừng mọi worker nhẹ nhàng rồi thoát.
+
+Phiên hội thoại mặc định nằm trong bộ nhớ của từng worker; dùng --session-uri
+(vd. sqlite:///sessions.db) để các worker dùng chung phiên. Chỉ chạy trên POSIX (fork).
+
+Chạy: python -m multi_tool_agent.serve --workers 4 --port 8000
+"""
+
+import argparse
+import asyncio
+import gc
+import importlib
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import city_tool
+import yte_tool
+
+# Số worker mặc định (0 = theo số CPU)
+SERVE_WORKERS = int(os.environ.get('YTE_SERVE_WORKERS', '0'))
+# Chu kỳ nhịp tim/kiểm tra (giây) và thời gian không có nhịp tim thì coi worker là treo
+HEALTH_INTERVAL = float(os.environ.get('YTE_HEALTH_INTERVAL', '1'))
+HEALTH_TIMEOUT = float(os.environ.get('YTE_HEALTH_TIMEOUT', '30'))
+# Thời gian tối đa chờ worker xử lý nốt request khi dừng/khởi động lại (giây)
+GRACEFUL_TIMEOUT = float(os.environ.get('YTE_GRACEFUL_TIMEOUT', '30'))
+# Số thế hệ worker có thể cùng tồn tại: đang phục vụ, đang khởi động thay thế, và một thế hệ
+# cũ còn đang dừng; khởi động lại khi chưa đủ slot cho một thế hệ mới sẽ được hoãn
+SLOT_GENERATIONS = 3
+# Thư mục chứa các package agent (multi_tool_agent, agents) cho ADK
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+log = logging.getLogger('yte.serve')
+
+
+class Supervisor:
+    """Fork và giám sát các worker phục vụ trên cùng một socket
+
+    `serve_worker(sock, slot, heartbeats)` chạy trong process con; nó phải ghi
+    time.monotonic() vào heartbeats[slot] đều đặn khi đã sẵn sàng nhận request.
+    """
+
+    def __init__(self, sock: socket.socket, workers: int, serve_worker,
+                 reload_interval: float = 0):
+        self.sock = sock
+        self.size = workers
+        self.serve_worker = serve_worker
+        self.reload_interval = reload_interval
+        # Khi khởi động lại, worker mới chạy song song worker cũ (còn đang dừng) một lúc
+        self.heartbeats = multiprocessing.RawArray('d', workers * SLOT_GENERATIONS)
+        self.workers: Dict[int, int] = {}
+        self.started: Dict[int, float] = {}
+        self.retiring: Dict[int, float] = {}
+        self.stopping = False
+        self.restart_requested = False
+        # Đã có dữ liệu mới nhưng chưa khởi động lại được (chờ worker cũ dừng hết để có slot)
+        self.restart_pending = False
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_restart)
+        self.fill()
+        log.info(f"🚀 {self.size} worker đang phục vụ ({self.describe_socket()})")
+
+        next_poll = time.monotonic() + self.reload_interval
+        while not self.stopping:
+            time.sleep(HEALTH_INTERVAL)
+            self.reap()
+            self.check_health()
+            if self.stopping:
+                break
+            self.fill()
+            if self.restart_requested:
+                self.restart_requested = False
+                yte_tool.reload_dataset(force=True)
+                self.restart_pending = True
+            elif self.reload_interval and time.monotonic() >= next_poll:
+                next_poll = time.monotonic() + self.reload_interval
+                if yte_tool.reload_dataset():
+                    self.restart_pending = True
+            self.maybe_restart()
+        self.shutdown()
+        return 0
+
+    def describe_socket(self) -> str:
+        host, port = self.sock.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+    def _on_restart(self, signum, frame):
+        self.restart_requested = True
+
+    def _free_slot(self) -> Optional[int]:
+        used = set(self.workers.values())
+        return next((slot for slot in range(len(self.heartbeats)) if slot not in used), None)
+
+    def serving(self) -> List[int]:
+        """Các worker đang phục vụ (không tính worker đang dừng)"""
+        return [pid for pid in self.workers if pid not in self.retiring]
+
+    def fill(self):
+        """Fork thêm worker cho đủ số worker đang phục vụ (vd. thay worker đã chết)"""
+        for _ in range(self.size - len(self.serving())):
+            if self.spawn() is None:
+                return
+
+    def spawn(self) -> Optional[int]:
+        """Fork một worker mới, trả về pid (None nếu hết slot: thử lại ở vòng kiểm tra sau)"""
+        slot = self._free_slot()
+        if slot is None:
+            log.warning(f"⚠️ Hết slot worker ({len(self.workers)} worker, {len(self.retiring)} đang dừng)")
+            return None
+        self.heartbeats[slot] = 0.0
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                    signal.signal(signum, signal.SIG_DFL)
+                self.serve_worker(self.sock, slot, self.heartbeats)
+                code = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(code)
+        self.workers[pid] = slot
+        self.started[pid] = time.monotonic()
+        return pid
+
+    def is_ready(self, pid: int) -> bool:
+        return pid in self.workers and self.heartbeats[self.workers[pid]] > 0
+
+    def reap(self):
+        """Thu dọn worker đã thoát; worker chết ngoài ý muốn được thay bằng worker mới"""
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid not in self.workers:
+                continue
+            del self.workers[pid]
+            del self.started[pid]
+            if self.retiring.pop(pid, None) is None and not self.stopping:
+                # Worker thay thế được fork ở fill() của vòng kiểm tra tiếp theo
+                log.warning(f"⚠️ Worker {pid} đã thoát (mã {os.waitstatus_to_exitcode(status)}), khởi động worker mới")
+
+    def check_health(self):
+        """Dừng cưỡng bức worker treo (không có nhịp tim) và worker cũ quá hạn dừng"""
+        now = time.monotonic()
+        for pid, slot in list(self.workers.items()):
+            if pid in self.retiring:
+                if now > self.retiring[pid]:
+                    log.warning(f"⚠️ Worker {pid} không dừng kịp sau {GRACEFUL_TIMEOUT:g}s, buộc dừng")
+                    self._kill(pid, signal.SIGKILL)
+                continue
+            last_seen = self.heartbeats[slot] or self.started[pid]
+            if now - last_seen > HEALTH_TIMEOUT:
+                log.error(f"❌ Worker {pid} không phản hồi {now - last_seen:.0f}s, buộc dừng")
+                self._kill(pid, signal.SIGKILL)
+
+    def retire(self, pid: int):
+        """Yêu cầu worker dừng nhẹ nhàng (xử lý nốt request đang chạy)"""
+        self.retiring[pid] = time.monotonic() + GRACEFUL_TIMEOUT
+        self._kill(pid, signal.SIGTERM)
+
+    def maybe_restart(self) -> bool:
+        """Khởi động lại nếu đang chờ và còn đủ slot cho cả một thế hệ worker mới
+
+        Worker cũ còn đang dừng (tối đa GRACEFUL_TIMEOUT) vẫn giữ slot, nên SIGHUP
+        liên tiếp chỉ được hoãn lại chứ không làm hết slot.
+        """
+        if not self.restart_pending or self.stopping:
+            return False
+        if len(self.workers) + self.size > len(self.heartbeats):
+            return False
+        self.restart_pending = False
+        self.rolling_restart()
+        return True
+
+    def rolling_restart(self):
+        """Thay lần lượt từng worker bằng worker fork từ dữ liệu hiện tại của process cha"""
+        gc.freeze()
+        for pid in self.serving():
+            replacement = self.spawn()
+            if replacement is None:
+                log.error("❌ Không còn slot cho worker mới, dừng khởi động lại và giữ các worker cũ")
+                return
+            deadline = time.monotonic() + HEALTH_TIMEOUT
+            while not self.is_ready(replacement) and time.monotonic() < deadline and not self.stopping:
+                time.sleep(0.1)
+                self.reap()
+            if not self.is_ready(replacement):
+                log.error("❌ Worker mới không sẵn sàng, dừng khởi động lại và giữ các worker cũ")
+                self.retire(replacement)
+                return
+            if pid in self.workers:
+                self.retire(pid)
+        log.info(f"🔄 Đã khởi động lại {self.size} worker (phiên bản dữ liệu {yte_tool.dataset_version()})")
+
+    def shutdown(self):
+        """Dừng nhẹ nhàng mọi worker, quá GRACEFUL_TIMEOUT thì buộc dừng"""
+        self.stopping = True
+        for pid in list(self.workers):
+            if pid not in self.retiring:
+                self.retire(pid)
+        while self.workers:
+            time.sleep(0.1)
+            self.reap()
+            self.check_health()
+        log.info("👋 Đã dừng tất cả worker")
+
+    def _kill(self, pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+def build_app(session_uri: Optional[str] = None):
+    """FastAPI app của ADK cho các agent trong AGENTS_DIR, kèm /healthz của worker"""
+    from google.adk.cli.fast_api import get_fast_api_app
+
+    app = get_fast_api_app(agents_dir=AGENTS_DIR, session_service_uri=session_uri, web=False)
+
+    @app.get('/healthz')
+    def healthz():
+        store = yte_tool.get_store()
+        return {'status': 'ok' if store is not None else 'no_data', 'pid': os.getpid(),
+                'dataset_version': yte_tool.dataset_version(), 'patients': len(store) if store is not None else 0}
+
+    return app
+
+
+def make_worker(args):
+    """Hàm chạy trong mỗi worker: uvicorn trên socket chung + nhịp tim từ event loop"""
+    import uvicorn
+
+    def serve_worker(sock: socket.socket, slot: int, heartbeats):
+        if args.threads:
+            yte_tool.ASYNC_WORKERS = args.threads
+        config = uvicorn.Config(build_app(args.session_uri), limit_concurrency=args.limit_concurrency or None,
+                                timeout_graceful_shutdown=GRACEFUL_TIMEOUT, log_level=args.log_level.lower())
+        server = uvicorn.Server(config)
+
+        async def beat():
+            # Nhịp tim chỉ ghi khi server đã sẵn sàng; event loop bị chặn thì nhịp tim dừng
+            while True:
+                if server.started:
+                    heartbeats[slot] = time.monotonic()
+                await asyncio.sleep(HEALTH_INTERVAL)
+
+        async def main():
+            task = asyncio.create_task(beat())
+            try:
+                await server.serve(sockets=[sock])
+            finally:
+                task.cancel()
+                yte_tool.shutdown_executor()
+
+        asyncio.run(main())
+
+    return serve_worker
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Phục vụ agent y tế bằng nhiều worker pre-fork dùng chung dữ liệu")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=SERVE_WORKERS or os.cpu_count() or 1,
+                        help="Số worker (mặc định YTE_SERVE_WORKERS hoặc số CPU)")
+    parser.add_argument('--threads', type=int, default=0,
+                        help="Số luồng phân tích y tế mỗi worker (mặc định YTE_ASYNC_WORKERS)")
+    parser.add_argument('--limit-concurrency', type=int, default=0,
+                        help="Số request đồng thời tối đa mỗi worker, vượt quá trả 503 (0 = không giới hạn)")
+    parser.add_argument('--session-uri', help="Nơi lưu phiên dùng chung giữa các worker (vd. sqlite:///sessions.db)")
+    parser.add_argument('--csv', help="File/thư mục/glob CSV (mặc định như yte())")
+    parser.add_argument('--reload-interval', type=float, default=yte_tool.RELOAD_INTERVAL,
+                        help="Chu kỳ kiểm tra CSV nguồn để load lại và khởi động lại worker (giây, 0 = tắt)")
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format='%(message)s')
+    # Chỉ process cha theo dõi CSV; worker nhận dữ liệu mới qua khởi động lại, không tự load lại
+    yte_tool.RELOAD_INTERVAL = 0
+    if args.csv:
+        yte_tool.set_data_path(args.csv)
+
+    # Load dữ liệu trước khi fork để các worker dùng chung; ADK (cùng các agent của package
+    # multi_tool_agent) cũng được import trước ở đây nên nằm sẵn trong bộ nhớ dùng chung
+    importlib.import_module('google.adk.cli.fast_api')
+
+    start = time.perf_counter()
+    patients = yte_tool.warm_up()
+    city_tool.get_city_index()
+    log.info(f"✅ Đã chuẩn bị {patients} bệnh nhân trong {time.perf_counter() - start:.2f}s")
+
+    sock = socket.create_server((args.host, args.port), backlog=2048)
+    sock.set_inheritable(True)
+    gc.collect()
+    gc.freeze()
+    return Supervisor(sock, args.workers, make_worker(args), args.reload_interval).run()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yte_bench
+import yte_tool
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Snapshot và registry ID ghi vào thư mục tạm của test"""
+    path = tmp_path / 'cache'
+    monkeypatch.setenv('YTE_CACHE_DIR', str(path))
+    monkeypatch.setattr(yte_tool, 'INGEST_WORKERS', 1)
+    return path
+
+
+@pytest.fixture
+def make_csv(tmp_path):
+    """Ghi CSV giả lập theo schema OK-2.csv: make_csv('a.csv', rows, seed)"""
+    def make(name: str, rows: int, seed: int = 0) -> str:
+        return yte_bench.generate_csv(str(tmp_path / name), rows, seed)
+    return make
+
+
+@pytest.fixture
+def dataset(make_csv, cache_dir):
+    """yte_tool dùng một CSV giả lập 500 dòng; trả lại trạng thái module sau test"""
+    path = make_csv('OK-2.csv', 500)
+    yte_tool.set_data_path(path)
+    yield path
+    yte_tool.stop_reloader()
+    yte_tool.set_data_path(None)
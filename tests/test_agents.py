@@ -0,0 +1,40 @@
+import importlib
+
+import pytest
+
+import yte_tool
+from agents import registry
+
+
+@pytest.mark.parametrize('module, factory', [
+    ('agents.capital_agent', 'create_capital_agent_with_tool'),
+    ('agents.medical_agent', 'create_medical_data_agent'),
+    ('agents.structured_agent', 'create_structured_info_agent'),
+])
+def test_factories_build_a_new_agent_per_call(module, factory, monkeypatch):
+    """create_* dựng bản mới mỗi lần gọi, không trả agent dùng chung của get_agent"""
+    module = importlib.import_module(module)
+    built = []
+    monkeypatch.setattr(module, 'build_agent', lambda name: built.append(name) or object())
+    first, second = getattr(module, factory)(), getattr(module, factory)()
+    assert first is not second
+    assert built == [module.SPEC.name] * 2
+
+
+def test_every_agent_tool_is_registered():
+    for name in registry.registered_agents():
+        for tool in registry.get_spec(name).tools:
+            assert tool in registry.TOOL_PATHS, (name, tool)
+    assert registry.get_tool('yte') is yte_tool.yte_async
+
+
+def test_factories_return_new_agents():
+    pytest.importorskip('google.adk')
+    from agents.capital_agent import create_capital_agent_with_tool
+    from agents.medical_agent import create_medical_data_agent
+    from agents.structured_agent import create_structured_info_agent
+
+    for create in (create_capital_agent_with_tool, create_medical_data_agent, create_structured_info_agent):
+        first, second = create(), create()
+        assert first is not second
+        assert registry.get_agent(first.name) is registry.get_agent(first.name)
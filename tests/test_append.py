@@ -0,0 +1,65 @@
+import numpy as np
+
+import yte_tool
+
+
+def _assert_same(actual, expected, path='index'):
+    """So sánh đệ quy dict/list/mảng/RunningStat; số thực so gần đúng (thứ tự cộng khác nhau)"""
+    if isinstance(expected, dict):
+        assert sorted(actual) == sorted(expected), path
+        for key in expected:
+            _assert_same(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, (list, tuple)) and not isinstance(expected, str):
+        assert len(actual) == len(expected), path
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            _assert_same(a, e, f"{path}[{i}]")
+    elif isinstance(expected, np.ndarray):
+        np.testing.assert_allclose(actual, expected, err_msg=path) if expected.dtype.kind == 'f' \
+            else np.testing.assert_array_equal(actual, expected, err_msg=path)
+    elif isinstance(expected, yte_tool.RunningStat):
+        assert (actual.count, actual.min, actual.max) == (expected.count, expected.min, expected.max), path
+        assert np.isclose(actual.total, expected.total), path
+    elif isinstance(expected, float):
+        assert np.isclose(actual, expected), path
+    else:
+        assert actual == expected, path
+
+
+def _rebuilt(store):
+    """Cùng dữ liệu, index và thống kê dựng lại từ đầu"""
+    fresh = yte_tool.PatientStore(store.ids, store.numeric, store.codes, store.categories)
+    fresh.build_index()
+    fresh.build_stats()
+    return fresh
+
+
+def _append_from_csv(make_csv, name, rows, seed):
+    extra = yte_tool.load_csv_files([make_csv(name, rows, seed)], workers=1)
+    extra.build_index()
+    return yte_tool.append_patients([extra.record(row) for row in range(len(extra))])
+
+
+def test_append_matches_full_rebuild(dataset, make_csv):
+    before = yte_tool.get_store()
+    assert _append_from_csv(make_csv, 'extra-1.csv', 150, seed=21) == 650
+    assert _append_from_csv(make_csv, 'extra-2.csv', 40, seed=22) == 690
+    store = yte_tool.get_store()
+    expected = _rebuilt(store)
+
+    assert store is not before and len(before) == 500
+    assert store.version > before.version
+    index, fresh = vars(store.index), vars(expected.index)
+    _assert_same({key: value for key, value in index.items() if key != 'store'},
+                 {key: value for key, value in fresh.items() if key != 'store'})
+    _assert_same(vars(store.stats), vars(expected.stats), 'stats')
+    np.testing.assert_array_equal(store.ids, np.arange(1, 691))
+
+
+def test_append_keeps_reports_consistent(dataset, make_csv):
+    yte_tool.get_store()
+    _append_from_csv(make_csv, 'extra.csv', 60, seed=5)
+    store = yte_tool.get_store()
+    expected = _rebuilt(store)
+    for intent in ('overview', 'gender', 'stone', 'surgery', 'bmi'):
+        summary = yte_tool._SUMMARIES[intent]
+        _assert_same(summary(store, store.stats), summary(expected, expected.stats), intent)
@@ -0,0 +1,91 @@
+import asyncio
+import inspect
+import threading
+import time
+
+import pytest
+
+import yte_tool
+
+
+@pytest.fixture
+def slow():
+    """Hàm chậm đếm số lần thực sự chạy; `release` cho phép nó kết thúc"""
+    calls = []
+    release = threading.Event()
+
+    def compute(value):
+        calls.append(value)
+        release.wait(10)
+        return value * 2
+
+    compute.calls, compute.release = calls, release
+    yield compute
+    release.set()
+
+
+@pytest.mark.parametrize('query', ['tổng quan', 'giới tính', 'bmi', 'bệnh nhân 7', 'danh sách bệnh nhân nữ'])
+def test_yte_async_matches_sync(dataset, query):
+    assert asyncio.run(yte_tool.yte_async(query)) == yte_tool.yte(query)
+
+
+def test_async_tools_keep_name_and_signature(dataset):
+    for sync, wrapped in ((yte_tool.yte, yte_tool.yte_async), (yte_tool.yte_query, yte_tool.yte_query_async)):
+        assert wrapped.__name__ == sync.__name__
+        assert wrapped.__doc__ == sync.__doc__
+        assert inspect.signature(wrapped) == inspect.signature(sync)
+        assert inspect.iscoroutinefunction(wrapped)
+    expected = yte_tool.yte_query(gender='Nữ', group_by='stone_type', metric='mean_age')
+    assert asyncio.run(yte_tool.yte_query_async(metric='mean_age', group_by='stone_type', gender='Nữ')) == expected
+
+
+def test_identical_concurrent_calls_are_coalesced(slow):
+    async def main():
+        calls = [asyncio.ensure_future(yte_tool.call_async(slow, 21)) for _ in range(5)]
+        calls.append(asyncio.ensure_future(yte_tool.call_async(slow, 4)))
+        await asyncio.sleep(0.05)
+        slow.release.set()
+        return await asyncio.gather(*calls)
+
+    assert asyncio.run(main()) == [42] * 5 + [8]
+    assert sorted(slow.calls) == [4, 21]
+    assert not yte_tool._inflight
+
+
+def test_timeout_of_one_caller_does_not_cancel_the_others(slow):
+    async def main():
+        patient = asyncio.ensure_future(yte_tool.call_async(slow, 5, timeout=0))
+        impatient = asyncio.ensure_future(yte_tool.call_async(slow, 5, timeout=0.05))
+        with pytest.raises(asyncio.TimeoutError):
+            await impatient
+        slow.release.set()
+        return await patient
+
+    assert asyncio.run(main()) == 10
+    assert slow.calls == [5]
+
+
+def test_tool_returns_message_on_timeout_without_blocking_loop(slow, monkeypatch):
+    monkeypatch.setattr(yte_tool, 'ASYNC_TIMEOUT', 0.1)
+    tool = yte_tool._async_tool(slow, lambda: "⏱️ hết giờ")
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        background = asyncio.ensure_future(ticker())
+        started = time.monotonic()
+        reply = await tool(3)
+        background.cancel()
+        return reply, time.monotonic() - started, ticks
+
+    reply, elapsed, ticks = asyncio.run(main())
+    assert reply == "⏱️ hết giờ"
+    assert elapsed < 2
+    # Event loop vẫn chạy các coroutine khác trong lúc hàm chậm chiếm một luồng của pool
+    assert ticks >= 5
@@ -0,0 +1,71 @@
+import json
+import os
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+import yte_tool
+
+
+@pytest.fixture
+def store(make_csv, cache_dir):
+    paths = [make_csv('bv_a.csv', 260, seed=11), make_csv('bv_b.csv', 180, seed=12)]
+    store = yte_tool.load_csv_files(paths, workers=1)
+    store.build_index()
+    store.build_stats()
+    return store
+
+
+def _reference_partitions(store, fields):
+    """Chia nhóm từng bệnh nhân một theo nguồn và tháng phẫu thuật"""
+    groups = defaultdict(list)
+    for row in range(len(store)):
+        record = store.record(row)
+        day = yte_tool.parse_date(record['surgery_date'])
+        labels = {'source': record['source'],
+                  'month': day.strftime('%Y-%m') if day else yte_tool.UNKNOWN_GROUP,
+                  'gender': record['gender'] or yte_tool.UNKNOWN_GROUP}
+        groups[tuple(labels[field] for field in fields)].append(row)
+    return groups
+
+
+@pytest.mark.parametrize('partition_by', [('source', 'month'), ('gender',), ()])
+def test_batch_equals_one_analysis_at_a_time(store, partition_by):
+    results = yte_tool.run_batch(store=store, partition_by=partition_by, workers=4)
+    expected = _reference_partitions(store, partition_by)
+    # Thứ tự nhãn theo từng chiều, nhóm 'Không xác định' cuối mỗi chiều
+    assert [tuple(result['partition'].values()) for result in results] == sorted(
+        expected, key=lambda key: [(label == yte_tool.UNKNOWN_GROUP, label) for label in key])
+
+    for result in results:
+        rows = np.array(expected[tuple(result['partition'].values())])
+        assert result['total'] == len(rows)
+        assert list(result['summaries']) == list(yte_tool._SUMMARIES)
+        for intent, summary in result['summaries'].items():
+            alone = yte_tool.compute_summary(intent, store, rows=None if not partition_by else rows)
+            assert yte_tool._compact(summary) == yte_tool._compact(alone), (result['partition'], intent)
+            assert yte_tool.render_summary(summary) == yte_tool.render_summary(alone)
+
+
+def test_worker_count_does_not_change_results(store):
+    single = yte_tool.run_batch(['overview', 'bmi'], store=store, workers=1)
+    parallel = yte_tool.run_batch(['overview', 'bmi'], store=store, workers=8)
+    assert yte_tool._compact(single) == yte_tool._compact(parallel)
+
+
+def test_unknown_analysis_is_rejected(store):
+    with pytest.raises(ValueError, match='không hỗ trợ'):
+        yte_tool.run_batch(['overview', 'weather'], store=store)
+
+
+def test_write_batch_reports(store, tmp_path):
+    results = yte_tool.run_batch(['gender'], partition_by=('source',), store=store)
+    json_path, text_path = yte_tool.write_batch_reports(results, str(tmp_path / 'out'))
+    with open(json_path, encoding='utf-8') as f:
+        assert [item['partition'] for item in json.load(f)] == [{'source': 'bv_a.csv'}, {'source': 'bv_b.csv'}]
+    with open(text_path, encoding='utf-8') as f:
+        text = f.read()
+    assert "📂 source=bv_a.csv (260 bệnh nhân)" in text
+    assert text.count("👫 PHÂN TÍCH GIỚI TÍNH") == 2
+    assert os.path.dirname(json_path) == os.path.dirname(text_path)
@@ -0,0 +1,75 @@
+import copy
+import json
+import os
+
+import pandas as pd
+
+import yte_bench
+
+
+def _measured(load_seconds=1.0, peak_rss_mb=100.0, latency=2.0):
+    latency = {name: latency for name in yte_bench.LATENCY_QUERIES}
+    return {'rows': 1000, 'load_seconds': load_seconds, 'peak_rss_mb': peak_rss_mb,
+            'latency_ms': latency, 'cached_latency_ms': dict(latency)}
+
+
+def _result(**measured):
+    return {'revision': 'abc', 'timestamp': '2026-01-01T00:00:00',
+            'scales': [{'rows': 1000, 'cold': _measured(**measured), 'snapshot': _measured(**measured)}]}
+
+
+def test_compare_flags_only_real_regressions():
+    before = _result(load_seconds=1.0, peak_rss_mb=100.0, latency=10.0)
+    after = copy.deepcopy(before)
+    after['scales'][0]['cold']['load_seconds'] = 1.3            # +30%, trên ngưỡng nhiễu
+    after['scales'][0]['snapshot']['peak_rss_mb'] = 108.0       # +8%
+    after['scales'][0]['snapshot']['latency_ms']['bmi'] = 5.0   # nhanh hơn
+    after['scales'][0]['cold']['latency_ms']['overview'] = 12.5  # +25%
+    regressions = yte_bench.compare_results(before, after)
+    assert [line.split(':')[0] for line in regressions] == ['1000/cold/load_seconds', '1000/cold/latency_ms/overview']
+    assert '(+30%)' in regressions[0]
+
+
+def test_compare_ignores_noise_and_new_metrics():
+    before = _result(load_seconds=0.01, latency=0.2)
+    after = _result(load_seconds=0.03, latency=0.9)     # gấp nhiều lần nhưng dưới ngưỡng tuyệt đối
+    assert yte_bench.compare_results(before, after) == []
+    after['scales'].append({'rows': 5000, 'cold': _measured(9.0), 'snapshot': _measured(9.0)})
+    assert yte_bench.compare_results(before, after) == []
+    assert yte_bench.compare_results(before, _result(load_seconds=0.5), threshold=100) == []
+
+
+def test_suite_saves_results_and_fails_on_regression(tmp_path, monkeypatch, capsys):
+    timings = iter([_measured(1.0), _measured(0.1), _measured(1.0), _measured(0.1, latency=9.0)])
+    monkeypatch.setattr(yte_bench, '_measure_in_subprocess', lambda csv_path, cache_dir, snapshot: next(timings))
+    args = ['--rows', '50', '--data-dir', str(tmp_path / 'data'), '--results-dir', str(tmp_path / 'results')]
+
+    assert yte_bench.run_suite(args) == 0
+    assert os.path.exists(tmp_path / 'data' / 'synthetic-50.csv')
+    with open(tmp_path / 'results' / 'latest.json', encoding='utf-8') as f:
+        first = json.load(f)
+    assert [scale['rows'] for scale in first['scales']] == [50]
+
+    assert yte_bench.run_suite(args) == 1
+    output = capsys.readouterr().out
+    assert "50/snapshot/latency_ms/overview: 2.000 -> 9.000" in output
+    with open(tmp_path / 'results' / 'latest.json', encoding='utf-8') as f:
+        assert json.load(f)['scales'][0]['snapshot']['latency_ms']['overview'] == 9.0
+
+
+def test_generated_csv_is_deterministic(tmp_path):
+    first = yte_bench.generate_csv(str(tmp_path / 'a.csv'), 300, seed=4)
+    second = yte_bench.generate_csv(str(tmp_path / 'b.csv'), 300, seed=4)
+    with open(first, 'rb') as a, open(second, 'rb') as b:
+        assert a.read() == b.read()
+    df = pd.read_csv(first, dtype=str, header=None, skiprows=1)
+    assert df.shape == (300, len(yte_bench.OK2_HEADER))
+
+
+def test_measure_reports_every_query(dataset):
+    result = yte_bench.measure(dataset, repeat=1)
+    assert result['rows'] == 500
+    assert set(result['latency_ms']) == set(result['cached_latency_ms']) == set(yte_bench.LATENCY_QUERIES)
+    assert all(value >= 0 for value in result['latency_ms'].values())
+    assert result['load_seconds'] > 0 and result['peak_rss_mb'] > 0
+
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import city_tool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_does_not_load_medical_tool():
+    """city_tool chỉ cần yte_common, không kéo theo yte_tool/pandas"""
+    code = "import city_tool, sys; print('yte_tool' in sys.modules, 'pandas' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.split() == ['False', 'False']
+
+
+def test_weather_provider_is_abstract():
+    with pytest.raises(TypeError):
+        city_tool.WeatherProvider()
+
+    class Incomplete(city_tool.WeatherProvider):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_custom_provider_goes_through_cache():
+    calls = []
+
+    class Fixed(city_tool.WeatherProvider):
+        def current(self, city):
+            calls.append(city.key)
+            return {'condition': 'rainy', 'temperature_c': 30}
+
+    previous = city_tool._weather_provider
+    city_tool.set_weather_provider(Fixed())
+    try:
+        first = city_tool.get_weather('Hà Nội')
+        second = city_tool.get_weather('ha noi')
+    finally:
+        city_tool.set_weather_provider(previous)
+    assert first == second
+    assert first['status'] == 'success' and 'rainy' in first['report']
+    assert len(calls) == 1
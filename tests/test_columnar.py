@@ -0,0 +1,103 @@
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+import yte_tool
+
+# Bộ nạp gốc (iterrows + list of dict) làm chuẩn so sánh cho kho dạng cột
+LEGACY_NUMERIC = {
+    'birth_year': 'Năm sinh ', 'height': 'Chiều cao', 'weight': 'Cân nặng ', 'bmi': 'BMI',
+    'num_stones': 'Số lượng sỏi ', 'hu': 'HU', 'surgery_time_minutes': 'Thời gian phẫu thuật (phút)',
+    'hb': 'Hb (g/dL)', 'plt': 'PLT (K/uL)', 'creatinin': 'Creatinin ', 'egfr': 'eGFR',
+}
+LEGACY_TEXT = {
+    'gender': 'Giới tính', 'admission_date': 'Ngày nhập viện ', 'medical_history': 'Tiền căn nội khoa ',
+    'previous_surgery': 'Tiền căn đã mổ sỏi thận ', 'stone_type': 'Loại sỏi ',
+    'stone_size': 'Kích thước sỏi 3 chiều (khối lớn nhất) ', 'surgery_date': 'Ngày PT',
+    'surgery_position': 'Tư thế', 'surgery_result': 'Sạch sỏi trên C-arm ngay sau mổ ',
+    'residual_stones': 'Nếu sót sỏi trên C-arm ngay sau mổ (số lượng/vị trí/kích thước) ',
+    'complications': 'Biến chứng ',
+}
+
+
+def _number(value):
+    if pd.isna(value) or value == '':
+        return None
+    try:
+        return float(str(value).replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def _legacy_records(path):
+    df = pd.read_csv(path, decimal=',')
+    patients = []
+    for index, row in df.iterrows():
+        patient = {'id': index + 1}
+        patient.update({field: _number(row.get(column)) for field, column in LEGACY_NUMERIC.items()})
+        # Ô trống là '' (bản gốc ghi chuỗi 'nan' và đếm nhầm thành biến chứng)
+        patient.update({field: '' if pd.isna(row.get(column)) else str(row.get(column)).strip()
+                        for field, column in LEGACY_TEXT.items()})
+        patient['age'] = 2025 - patient['birth_year'] if patient['birth_year'] else None
+        if not patient['bmi'] and patient['height'] and patient['weight']:
+            patient['bmi'] = round(patient['weight'] / (patient['height'] / 100) ** 2, 1)
+        patients.append(patient)
+    return patients
+
+
+@pytest.fixture
+def legacy(dataset):
+    return _legacy_records(dataset)
+
+
+def test_records_match_row_by_row_loader(legacy):
+    store = yte_tool.get_store()
+    assert len(store) == len(legacy)
+    for row, expected in enumerate(legacy):
+        actual = store.record(row)
+        for field, value in expected.items():
+            assert actual[field] == (pytest.approx(value) if isinstance(value, float) else value), (row, field)
+
+
+def test_reports_match_per_record_aggregation(legacy):
+    total = len(legacy)
+    genders = Counter(p['gender'] for p in legacy)
+    ages = [p['age'] for p in legacy if p['age']]
+
+    overview = yte_tool.yte('tổng quan')
+    assert f"📊 TỔNG SỐ BỆNH NHÂN: {total}" in overview
+    assert f"▪️ Nam: {genders['Nam']} bệnh nhân ({genders['Nam']/total*100:.1f}%)" in overview
+    assert f"▪️ Tuổi trung bình: {sum(ages)/len(ages):.1f} tuổi" in overview
+    assert f"▪️ Tuổi thấp nhất: {min(ages)} tuổi" in overview
+
+    gender = yte_tool.yte('giới tính')
+    female_ages = [p['age'] for p in legacy if p['gender'] == 'Nữ' and p['age']]
+    assert f"👩 NỮ GIỚI: {genders['Nữ']} bệnh nhân" in gender
+    assert f"▪️ Tuổi trung bình: {sum(female_ages)/len(female_ages):.1f} tuổi" in gender
+
+    stone = yte_tool.yte('loại sỏi')
+    for stone_type, count in Counter(p['stone_type'] for p in legacy if p['stone_type']).items():
+        assert f"▪️ {stone_type}: {count} ca ({count/total*100:.1f}%)" in stone
+
+    surgery = yte_tool.yte('phẫu thuật')
+    times = [p['surgery_time_minutes'] for p in legacy if p['surgery_time_minutes']]
+    complications = sum(1 for p in legacy if p['complications'])
+    assert f"▪️ Thời gian TB: {sum(times)/len(times):.1f} phút" in surgery
+    assert f"▪️ Thời gian dài nhất: {max(times)} phút" in surgery
+    assert f"▪️ Có biến chứng: {complications} ca" in surgery
+    assert f"▪️ Không biến chứng: {total - complications} ca" in surgery
+
+    bmi = yte_tool.yte('bmi')
+    bmis = [p['weight'] / (p['height'] / 100) ** 2 for p in legacy if p['height'] and p['weight']]
+    normal = sum(1 for b in bmis if 18.5 <= b < 25)
+    assert f"▪️ BMI trung bình: {sum(bmis)/len(bmis):.1f}" in bmi
+    assert f"▪️ Bình thường (18.5-24.9): {normal} ca ({normal/len(bmis)*100:.1f}%)" in bmi
+
+
+def test_patient_detail_matches_record(legacy):
+    patient = legacy[41]
+    detail = yte_tool.yte('bệnh nhân 42')
+    assert "CHI TIẾT BỆNH NHÂN ID 42" in detail
+    assert f"▪️ Giới tính: {patient['gender']}" in detail
+    assert f"▪️ BMI: {patient['bmi']}" in detail
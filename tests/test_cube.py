@@ -0,0 +1,84 @@
+import random
+
+import numpy as np
+import pytest
+
+import yte_tool
+
+
+def _random_where(store, rng):
+    """Bộ lọc ngẫu nhiên trên các chiều phân loại mà yte_query lọc bằng cube"""
+    where = {}
+    for field in ('gender', 'stone_type'):
+        labels = store.categories[field]
+        if labels and rng.random() < 0.6:
+            where[field] = rng.sample(labels, rng.randint(1, min(3, len(labels))))
+    return where
+
+
+def _rows_where(store, where):
+    rows = np.arange(len(store))
+    for field, labels in where.items():
+        codes = [store.categories[field].index(label) for label in labels]
+        rows = rows[np.isin(store.codes[field][rows], codes)]
+    return rows
+
+
+def _assert_same(cube_result, row_result):
+    assert cube_result['count'] == row_result['count']
+    assert cube_result['value'] == pytest.approx(row_result['value'], abs=0.011)
+    if 'groups' in row_result:
+        assert [group['group'] for group in cube_result['groups']] == [group['group'] for group in row_result['groups']]
+        assert [group['count'] for group in cube_result['groups']] == [group['count'] for group in row_result['groups']]
+        for cube_group, row_group in zip(cube_result['groups'], row_result['groups']):
+            assert cube_group['value'] == pytest.approx(row_group['value'], abs=0.011)
+
+
+def _check_random_queries(store, seed, rounds=60):
+    rng = random.Random(seed)
+    for _ in range(rounds):
+        where = _random_where(store, rng)
+        metric = rng.choice(yte_tool.QUERY_METRICS)
+        by = rng.sample(yte_tool.CUBE_DIMENSIONS, rng.randint(0, 2))
+        expected = yte_tool.aggregate_patients(store, _rows_where(store, where), metric, by)
+        _assert_same(store.cube.rollup(metric, by, where), expected)
+
+
+def test_cube_matches_row_path(dataset):
+    store = yte_tool.get_store()
+    _check_random_queries(store, seed=1)
+
+
+def test_cube_matches_row_path_after_append(dataset, make_csv):
+    extra = yte_tool.load_csv_files([make_csv('extra.csv', 120, seed=7)], workers=1)
+    extra.build_index()
+    yte_tool.get_store()
+    yte_tool.append_patients([extra.record(row) for row in range(len(extra))])
+    store = yte_tool.get_store()
+    assert len(store) == 620
+    _check_random_queries(store, seed=2)
+
+
+def test_extended_cube_equals_full_rebuild(dataset, make_csv):
+    yte_tool.get_store()
+    extra = yte_tool.load_csv_files([make_csv('extra.csv', 80, seed=11)], workers=1)
+    extra.build_index()
+    yte_tool.append_patients([extra.record(row) for row in range(len(extra))])
+    store = yte_tool.get_store()
+    rebuilt = yte_tool.CohortCube(store)
+
+    assert rebuilt.labels == store.cube.labels
+    np.testing.assert_array_equal(rebuilt.cells, store.cube.cells)
+    np.testing.assert_array_equal(rebuilt.counts, store.cube.counts)
+    for metric, terms in rebuilt.measures.items():
+        for expected, actual in zip(terms, store.cube.measures[metric]):
+            np.testing.assert_allclose(actual, expected)
+
+
+def test_cube_has_no_month_dimension(dataset):
+    store = yte_tool.get_store()
+    assert 'month' not in yte_tool.CUBE_DIMENSIONS
+    assert len(store.cube) < len(store)
+    result = yte_tool.yte_query(group_by='month')
+    assert result['status'] == 'success'
+    assert sum(group['count'] for group in result['result']['groups']) == len(store)
@@ -0,0 +1,65 @@
+import base64
+
+import pytest
+
+import yte_tool
+
+
+def test_cursor_round_trip():
+    cursor = yte_tool.encode_cursor(7, 150)
+    assert '=' not in cursor
+    assert yte_tool.decode_cursor(cursor) == (7, 150)
+
+
+@pytest.mark.parametrize('cursor', ['!!!', 'abc', yte_tool.encode_cursor(1, -5),
+                                    base64.urlsafe_b64encode(b'1:2:3').decode()])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        yte_tool.decode_cursor(cursor)
+
+
+def test_pages_cover_all_patients_once(dataset, monkeypatch):
+    monkeypatch.setattr(yte_tool, 'LIST_PAGE_SIZE', 64)
+    store = yte_tool.get_store()
+    seen, cursor = [], ''
+    while True:
+        page = yte_tool._patient_list_page(store, {}, cursor)
+        assert page['version'] == store.version
+        seen.extend(patient['id'] for patient in page['patients'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == [int(patient_id) for patient_id in store.ids]
+
+
+def test_cursor_expires_when_data_changes(dataset, make_csv):
+    store = yte_tool.get_store()
+    cursor = yte_tool._patient_list_page(store, {}, '')['next_cursor']
+    assert yte_tool.decode_cursor(cursor) == (store.version, yte_tool.LIST_PAGE_SIZE)
+
+    extra = yte_tool.load_csv_files([make_csv('extra.csv', 5, seed=9)], workers=1)
+    extra.build_index()
+    yte_tool.append_patients([extra.record(row) for row in range(len(extra))])
+    updated = yte_tool.get_store()
+    assert updated.version != store.version
+
+    with pytest.raises(ValueError, match='hết hạn'):
+        yte_tool._patient_list_page(updated, {}, cursor)
+    # Kho cũ vẫn lật trang được với cursor của nó
+    assert yte_tool._patient_list_page(store, {}, cursor)['offset'] == yte_tool.LIST_PAGE_SIZE
+
+    result = yte_tool.yte_result('danh sách bệnh nhân', cursor)
+    assert result['status'] == 'error' and 'hết hạn' in result['error_message']
+    assert yte_tool.yte('danh sách bệnh nhân', cursor).startswith('❌')
+
+
+def test_gender_report_points_to_paged_list_instead_of_id_range(dataset):
+    report = yte_tool.yte('giới tính')
+    assert 'Khoảng ID' not in report
+    store = yte_tool.get_store()
+    for label, query in (('Nam', 'danh sách bệnh nhân nam'), ('Nữ', 'danh sách bệnh nhân nữ')):
+        assert f'yte("{query}")' in report
+        # Câu hỏi được gợi ý trả đúng bệnh nhân của nhóm đó, theo trang
+        result = yte_tool.yte_result(query)
+        assert result['result']['total'] == store.stats.gender[label]
+        assert {patient['gender'] for patient in result['result']['patients']} == {label}
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import yte_tool
+
+
+@pytest.fixture
+def store(make_csv, cache_dir):
+    """Kho 400 dòng với ID thưa, xáo trộn (không trùng vị trí dòng)"""
+    base = yte_tool.load_csv_files([make_csv('a.csv', 400, seed=4)], workers=1)
+    ids = np.random.default_rng(0).permutation(np.arange(1, 401) * 3)
+    store = yte_tool.PatientStore(ids, base.numeric, base.codes, base.categories)
+    store.build_index()
+    return store
+
+
+def _expected_rows(store, patient_ids):
+    rows = {int(patient_id): row for row, patient_id in enumerate(store.ids)}
+    return [rows.get(patient_id) for patient_id in patient_ids]
+
+
+def test_id_lookup_single_and_batched(store):
+    wanted = [3, 4, 0, -3, 1200, 1203, 600, 601] + [int(i) for i in store.ids[:50]]
+    expected = _expected_rows(store, wanted)
+    assert store.index.rows_of(wanted) == expected
+    assert [store.index.row_of(patient_id) for patient_id in wanted] == expected
+    assert store.index.rows_of([]) == []
+
+
+def test_id_lookup_after_append(store, make_csv):
+    chunk = yte_tool.load_csv_files([make_csv('b.csv', 30, seed=5)], workers=1)
+    # ID mới chen vào các khoảng trống giữa ID cũ
+    chunk.ids = np.arange(30) * 3 + 1
+    extended = store.extended(chunk)
+    wanted = list(range(0, 1210))
+    assert extended.index.rows_of(wanted) == _expected_rows(extended, wanted)
+    np.testing.assert_array_equal(extended.index.sorted_ids, np.sort(extended.ids))
+
+
+def test_nearest_ids_are_bounded(store):
+    nearest = store.index.nearest_ids(100)
+    assert len(nearest) == yte_tool.NEAREST_ID_HINTS
+    assert all(abs(patient_id - 100) <= 9 for patient_id in nearest)
+    assert store.index.nearest_ids(10 ** 6) == sorted(int(i) for i in np.sort(store.ids)[-yte_tool.NEAREST_ID_HINTS:])
+
+
+def test_date_and_category_indexes(store):
+    index = store.index
+    days = index.days['surgery_date']
+    start, end = yte_tool.date(2024, 3, 1), yte_tool.date(2024, 9, 30)
+    rows = index.rows_in_date_range('surgery_date', start, end)
+    expected = np.flatnonzero((days >= start.toordinal()) & (days <= end.toordinal()))
+    assert 0 < expected.size < len(store)
+    np.testing.assert_array_equal(np.sort(rows), expected)
+    assert np.all(np.diff(days[rows]) >= 0)
+
+    for code, label in enumerate(store.categories['stone_type']):
+        np.testing.assert_array_equal(np.sort(index.rows_for_category('stone_type', label)),
+                                      np.flatnonzero(store.codes['stone_type'] == code))
+    assert index.rows_for_category('stone_type', 'không có loại này').size == 0
+
+    ages = store.numeric['age']
+    np.testing.assert_array_equal(np.sort(index.rows_in_range('age', 40, 60)),
+                                  np.flatnonzero((ages >= 40) & (ages <= 60)))
+    assert index.count_in_range('age', 40, 60) == int(((ages >= 40) & (ages <= 60)).sum())
+
+
+def test_missing_id_reply_is_bounded(dataset):
+    store = yte_tool.get_store()
+    reply = yte_tool.yte_result('bệnh nhân 100000')
+    patient = reply['result']['patients'][0]
+    assert not patient['found']
+    assert len(patient['nearest']) == yte_tool.NEAREST_ID_HINTS
+    assert patient['nearest'][-1] == len(store)
+    assert len(yte_tool.yte('bệnh nhân 100000')) < 1000
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pytest
+
+import yte_tool
+
+
+def _patients_by_id(store):
+    """ID -> (file nguồn, bản ghi) để so sánh giữa các lần load"""
+    sources = store.decode(yte_tool.SOURCE_FIELD)
+    return {int(patient_id): (sources[row], store.record(row)) for row, patient_id in enumerate(store.ids)}
+
+
+@pytest.mark.parametrize('snapshot', ['1', '0'])
+def test_adding_a_file_that_sorts_first_keeps_existing_ids(make_csv, cache_dir, monkeypatch, snapshot):
+    monkeypatch.setenv('YTE_SNAPSHOT', snapshot)
+    monkeypatch.setattr(yte_tool, '_id_registries', {})
+    make_csv('data/2025-02.csv', 40, seed=2)
+    make_csv('data/2025-03.csv', 30, seed=3)
+    source = os.path.dirname(make_csv('data/2025-04.csv', 20, seed=4))
+    before = _patients_by_id(yte_tool.load_patient_store(source))
+    assert sorted(before) == list(range(1, 91))
+
+    make_csv('data/2025-01.csv', 25, seed=1)
+    store = yte_tool.load_patient_store(source)
+    after = _patients_by_id(store)
+
+    assert len(store) == 115
+    assert len(np.unique(store.ids)) == len(store)
+    assert {patient_id: after[patient_id] for patient_id in before} == before
+    assert all(after[patient_id][0] == '2025-01.csv' for patient_id in set(after) - set(before))
+
+
+def test_rows_appended_to_a_file_get_new_ids(make_csv, cache_dir, monkeypatch):
+    monkeypatch.setattr(yte_tool, '_id_registries', {})
+    make_csv('data/a.csv', 10, seed=1)
+    source = os.path.dirname(make_csv('data/b.csv', 10, seed=2))
+    before = _patients_by_id(yte_tool.load_patient_store(source))
+
+    path = os.path.join(source, 'a.csv')
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.writelines(lines[1:6])
+    after = _patients_by_id(yte_tool.load_patient_store(source))
+
+    assert {patient_id: after[patient_id] for patient_id in before} == before
+    assert sorted(set(after) - set(before)) == list(range(21, 26))
+
+
+@pytest.mark.parametrize('snapshot', ['1', '0'])
+def test_same_file_name_in_two_directories_are_separate_sources(make_csv, cache_dir, monkeypatch, snapshot):
+    monkeypatch.setenv('YTE_SNAPSHOT', snapshot)
+    monkeypatch.setattr(yte_tool, '_id_registries', {})
+    root = os.path.dirname(os.path.dirname(make_csv('mf/hospA/2025-01.csv', 10, seed=1)))
+    make_csv('mf/hospB/2025-01.csv', 12, seed=2)
+    pattern = os.path.join(root, '*', '*.csv')
+
+    store = yte_tool.load_patient_store(pattern)
+    before = _patients_by_id(store)
+    assert len(store) == 22
+    assert sorted(before) == list(range(1, 23))
+    assert sorted(store.categories[yte_tool.SOURCE_FIELD]) == ['hospA/2025-01.csv', 'hospB/2025-01.csv']
+
+    # Thêm một bệnh viện đứng đầu khi sắp xếp: ID cũ không đổi
+    make_csv('mf/hosp0/2025-01.csv', 5, seed=3)
+    after = _patients_by_id(yte_tool.load_patient_store(pattern))
+    assert len(after) == 27
+    assert {patient_id: after[patient_id] for patient_id in before} == before
+
+
+def test_id_registry_lives_in_the_fixed_root_of_a_glob(make_csv, monkeypatch):
+    monkeypatch.delenv('YTE_CACHE_DIR', raising=False)
+    monkeypatch.setenv('YTE_SNAPSHOT', '1')
+    monkeypatch.setattr(yte_tool, 'INGEST_WORKERS', 1)
+    root = os.path.dirname(os.path.dirname(make_csv('g/hospA/x.csv', 5, seed=1)))
+    make_csv('g/hospB/x.csv', 5, seed=2)
+    pattern = os.path.join(root, '*', 'x.csv')
+
+    assert yte_tool.source_root(pattern) == root
+    assert yte_tool.id_registry_path(pattern) == os.path.join(root, yte_tool.SNAPSHOT_DIR_NAME,
+                                                              yte_tool.ID_REGISTRY_NAME)
+    assert len(yte_tool.load_patient_store(pattern)) == 10
+    assert os.path.exists(yte_tool.id_registry_path(pattern))
+    assert not os.path.exists(os.path.join(root, '*'))
@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import yte_tool
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_does_not_parse_csv(dataset, cache_dir):
+    code = ("import yte_tool; assert not yte_tool._loaded and yte_tool._store is None; "
+            "print(yte_tool.warm_up()); assert yte_tool._loaded")
+    env = dict(os.environ, YTE_CSV_PATH=dataset, YTE_CACHE_DIR=str(cache_dir))
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == '500'
+
+
+def test_concurrent_first_calls_load_once(dataset, monkeypatch):
+    calls = []
+    build = yte_tool._build_store
+
+    def slow_build(path):
+        calls.append(path)
+        # Giữ lock đủ lâu để các luồng khác chắc chắn đụng phải lần load đang chạy
+        time.sleep(0.2)
+        return build(path)
+
+    monkeypatch.setattr(yte_tool, '_build_store', slow_build)
+    assert not yte_tool._loaded
+
+    start = threading.Barrier(8)
+    stores, reports = [], []
+
+    def first_call():
+        start.wait()
+        stores.append(yte_tool.get_store())
+        reports.append(yte_tool.yte('tổng quan'))
+
+    workers = [threading.Thread(target=first_call) for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+
+    assert calls == [dataset]
+    assert len(stores) == 8 and all(store is stores[0] for store in stores)
+    assert len(set(reports)) == 1 and "TỔNG SỐ BỆNH NHÂN: 500" in reports[0]
+
+
+def test_set_data_path_defers_the_next_load(dataset, make_csv):
+    assert len(yte_tool.get_store()) == 500
+    other = make_csv('other.csv', 120, seed=4)
+    yte_tool.set_data_path(other)
+    assert not yte_tool._loaded and yte_tool._store is None
+    assert yte_tool.get_data_path() == other
+    assert len(yte_tool.YTE_STORE) == 120
+    assert len(yte_tool.YTE_DATA) == 120
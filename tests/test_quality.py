@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import yte_tool
+
+# Ô lỗi được cài vào CSV giả lập: (cột, dòng, giá trị)
+DIRTY_CELLS = [
+    ('Chiều cao', 3, '12/3/25'),
+    ('Chiều cao', 8, 'không đo'),
+    ('Chiều cao', 9, ''),
+    ('Chiều cao', 20, ' 165 '),
+    ('Cân nặng ', 5, '72,5'),
+    ('Cân nặng ', 6, '7o'),
+    ('HU', 1, '?'),
+    ('HU', 2, '  '),
+]
+
+
+@pytest.fixture
+def dirty_csv(make_csv, cache_dir):
+    path = make_csv('dirty.csv', 240, seed=21)
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    for column, row, value in DIRTY_CELLS:
+        df.loc[row, column] = value
+    df.to_csv(path, index=False)
+    return path
+
+
+def _reference_quality(path):
+    """Đếm từng ô một như safe_convert cũ: bỏ khoảng trắng, đổi dấu phẩy, float()"""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    quality = {}
+    for field, aliases in yte_tool.NUMERIC_FIELDS:
+        column = next(alias for alias in aliases if alias in df.columns)
+        missing = failed = 0
+        for cell in df[column]:
+            cell = cell.strip()
+            if not cell:
+                missing += 1
+                continue
+            try:
+                float(cell.replace(',', '.'))
+            except ValueError:
+                failed += 1
+        quality[field] = (missing, failed)
+    return quality
+
+
+def _counts(quality):
+    return {field: (entry['missing'], entry['failed']) for field, entry in quality.items()
+            if field in dict(yte_tool.NUMERIC_FIELDS)}
+
+
+def test_quality_counts_match_per_cell_parsing(dirty_csv):
+    store = yte_tool.load_csv_files([dirty_csv], workers=1)
+    assert _counts(store.quality) == _reference_quality(dirty_csv)
+    assert store.quality['height']['failed'] == 2
+    assert sorted(store.quality['height']['examples']) == ['12/3/25', 'không đo']
+    assert store.quality['weight']['examples'] == ['7o']
+    # Ô đọc được vẫn cho đúng giá trị sau khi làm sạch
+    assert store.numeric['height'][20] == 165.0
+    assert store.numeric['weight'][5] == 72.5
+    assert np.isnan(store.numeric['height'][3])
+
+    for field, _ in yte_tool.TEXT_FIELDS:
+        entry = store.quality[field]
+        assert entry['missing'] == int(np.count_nonzero(store.codes[field] < 0)), field
+
+
+def test_quality_survives_streaming_snapshot_and_merge(dirty_csv, make_csv):
+    expected = _counts(yte_tool.load_csv_files([dirty_csv], workers=1).quality)
+    streamed = yte_tool.ingest_csv_streaming(dirty_csv, chunk_rows=50)
+    assert _counts(streamed.quality) == expected
+    assert _counts(yte_tool.load_snapshot(dirty_csv).quality) == expected
+
+    clean = make_csv('clean.csv', 100, seed=22)
+    merged = yte_tool.load_csv_files([dirty_csv, clean], workers=1)
+    reference = _reference_quality(clean)
+    assert _counts(merged.quality) == {
+        field: (missing + reference[field][0], failed + reference[field][1])
+        for field, (missing, failed) in expected.items()}
+
+
+def test_quality_report_and_info(dirty_csv):
+    yte_tool.set_data_path(dirty_csv)
+    try:
+        report = yte_tool.data_quality_report()
+        assert "▪️ height ← 'Chiều cao':" in report and "lỗi parse 2" in report
+        assert "📊 Tổng số ô không parse được: 4" in report
+        assert "▪️ Ô số không parse được: 4" in yte_tool.yte_info()
+    finally:
+        yte_tool.set_data_path(None)
@@ -0,0 +1,104 @@
+from collections import defaultdict
+from datetime import date
+
+import pytest
+
+import yte_tool
+
+
+@pytest.fixture
+def patients(dataset):
+    store = yte_tool.get_store()
+    return [store.record(row) for row in range(len(store))]
+
+
+def _matches(patient, gender=None, age_min=None, age_max=None, stone_type=None,
+             date_from=None, date_to=None, hu_min=None, hu_max=None):
+    """Bộ lọc tham chiếu, kiểm tra từng bệnh nhân một"""
+    if gender and patient['gender'] != gender:
+        return False
+    if stone_type and stone_type not in patient['stone_type']:
+        return False
+    for value, low, high in ((patient['age'], age_min, age_max), (patient['hu'], hu_min, hu_max)):
+        if (low is not None or high is not None) and value is None:
+            return False
+        if low is not None and value < low or high is not None and value > high:
+            return False
+    if date_from or date_to:
+        day = yte_tool.parse_date(patient['surgery_date'])
+        if day is None or date_from and day < date_from or date_to and day > date_to:
+            return False
+    return True
+
+
+def _mean(values):
+    values = [value for value in values if value is not None]
+    return round(sum(values) / len(values), 2) if values else None
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'gender': 'Nữ'},
+    {'age_min': 40, 'age_max': 60},
+    {'gender': 'Nam', 'stone_type': 'san hô', 'hu_min': 600},
+    {'date_from': '2025-03-01', 'date_to': '2025-06-30', 'age_max': 55},
+])
+def test_filters_match_per_patient_scan(patients, filters):
+    result = yte_tool.yte_query(**filters, metric='mean_age')
+    assert result['status'] == 'success'
+    reference = dict(filters)
+    for name in ('date_from', 'date_to'):
+        if name in reference:
+            reference[name] = date.fromisoformat(reference[name])
+    selected = [p for p in patients if _matches(p, **reference)]
+    assert 0 < len(selected)
+    assert result['result']['count'] == len(selected)
+    assert result['result']['value'] == pytest.approx(_mean(p['age'] for p in selected))
+
+
+def test_group_by_matches_per_patient_grouping(patients):
+    result = yte_tool.yte_query(age_min=30, group_by='gender,stone_type', metric='mean_surgery_time_minutes')
+    groups = defaultdict(list)
+    for patient in patients:
+        if _matches(patient, age_min=30):
+            label = ' / '.join(patient[field] or yte_tool.UNKNOWN_GROUP for field in ('gender', 'stone_type'))
+            groups[label].append(patient['surgery_time_minutes'])
+    actual = {group['group']: group for group in result['result']['groups']}
+    assert set(actual) == set(groups)
+    for label, times in groups.items():
+        assert actual[label]['count'] == len(times)
+        assert actual[label]['value'] == pytest.approx(_mean(times))
+    assert "📊 Theo gender, stone_type:" in result['report']
+
+
+def test_rate_metrics(patients):
+    women = [p for p in patients if p['gender'] == 'Nữ']
+    known = [p for p in women if p['surgery_result']]
+    stone_free = yte_tool.yte_query(gender='nu', metric='stone_free_rate')['result']
+    assert stone_free['value'] == pytest.approx(
+        round(100 * sum('Có' in p['surgery_result'] for p in known) / len(known), 2))
+    complications = yte_tool.yte_query(gender='female', metric='complication_rate')['result']
+    assert complications['value'] == pytest.approx(
+        round(100 * sum(bool(p['complications']) for p in women) / len(women), 2))
+
+
+def test_cube_and_row_paths_agree(dataset):
+    # Chỉ lọc giới tính/loại sỏi thì yte_query đọc cube; so với tổng hợp trực tiếp trên các dòng
+    store = yte_tool.get_store()
+    cube = yte_tool.yte_query(gender='Nam', group_by='stone_type', metric='stone_free_rate')['result']
+    rows = yte_tool.aggregate_patients(store, yte_tool.select_patients(store, gender='Nam'),
+                                       'stone_free_rate', 'stone_type')
+    assert cube['count'] == rows['count']
+    assert [(g['group'], g['count'], g['value']) for g in cube['groups']] == \
+           [(g['group'], g['count'], g['value']) for g in rows['groups']]
+
+
+@pytest.mark.parametrize('kwargs, message', [
+    ({'metric': 'median_age'}, "không hỗ trợ"),
+    ({'group_by': 'gender,height'}, "Không thể nhóm theo 'height'"),
+    ({'date_from': '31-31-2025'}, "Ngày không hợp lệ"),
+])
+def test_invalid_arguments_are_reported(dataset, kwargs, message):
+    result = yte_tool.yte_query(**kwargs)
+    assert result['status'] == 'error'
+    assert message in result['error_message']
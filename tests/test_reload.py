@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+import threading
+
+import yte_tool
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_reload_on_cold_process_with_reloader_enabled(dataset, cache_dir):
+    code = "import yte_tool; assert yte_tool.reload_dataset(force=True); print(len(yte_tool.get_store()))"
+    env = dict(os.environ, YTE_RELOAD_INTERVAL='5', YTE_CSV_PATH=dataset, YTE_CACHE_DIR=str(cache_dir))
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '500'
+
+
+def test_reload_in_forked_worker_does_not_deadlock(dataset, monkeypatch):
+    yte_tool.get_store()
+    # Như trong worker vừa fork: luồng theo dõi của process cha không còn
+    monkeypatch.setattr(yte_tool, 'RELOAD_INTERVAL', 60.0)
+    monkeypatch.setattr(yte_tool, '_reloader_pid', -1)
+    done = []
+    worker = threading.Thread(target=lambda: done.append(yte_tool.reload_dataset(force=True)), daemon=True)
+    worker.start()
+    worker.join(timeout=30)
+    assert done == [True]
+    assert yte_tool._reloader_pid == os.getpid()
+
+
+def test_reload_swaps_store_only_when_sources_change(dataset, make_csv):
+    old = yte_tool.get_store()
+    assert yte_tool.reload_dataset() is False
+    assert yte_tool.get_store() is old
+
+    make_csv('OK-2.csv', 600, seed=1)
+    assert yte_tool.reload_dataset() is True
+    new = yte_tool.get_store()
+    assert len(new) == 600
+    assert new.version > old.version == yte_tool.dataset_version() - 1
+    assert len(old) == 500
+
+
+def test_failed_reload_keeps_current_store(dataset):
+    old = yte_tool.get_store()
+    with open(dataset, 'w', encoding='utf-8') as f:
+        f.write('')
+    assert yte_tool.reload_dataset() is False
+    assert yte_tool.get_store() is old
@@ -0,0 +1,67 @@
+import pytest
+
+import yte_tool
+from yte_common import ReportCache
+
+
+@pytest.fixture
+def cache(dataset):
+    yte_tool.get_store()
+    yte_tool._report_cache.clear()
+    before = yte_tool.report_cache_stats()
+    return lambda: {name: yte_tool.report_cache_stats()[name] - before[name] for name in ('hits', 'misses')}
+
+
+def test_keywords_of_one_intent_share_an_entry(cache):
+    first = yte_tool.yte('tổng quan')
+    assert yte_tool.yte('overview') == first
+    assert yte_tool.yte('TỔNG QUAN') == first
+    # Lần đầu: trượt cả văn bản lẫn số liệu; hai lần sau trúng văn bản
+    assert cache() == {'hits': 2, 'misses': 2}
+
+
+def test_cache_invalidated_when_dataset_version_changes(cache, make_csv):
+    old_store = yte_tool.get_store()
+    old = yte_tool.yte('giới tính')
+
+    make_csv('OK-2.csv', 650, seed=2)
+    assert yte_tool.reload_dataset() is True
+    assert yte_tool.get_store().version != old_store.version
+    assert yte_tool.report_cache_stats()['size'] == 0
+
+    new = yte_tool.yte('giới tính')
+    assert new != old
+    assert f"{yte_tool.get_store().stats.gender['Nam']} bệnh nhân" in new
+    # Kho cũ vẫn đọc đúng số liệu của nó, không lấy nhầm mục của kho mới
+    assert yte_tool._cached_report('gender', old_store) == old
+
+
+def test_append_bumps_version_and_refreshes_reports(cache, make_csv):
+    before = yte_tool.yte('tổng quan')
+    extra = yte_tool.load_csv_files([make_csv('extra.csv', 7, seed=8)], workers=1)
+    yte_tool.append_patients([extra.record(row) for row in range(len(extra))])
+
+    after = yte_tool.yte('tổng quan')
+    assert "TỔNG SỐ BỆNH NHÂN: 500" in before
+    assert "TỔNG SỐ BỆNH NHÂN: 507" in after
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr('yte_common.time.monotonic', lambda: clock[0])
+    cache = ReportCache(maxsize=2, ttl=10)
+    computed = []
+
+    def get(key):
+        return cache.get_or_compute(key, lambda: computed.append(key) or key.upper())
+
+    assert [get('a'), get('b'), get('a'), get('c')] == ['A', 'B', 'A', 'C']
+    # 'b' ít dùng gần đây nhất nên bị loại, 'a' vẫn còn
+    get('a')
+    get('b')
+    assert computed == ['a', 'b', 'c', 'b']
+    assert cache.stats()['evictions'] == 2
+
+    clock[0] += 11
+    get('b')
+    assert computed[-1] == 'b'
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+import yte_tool
+
+QUERIES = ['tổng quan', 'giới tính', 'loại sỏi', 'phẫu thuật', 'bmi', 'tổng quan nữ', 'bmi nam tuổi 30-50',
+           'bệnh nhân 3 9999', 'danh sách bệnh nhân nam', 'xin chào']
+
+
+def _floats(value):
+    if isinstance(value, float):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _floats(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _floats(item)
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_rendering_the_structured_result_reproduces_yte(dataset, query):
+    store = yte_tool.get_store()
+    assert yte_tool.render_result(yte_tool._analyze(store, query)) == yte_tool.yte(query)
+
+
+@pytest.mark.parametrize('intent', list(yte_tool._SUMMARIES))
+@pytest.mark.parametrize('filters', [{}, {'gender': 'Nữ'}, {'age_min': 40, 'age_max': 60}])
+def test_summary_round_trip(dataset, intent, filters):
+    store = yte_tool.get_store()
+    summary = yte_tool.compute_summary(intent, store, filters)
+    assert summary['intent'] == intent and summary['filters'] == filters
+    # Số liệu là dữ liệu thuần (JSON được), trình bày lại cho đúng báo cáo của yte()
+    assert json.loads(json.dumps(summary)) == summary
+    assert yte_tool.render_summary(summary) == yte_tool._cached_report(intent, store, filters)
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_yte_result_schema(dataset, query):
+    result = yte_tool.yte_result(query)
+    assert set(result) == {'status', 'intent', 'filters', 'result'}
+    assert result['status'] == 'success'
+    assert json.loads(json.dumps(result, ensure_ascii=False)) == result
+    assert all(value == round(value, 2) for value in _floats(result))
+    if result['intent'] in yte_tool._SUMMARIES:
+        assert 'intent' not in result['result'] and 'filters' not in result['result']
+        assert result['result'] == yte_tool._compact(
+            {key: value for key, value in yte_tool.compute_summary(
+                result['intent'], yte_tool.get_store(), result['filters']).items()
+             if key not in ('intent', 'filters')})
+
+
+def test_patient_details_drop_empty_fields(dataset):
+    store = yte_tool.get_store()
+    result = yte_tool.yte_result('bệnh nhân 3 9999')['result']
+    found, missing = result['patients']
+    record = store.record(store.index.row_of(3))
+    assert found['record'] == yte_tool._compact({k: v for k, v in record.items() if v not in (None, '')})
+    assert missing['found'] is False and len(missing['nearest']) > 0
+
+
+def test_list_page_and_help_payloads(dataset):
+    page = yte_tool.yte_result('danh sách bệnh nhân nữ')
+    assert page['filters'] == {'gender': 'Nữ'}
+    assert {'total', 'offset', 'version', 'patients', 'next_cursor'} <= set(page['result'])
+    help_result = yte_tool.yte_result('xin chào')
+    assert help_result['intent'] is None
+    assert help_result['result'] == {'total_patients': 500, 'analyses': list(yte_tool._SUMMARIES) + ['patient']}
+
+
+def test_error_payload(dataset):
+    result = yte_tool.yte_result('danh sách bệnh nhân', cursor='!!!')
+    assert result['status'] == 'error' and result['error_message']
+    assert yte_tool.render_result(result) == f"❌ {result['error_message']}"
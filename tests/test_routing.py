@@ -0,0 +1,57 @@
+import pytest
+
+import yte_tool
+from yte_bench import ROUTING_CASES, routing_accuracy
+
+
+@pytest.mark.parametrize('query, intent, expected', ROUTING_CASES, ids=[case[0] for case in ROUTING_CASES])
+def test_routing_cases(query, intent, expected):
+    result = yte_tool._classify_intent(query)
+    assert result.intent == intent
+    if 'ids' in expected:
+        assert result.ids == expected['ids']
+    assert result.filters == expected.get('filters', {})
+
+
+def test_cached_classifier_matches_uncached():
+    assert routing_accuracy() == (1.0, [])
+    for query, _, _ in ROUTING_CASES:
+        assert yte_tool.classify_intent(query) == yte_tool._classify_intent(query)
+
+
+@pytest.mark.parametrize('query, header', [
+    ("thống kê bệnh nhân năm 2025", "THỐNG KÊ TỔNG QUAN"),
+    ("tổng quan bệnh nhân 2025", "THỐNG KÊ TỔNG QUAN"),
+    ("bệnh nhân 60 tuổi", "DANH SÁCH BỆNH NHÂN"),
+    ("bệnh nhân trên 60", "DANH SÁCH BỆNH NHÂN"),
+    ("bệnh nhân 7", "CHI TIẾT BỆNH NHÂN ID 7"),
+])
+def test_numbers_route_to_the_right_report(dataset, query, header):
+    assert header in yte_tool.yte(query)
+
+
+@pytest.mark.parametrize('query, header', [
+    ("bmi bệnh nhân nữ", "PHÂN TÍCH BMI"),
+    ("bmi của bệnh nhân", "PHÂN TÍCH BMI"),
+    ("overview bệnh nhân", "THỐNG KÊ TỔNG QUAN"),
+    ("surgery bệnh nhân", "PHÂN TÍCH PHẪU THUẬT"),
+    ("stone bệnh nhân", "PHÂN TÍCH LOẠI SỎI"),
+    ("pt bệnh nhân nữ", "PHÂN TÍCH PHẪU THUẬT"),
+    ("sỏi bệnh nhân nam", "PHÂN TÍCH LOẠI SỎI"),
+    ("danh sách bệnh nhân nữ", "DANH SÁCH BỆNH NHÂN"),
+])
+def test_patient_is_a_weak_subject_word(dataset, query, header):
+    assert header in yte_tool.yte(query)
+
+
+@pytest.mark.parametrize('short, long', [("pt", "phẫu thuật"), ("stone", "loại sỏi"), ("bmi", "cân nặng")])
+def test_keyword_length_does_not_change_the_score(short, long):
+    scores = yte_tool._classify_intent(f"{short} {long}").scores
+    assert scores[yte_tool._classify_intent(short).intent] == 2
+    assert yte_tool._classify_intent(f"{long} bệnh nhân").intent == yte_tool._classify_intent(short).intent
+
+
+def test_result_filters_are_not_shared_with_the_cache(dataset):
+    payload = yte_tool.yte_result("bệnh nhân trên 60")
+    payload['filters']['age_min'] = 0
+    assert yte_tool.classify_intent("bệnh nhân trên 60").filters == {'age_min': 61}
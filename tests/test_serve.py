@@ -0,0 +1,128 @@
+import importlib.util
+import os
+import signal
+import socket
+import time
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason="Supervisor cần fork (POSIX)")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def serve():
+    """multi_tool_agent/serve.py nạp theo đường dẫn (package multi_tool_agent import ADK)"""
+    spec = importlib.util.spec_from_file_location('yte_serve', os.path.join(ROOT, 'multi_tool_agent', 'serve.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def supervisor(serve, monkeypatch):
+    monkeypatch.setattr(serve, 'HEALTH_TIMEOUT', 5)
+    monkeypatch.setattr(serve, 'GRACEFUL_TIMEOUT', 0.5)
+    sock = socket.socket()
+    created = []
+
+    def make(serve_worker, workers=2):
+        created.append(serve.Supervisor(sock, workers, serve_worker))
+        return created[-1]
+
+    yield make
+    for sup in created:
+        for pid in list(sup.workers):
+            sup._kill(pid, signal.SIGKILL)
+        while sup.workers:
+            sup.reap()
+            time.sleep(0.01)
+    sock.close()
+
+
+def _beating(sock, slot, heartbeats):
+    while True:
+        heartbeats[slot] = time.monotonic()
+        time.sleep(0.02)
+
+
+def _draining(sock, slot, heartbeats):
+    """Worker bỏ qua SIGTERM: mô phỏng worker cũ còn đang xử lý request khi dừng"""
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    _beating(sock, slot, heartbeats)
+
+
+def _wait(condition, timeout=5.0, tick=None):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "hết thời gian chờ"
+        if tick:
+            tick()
+        time.sleep(0.02)
+
+
+def test_no_free_slot_returns_none_instead_of_raising(serve, supervisor):
+    sup = supervisor(_beating, workers=2)
+    assert len(sup.heartbeats) == 2 * serve.SLOT_GENERATIONS
+    sup.workers = {1000 + slot: slot for slot in range(len(sup.heartbeats))}
+    assert sup._free_slot() is None
+    assert sup.spawn() is None
+    sup.workers.clear()
+
+
+def test_restart_is_deferred_until_a_generation_fits(supervisor):
+    sup = supervisor(_beating, workers=2)
+    restarts = []
+    sup.rolling_restart = lambda: restarts.append(True)
+    sup.workers = {1000 + slot: slot for slot in range(5)}
+    sup.retiring = {1000: 0.0, 1001: 0.0, 1002: 0.0}
+    sup.restart_pending = True
+
+    assert not sup.maybe_restart() and sup.restart_pending
+    del sup.workers[1000], sup.retiring[1000]
+    assert sup.maybe_restart() and not sup.restart_pending
+    assert restarts == [True]
+    sup.workers.clear()
+
+
+def test_dead_worker_is_replaced_in_its_slot(supervisor):
+    sup = supervisor(_beating)
+    sup.fill()
+    assert len(sup.workers) == 2
+    victim, slot = next(iter(sup.workers.items()))
+    os.kill(victim, signal.SIGKILL)
+    _wait(lambda: victim not in sup.workers, tick=sup.reap)
+
+    sup.fill()
+    assert len(sup.serving()) == 2
+    assert sorted(sup.workers.values()) == [0, 1]
+    assert slot in sup.workers.values()
+
+
+def test_repeated_restarts_while_old_workers_drain(supervisor):
+    sup = supervisor(_draining)
+    sup.fill()
+    _wait(lambda: all(sup.is_ready(pid) for pid in sup.workers))
+    first = set(sup.workers)
+
+    for _ in range(3):
+        sup.restart_pending = True
+        sup.maybe_restart()
+    # Hai thế hệ cũ còn đang dừng: lần khởi động lại thứ ba được hoãn, không lỗi
+    assert len(sup.workers) == len(sup.heartbeats)
+    assert sup.restart_pending
+    assert first <= set(sup.retiring)
+    assert len(sup.serving()) == 2
+
+    # Worker cũ quá GRACEFUL_TIMEOUT bị buộc dừng, slot được trả lại và lần hoãn được chạy
+    _wait(lambda: not sup.retiring, tick=lambda: (sup.check_health(), sup.reap()))
+    assert sup.maybe_restart()
+    assert len(sup.serving()) == 2 and not first & set(sup.workers)
+
+
+def test_shutdown_drains_all_workers(supervisor):
+    sup = supervisor(_beating)
+    sup.fill()
+    sup.shutdown()
+    assert not sup.workers and sup.stopping
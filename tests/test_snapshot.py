@@ -0,0 +1,131 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import yte_tool
+
+
+def _assert_same_store(actual, expected):
+    """Cùng ID, cột số và giá trị các cột văn bản (mã từ điển có thể khác thứ tự)"""
+    np.testing.assert_array_equal(actual.ids, expected.ids)
+    assert sorted(actual.numeric) == sorted(expected.numeric)
+    for field, values in expected.numeric.items():
+        np.testing.assert_array_equal(actual.numeric[field], values, err_msg=field)
+    assert sorted(actual.codes) == sorted(expected.codes)
+    for field in expected.codes:
+        np.testing.assert_array_equal(actual.decode(field), expected.decode(field), err_msg=field)
+
+
+def _assert_same_stats(actual, expected):
+    for name, value in vars(expected).items():
+        other = getattr(actual, name)
+        if isinstance(value, yte_tool.RunningStat):
+            assert (other.count, other.min, other.max) == (value.count, value.min, value.max), name
+            assert other.total == pytest.approx(value.total), name
+        elif isinstance(value, dict) and any(isinstance(v, yte_tool.RunningStat) for v in value.values()):
+            assert {k: (v.count, v.min, v.max) for k, v in other.items()} == \
+                   {k: (v.count, v.min, v.max) for k, v in value.items()}, name
+        else:
+            assert other == value, name
+
+
+@pytest.fixture
+def csv_path(make_csv, cache_dir):
+    return make_csv('OK-2.csv', 300, seed=3)
+
+
+def _parse_without_snapshot(path, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setenv('YTE_SNAPSHOT', '0')
+        return yte_tool.load_patient_store(path)
+
+
+def _set_mtime(path, offset_ns):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + offset_ns))
+
+
+def test_snapshot_is_reused_while_csv_is_unchanged(csv_path, monkeypatch):
+    parsed = yte_tool.load_patient_store(csv_path)
+    assert not isinstance(parsed.ids, np.memmap)
+    assert os.path.exists(os.path.join(yte_tool.snapshot_dir(csv_path), 'meta.json'))
+
+    cached = yte_tool.load_patient_store(csv_path)
+    assert isinstance(cached.ids, np.memmap)
+    _assert_same_store(cached, parsed)
+    assert cached.quality == parsed.quality
+
+
+def test_snapshot_survives_touch(csv_path):
+    yte_tool.load_patient_store(csv_path)
+    _set_mtime(csv_path, 5 * 10**9)
+
+    store = yte_tool.load_snapshot(csv_path)
+    assert store is not None
+    # Nội dung giữ nguyên: meta được cập nhật mtime mới, lần sau không phải băm lại
+    with open(os.path.join(yte_tool.snapshot_dir(csv_path), 'meta.json'), encoding='utf-8') as f:
+        assert json.load(f)['source']['mtime_ns'] == os.stat(csv_path).st_mtime_ns
+
+
+def test_snapshot_invalidated_when_content_changes_with_same_size(csv_path, monkeypatch):
+    yte_tool.load_patient_store(csv_path)
+    with open(csv_path, encoding='utf-8') as f:
+        lines = f.readlines()
+    # Đổi chỗ hai dòng dữ liệu: cùng kích thước, khác nội dung
+    lines[1], lines[2] = lines[2], lines[1]
+    with open(csv_path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    _set_mtime(csv_path, 5 * 10**9)
+
+    assert yte_tool.load_snapshot(csv_path) is None
+    reloaded = yte_tool.load_patient_store(csv_path)
+    assert not isinstance(reloaded.ids, np.memmap)
+    _assert_same_store(reloaded, _parse_without_snapshot(csv_path, monkeypatch))
+    assert isinstance(yte_tool.load_patient_store(csv_path).ids, np.memmap)
+
+
+def test_snapshot_invalidated_when_size_changes(csv_path, make_csv, monkeypatch):
+    yte_tool.load_patient_store(csv_path)
+    make_csv('OK-2.csv', 310, seed=3)
+
+    assert yte_tool.load_snapshot(csv_path) is None
+    assert len(yte_tool.load_patient_store(csv_path)) == 310
+
+
+def test_corrupt_snapshot_falls_back_to_csv(csv_path):
+    expected = len(yte_tool.load_patient_store(csv_path))
+    with open(os.path.join(yte_tool.snapshot_dir(csv_path), 'meta.json'), 'w', encoding='utf-8') as f:
+        f.write('{')
+    assert len(yte_tool.load_patient_store(csv_path)) == expected
+
+
+
+
+def test_touch_refresh_replaces_meta_atomically(csv_path, monkeypatch):
+    yte_tool.load_patient_store(csv_path)
+    target = yte_tool.snapshot_dir(csv_path)
+    meta_path = os.path.join(target, 'meta.json')
+    _set_mtime(csv_path, 5 * 10**9)
+
+    # Ghi lỗi giữa chừng: meta.json cũ còn nguyên vẹn, không để lại file tạm
+    def failing_dump(obj, f, **kwargs):
+        f.write('{"format":')
+        raise OSError("disk full")
+
+    with open(meta_path, encoding='utf-8') as f:
+        before = f.read()
+    with monkeypatch.context() as m:
+        m.setattr(yte_tool.json, 'dump', failing_dump)
+        with pytest.raises(OSError):
+            yte_tool.load_snapshot(csv_path)
+    with open(meta_path, encoding='utf-8') as f:
+        assert f.read() == before
+    assert not [name for name in os.listdir(target) if name.startswith('.meta-')]
+
+    # Ghi thành công: thay bằng inode mới chứ không ghi đè tại chỗ
+    inode = os.stat(meta_path).st_ino
+    assert yte_tool.load_snapshot(csv_path) is not None
+    assert os.stat(meta_path).st_ino != inode
+    assert not [name for name in os.listdir(target) if name.startswith('.meta-')]
@@ -0,0 +1,90 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import yte_tool
+
+
+@pytest.fixture
+def store(make_csv, cache_dir):
+    return yte_tool.load_csv_files([make_csv('a.csv', 600, seed=6)], workers=1)
+
+
+def _present(value):
+    return value is not None and not (isinstance(value, float) and math.isnan(value)) and value != ''
+
+
+def _summary(values):
+    return (len(values), min(values), max(values), pytest.approx(sum(values))) if values else (0, None, None, 0.0)
+
+
+def _stat(stat):
+    return (stat.count, stat.min, stat.max, stat.total)
+
+
+def test_single_pass_matches_per_report_scans(store):
+    """Một lượt update() cho cùng số liệu như các vòng quét riêng của từng báo cáo cũ"""
+    patients = [store.record(row) for row in range(len(store))]
+    stats = store.build_stats()
+
+    assert stats.total == len(patients)
+    assert stats.gender == Counter(p['gender'] for p in patients if p['gender'])
+    assert stats.stone_type == Counter(p['stone_type'] for p in patients if p['stone_type'])
+    assert stats.surgery_result == Counter(p['surgery_result'] for p in patients if p['surgery_result'])
+    assert stats.surgery_result_missing == sum(1 for p in patients if not p['surgery_result'])
+    assert stats.complications == sum(1 for p in patients if p['complications'])
+
+    assert _stat(stats.age) == _summary([p['age'] for p in patients if _present(p['age'])])
+    for gender in stats.gender:
+        assert _stat(stats.age_by_gender[gender]) == _summary(
+            [p['age'] for p in patients if p['gender'] == gender and _present(p['age'])])
+    assert _stat(stats.surgery_time) == _summary(
+        [p['surgery_time_minutes'] for p in patients if _present(p['surgery_time_minutes']) and p['surgery_time_minutes']])
+
+    both = [p for p in patients if _present(p['height']) and p['height'] and _present(p['weight']) and p['weight']]
+    assert _stat(stats.height) == _summary([p['height'] for p in both])
+    assert _stat(stats.weight) == _summary([p['weight'] for p in both])
+    # BMI tính lại từ chiều cao/cân nặng như báo cáo gốc, không dùng cột BMI đã làm tròn
+    bmis = [p['weight'] / (p['height'] / 100) ** 2 for p in both]
+    assert stats.bmi.count == len(bmis)
+    assert (stats.bmi.min, stats.bmi.max, stats.bmi.total) == pytest.approx((min(bmis), max(bmis), sum(bmis)))
+    assert stats.bmi_classes == [
+        sum(1 for bmi in bmis if bmi < 18.5), sum(1 for bmi in bmis if 18.5 <= bmi < 25),
+        sum(1 for bmi in bmis if 25 <= bmi < 30), sum(1 for bmi in bmis if bmi >= 30)]
+
+
+def test_incremental_updates_match_one_pass(store):
+    """Cộng dồn theo từng phần (như khi thêm dòng mới) bằng tính một lần trên toàn bộ"""
+    whole = store.build_stats()
+    parts = yte_tool.CohortStats()
+    for start, stop in [(0, 1), (1, 250), (250, 251), (251, 600)]:
+        parts.update(store, slice(start, stop))
+
+    for name, value in vars(whole).items():
+        other = getattr(parts, name)
+        if isinstance(value, yte_tool.RunningStat):
+            assert _stat(other)[:3] == _stat(value)[:3], name
+            assert other.total == pytest.approx(value.total), name
+        elif isinstance(value, dict) and value and isinstance(next(iter(value.values())), yte_tool.RunningStat):
+            assert {k: _stat(v)[:3] for k, v in other.items()} == {k: _stat(v)[:3] for k, v in value.items()}, name
+        else:
+            assert other == value, name
+
+
+def test_copy_is_independent(store):
+    stats = store.build_stats()
+    snapshot = stats.copy()
+    stats.update(store, slice(0, 10))
+    assert snapshot.total == len(store) and stats.total == len(store) + 10
+    assert snapshot.age.count < stats.age.count
+    assert sum(snapshot.gender.values()) < sum(stats.gender.values())
+
+
+def test_reports_read_counters_without_rescanning(dataset, monkeypatch):
+    store = yte_tool.get_store()
+    monkeypatch.setattr(yte_tool.CohortStats, 'update', lambda *args: pytest.fail("báo cáo không được quét lại"))
+    for intent in ('overview', 'gender', 'stone', 'surgery', 'bmi'):
+        assert yte_tool._SUMMARIES[intent](store, store.stats)
+    assert np.isclose(store.stats.age.mean, np.nanmean(store.numeric['age']))
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import yte_tool
+
+
+def _assert_same_store(actual, expected):
+    """Cùng ID, cột số và giá trị các cột văn bản (mã từ điển có thể khác thứ tự)"""
+    np.testing.assert_array_equal(actual.ids, expected.ids)
+    assert sorted(actual.numeric) == sorted(expected.numeric)
+    for field, values in expected.numeric.items():
+        np.testing.assert_array_equal(actual.numeric[field], values, err_msg=field)
+    assert sorted(actual.codes) == sorted(expected.codes)
+    for field in expected.codes:
+        np.testing.assert_array_equal(actual.decode(field), expected.decode(field), err_msg=field)
+
+
+def _assert_same_stats(actual, expected):
+    for name, value in vars(expected).items():
+        other = getattr(actual, name)
+        if isinstance(value, yte_tool.RunningStat):
+            assert (other.count, other.min, other.max) == (value.count, value.min, value.max), name
+            assert other.total == pytest.approx(value.total), name
+        elif isinstance(value, dict) and any(isinstance(v, yte_tool.RunningStat) for v in value.values()):
+            assert {k: (v.count, v.min, v.max) for k, v in other.items()} == \
+                   {k: (v.count, v.min, v.max) for k, v in value.items()}, name
+        else:
+            assert other == value, name
+
+
+@pytest.fixture
+def csv_path(make_csv, cache_dir):
+    return make_csv('OK-2.csv', 300, seed=3)
+
+
+def _parse_without_snapshot(path, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setenv('YTE_SNAPSHOT', '0')
+        return yte_tool.load_patient_store(path)
+
+
+def test_streaming_ingest_matches_normal_load(csv_path, monkeypatch):
+    progress = []
+    streamed = yte_tool.ingest_csv_streaming(csv_path, chunk_rows=70,
+                                             progress=lambda rows, done, total: progress.append(rows))
+    parsed = _parse_without_snapshot(csv_path, monkeypatch)
+
+    assert progress == [70, 140, 210, 280, 300]
+    assert isinstance(streamed.ids, np.memmap)
+    _assert_same_store(streamed, parsed)
+    assert streamed.quality == parsed.quality
+    _assert_same_stats(streamed.stats, parsed.build_stats())
+
+
+def test_large_file_is_streamed_by_load_patient_store(csv_path, monkeypatch):
+    monkeypatch.setattr(yte_tool, 'STREAMING_THRESHOLD_BYTES', 0)
+    streamed = yte_tool.load_patient_store(csv_path)
+
+    assert isinstance(streamed.ids, np.memmap)
+    assert streamed.stats is not None
+    _assert_same_store(streamed, _parse_without_snapshot(csv_path, monkeypatch))
+
+
+def test_streaming_reads_bounded_chunks(make_csv, cache_dir, monkeypatch):
+    """Mỗi khối được ghi ra snapshot rồi bỏ: không giữ DataFrame toàn file"""
+    path = make_csv('big.csv', 2000, seed=5)
+    sizes = []
+    original = yte_tool.pd.read_csv
+
+    def tracking(*args, **kwargs):
+        for chunk in original(*args, **kwargs):
+            sizes.append(len(chunk))
+            yield chunk
+
+    monkeypatch.setattr(yte_tool.pd, 'read_csv', tracking)
+    store = yte_tool.ingest_csv_streaming(path, chunk_rows=256)
+    assert len(store) == 2000
+    assert max(sizes) <= 256
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import re
+
+import pytest
+
+import yte_telemetry as telemetry
+import yte_tool
+
+
+@pytest.fixture
+def enabled():
+    telemetry.reset()
+    telemetry.enable()
+    yield
+    telemetry.enable(False)
+    telemetry.reset()
+
+
+def _spans():
+    return telemetry.export_otlp_json()['resourceSpans'][0]['scopeSpans'][0]['spans']
+
+
+def _attributes(span):
+    return {item['key']: next(iter(item['value'].values())) for item in span['attributes']}
+
+
+def test_disabled_telemetry_records_nothing():
+    telemetry.reset()
+    with telemetry.span('load') as current:
+        current.set_attribute('rows', 1)
+    assert current is telemetry._NOOP
+    assert _spans() == []
+    assert telemetry.export_prometheus().count('_bucket') == 0
+
+
+def test_nested_spans_share_trace_and_record_errors(enabled):
+    with telemetry.span('outer', rows=3):
+        telemetry.event("bắt đầu", step=1)
+        with pytest.raises(ValueError):
+            with telemetry.span('inner'):
+                raise ValueError("hỏng")
+    inner, outer = _spans()
+    assert (inner['name'], outer['name']) == ('inner', 'outer')
+    assert inner['traceId'] == outer['traceId'] and inner['parentSpanId'] == outer['spanId']
+    assert outer['parentSpanId'] == ''
+    assert inner['status'] == {'code': 2, 'message': 'ValueError: hỏng'} and outer['status'] == {'code': 1}
+    assert outer['events'][0]['name'] == "bắt đầu"
+    assert int(outer['endTimeUnixNano']) >= int(inner['endTimeUnixNano']) >= int(inner['startTimeUnixNano'])
+
+
+def test_tool_call_spans_and_latency_histogram(enabled, dataset):
+    yte_tool.get_store()
+    telemetry.reset()
+    yte_tool.yte('giới tính')
+    asyncio.run(yte_tool.yte_query_async(gender='Nữ', metric='mean_age'))
+
+    spans = {span['name']: span for span in _spans()}
+    tool = spans['tool.yte']
+    assert _attributes(tool) == {'tool': 'yte', 'intent': 'gender'}
+    assert spans['dispatch']['parentSpanId'] == tool['spanId']
+    assert spans['render']['traceId'] == tool['traceId']
+    assert _attributes(spans['tool.yte_query'])['intent'] == 'query:mean_age'
+
+    series = telemetry.TOOL_DURATION.snapshot()
+    assert series[(('intent', 'gender'), ('tool', 'yte'))][2] == 1
+    assert series[(('intent', 'query:mean_age'), ('tool', 'yte_query'))][2] == 1
+
+
+def test_batch_partitions_nest_under_batch_span(enabled, dataset):
+    yte_tool.run_batch(['overview'], partition_by=('month',), workers=4)
+    spans = _spans()
+    batch = next(span for span in spans if span['name'] == 'batch')
+    partitions = [span for span in spans if span['name'] == 'aggregate' and 'partition' in _attributes(span)]
+    assert partitions and all(span['parentSpanId'] == batch['spanId'] for span in partitions)
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = telemetry.Histogram('h', 'help', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, tool='yte')
+    assert histogram.snapshot() == {(('tool', 'yte'),): ([2, 3], pytest.approx(3.65), 4)}
+
+
+def test_prometheus_exposition_format(enabled, monkeypatch):
+    histogram = telemetry.Histogram('yte_test_seconds', 'Thử', buckets=(0.01, 0.1))
+    monkeypatch.setattr(telemetry, 'HISTOGRAMS', [histogram])
+    histogram.observe(0.005, tool='yte', intent='a"b')
+    histogram.observe(0.5, tool='yte', intent='a"b')
+    assert telemetry.export_prometheus().splitlines() == [
+        '# HELP yte_test_seconds Thử',
+        '# TYPE yte_test_seconds histogram',
+        'yte_test_seconds_bucket{intent="a\\"b",tool="yte",le="0.01"} 1',
+        'yte_test_seconds_bucket{intent="a\\"b",tool="yte",le="0.1"} 1',
+        'yte_test_seconds_bucket{intent="a\\"b",tool="yte",le="+Inf"} 2',
+        'yte_test_seconds_sum{intent="a\\"b",tool="yte"} 0.505',
+        'yte_test_seconds_count{intent="a\\"b",tool="yte"} 2',
+    ]
+
+
+def test_otlp_json_format(enabled, tmp_path):
+    with telemetry.span('aggregate', rows=5, ratio=0.5, cube=True, intent='bmi'):
+        pass
+    paths = telemetry.write_exports(str(tmp_path))
+    with open(paths[0], encoding='utf-8') as f:
+        payload = json.load(f)
+    resource = payload['resourceSpans'][0]
+    assert resource['resource']['attributes'] == [{'key': 'service.name', 'value': {'stringValue': 'yte'}}]
+    span = resource['scopeSpans'][0]['spans'][0]
+    assert re.fullmatch('[0-9a-f]{32}', span['traceId']) and re.fullmatch('[0-9a-f]{16}', span['spanId'])
+    assert span['kind'] == 1 and span['startTimeUnixNano'].isdigit()
+    assert span['attributes'] == [
+        {'key': 'rows', 'value': {'intValue': '5'}}, {'key': 'ratio', 'value': {'doubleValue': 0.5}},
+        {'key': 'cube', 'value': {'boolValue': True}}, {'key': 'intent', 'value': {'stringValue': 'bmi'}}]
+    with open(paths[1], encoding='utf-8') as f:
+        assert 'yte_span_duration_seconds_count{span="aggregate"} 1' in f.read()
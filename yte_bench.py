@@ -0,0 +1,443 @@
+"""
+Benchmark cho Tool Y Tế
+- intents: độ trễ phân loại intent và độ chính xác định tuyến trên bộ câu hỏi có nhãn
+- generate: sinh file CSV giả lập cùng schema OK-2.csv (không chứa dữ liệu bệnh nhân thật)
+- suite: thời gian load, bộ nhớ đỉnh và độ trễ yte() theo intent ở 1k/100k/1M dòng,
+  lưu kết quả vào bench_results/ và so sánh với lần chạy trước
+
+Chạy: python yte_bench.py intents
+      python yte_bench.py generate --rows 100000 --out data.csv
+      python yte_bench.py suite [--rows 1000,100000,1000000]
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from yte_tool import _classify_intent, classify_intent
+
+# (câu hỏi, intent mong đợi, tham số mong đợi) - gồm các ví dụ trong phần trợ giúp của yte()
+ROUTING_CASES: List[Tuple[str, Optional[str], Dict[str, Any]]] = [
+    # Ví dụ trong phần trợ giúp
+    ("tổng quan bệnh nhân", 'overview', {}),
+    ("phân tích giới tính", 'gender', {}),
+    ("bệnh nhân ID 1", 'patient', {'ids': [1]}),
+    ("loại sỏi phổ biến", 'stone', {}),
+    ("tổng quan", 'overview', {}),
+    ("giới tính", 'gender', {}),
+    ("sỏi", 'stone', {}),
+    ("bệnh nhân 3", 'patient', {'ids': [3]}),
+    ("phẫu thuật", 'surgery', {}),
+    ("bmi", 'bmi', {}),
+    # Không dấu và tiếng Anh
+    ("tong quan", 'overview', {}),
+    ("thong ke benh nhan", 'overview', {}),
+    ("gioi tinh", 'gender', {}),
+    ("loai soi", 'stone', {}),
+    ("benh nhan 7", 'patient', {'ids': [7]}),
+    ("phau thuat", 'surgery', {}),
+    ("can nang", 'bmi', {}),
+    ("overview", 'overview', {}),
+    ("patient 12", 'patient', {'ids': [12]}),
+    ("surgery outcome", 'surgery', {}),
+    # Các trường hợp router cũ định tuyến sai
+    ("bệnh nhân 5 bị sỏi gì", 'patient', {'ids': [5]}),
+    ("chi tiết bệnh nhân 2 và 4", 'patient', {'ids': [2, 4]}),
+    ("optimal bmi", 'bmi', {}),
+    ("kết quả phẫu thuật nữ trên 60 tuổi", 'surgery', {'filters': {'gender': 'Nữ', 'age_min': 61}}),
+    ("béo phì ở nam từ 40 đến 60 tuổi", 'bmi', {'filters': {'gender': 'Nam', 'age_min': 40, 'age_max': 60}}),
+    ("tổng quan bệnh nhân dưới 50 tuổi", 'overview', {'filters': {'age_max': 49}}),
+    ("phân bố nam nữ", 'gender', {}),
+    ("năm sinh", None, {}),
+    ("thời tiết hôm nay", None, {}),
+    # Số không phải ID: năm, tháng, tuổi
+    ("thống kê bệnh nhân năm 2025", 'overview', {'ids': []}),
+    ("tổng quan bệnh nhân 2025", 'overview', {'ids': []}),
+    ("bệnh nhân 60 tuổi", 'patient', {'ids': [], 'filters': {'age_min': 60, 'age_max': 60}}),
+    ("bệnh nhân trên 60", 'patient', {'ids': [], 'filters': {'age_min': 61}}),
+    ("số bệnh nhân phẫu thuật tháng 7", 'surgery', {'ids': []}),
+    ("bệnh nhân ID 2025", 'patient', {'ids': [2025]}),
+    # "bệnh nhân" chỉ là chủ ngữ: từ khóa báo cáo (một hay nhiều từ) thắng khi không có ID
+    ("bmi bệnh nhân nữ", 'bmi', {'filters': {'gender': 'Nữ'}}),
+    ("bmi của bệnh nhân", 'bmi', {}),
+    ("overview bệnh nhân", 'overview', {}),
+    ("surgery bệnh nhân", 'surgery', {}),
+    ("stone bệnh nhân", 'stone', {}),
+    ("pt bệnh nhân nữ", 'surgery', {'filters': {'gender': 'Nữ'}}),
+    ("sỏi bệnh nhân nam", 'stone', {'filters': {'gender': 'Nam'}}),
+    ("danh sách bệnh nhân nữ", 'patient', {'ids': [], 'filters': {'gender': 'Nữ'}}),
+    ("bmi bệnh nhân 4", 'patient', {'ids': [4]}),
+]
+
+
+def _legacy_dispatch(query: str) -> Optional[str]:
+    """Router cũ của yte(): quét chuỗi con lần lượt theo từng danh sách từ khóa"""
+    query_lower = query.lower()
+    if any(keyword in query_lower for keyword in ["tổng quan", "overview", "thống kê", "tong quan"]):
+        return 'overview'
+    elif any(keyword in query_lower for keyword in ["giới tính", "gender", "nam nữ", "gioi tinh"]):
+        return 'gender'
+    elif any(keyword in query_lower for keyword in ["sỏi", "stone", "loại sỏi", "soi"]):
+        return 'stone'
+    elif any(keyword in query_lower for keyword in ["bệnh nhân", "patient", "id", "benh nhan"]):
+        return 'patient'
+    elif any(keyword in query_lower for keyword in ["phẫu thuật", "pt", "surgery", "phau thuat"]):
+        return 'surgery'
+    elif any(keyword in query_lower for keyword in ["bmi", "cân nặng", "béo phì", "can nang"]):
+        return 'bmi'
+    return None
+
+
+def routing_accuracy(dispatch=None) -> Tuple[float, List[str]]:
+    """Tỷ lệ câu hỏi được định tuyến đúng (kèm đúng tham số) và danh sách lỗi"""
+    failures = []
+    for query, expected_intent, expected in ROUTING_CASES:
+        if dispatch is not None:
+            intent, ids, filters = dispatch(query), None, None
+        else:
+            result = classify_intent(query)
+            intent, ids, filters = result.intent, result.ids, result.filters
+        ok = intent == expected_intent
+        if ids is not None and 'ids' in expected:
+            ok = ok and ids == expected['ids']
+        if filters is not None:
+            ok = ok and filters == expected.get('filters', {})
+        if not ok:
+            failures.append(f"{query!r}: {intent} (mong đợi {expected_intent} {expected})")
+    return 1 - len(failures) / len(ROUTING_CASES), failures
+
+
+def bench_dispatch(dispatch, repeat: int = 2000) -> float:
+    """Độ trễ trung bình (micro giây) mỗi lần định tuyến trên bộ câu hỏi có nhãn"""
+    queries = [query for query, _, _ in ROUTING_CASES]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            dispatch(query)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1e6
+
+
+def run_intents(argv: Optional[List[str]] = None):
+    accuracy, failures = routing_accuracy()
+    legacy_accuracy, _ = routing_accuracy(_legacy_dispatch)
+    print(f"🎯 Độ chính xác định tuyến: {accuracy*100:.1f}% (router cũ: {legacy_accuracy*100:.1f}%)")
+    for failure in failures:
+        print(f"   ❌ {failure}")
+    print(f"⏱️ classify_intent: {bench_dispatch(classify_intent):.2f} µs/câu hỏi")
+    print(f"⏱️ classify_intent không cache: {bench_dispatch(_classify_intent):.2f} µs/câu hỏi")
+    print(f"⏱️ router cũ (chỉ chọn intent): {bench_dispatch(_legacy_dispatch):.2f} µs/câu hỏi")
+    return 0 if not failures else 1
+
+
+# Tiêu đề đầy đủ 107 cột của OK-2.csv: giữ nguyên dấu cách ở cuối và các cột trùng tên
+OK2_HEADER = [
+    'Năm sinh ', 'Giới tính', 'Ngày nhập viện ', 'Chiều cao', 'Cân nặng ', 'BMI', 'Tiền căn đã mổ sỏi thận ',
+    'Số lần mổ sỏi thận (Trái) ', 'Số lần mổ sỏi thận (Phải)', 'Tán sỏi ngoài cơ thể ',
+    'Số lần tán sỏi ngoài cơ thể (Trái) ', 'Số lần tán sỏi ngoài cơ thể (Phải)', 'Tán sỏi nội soi ngược chiều ',
+    'Số lần tán sỏi nội soi ngược chiều (Trái)', 'Số lần tán sỏi nội soi ngược chiều (Phải)', 'Tiền căn nội khoa ',
+    'BC/Neu (K/uL) ', 'PLT (K/uL)', 'Hct (%) ', 'Hb (g/dL)', 'Ure', 'Creatinin ', 'eGFR', 'TPT nước tiểu: HC',
+    'TPT nước tiểu: BC', 'TPT nước tiểu: Nitrite ', 'Kết quả cấy nước tiểu lần 1 (ESBL) ',
+    'Kết quả cấy nước tiểu lần 1 (ESBL) ', 'Kết quả cấy nước tiểu lần 2 (ESBL) ',
+    'Kết quả cấy nước tiểu lần 2 (ESBL) ', 'postopBC/Neu (K/uL) ', 'postopPLT (K/uL)', 'postopHct (%) ',
+    'postopHb (g/dL)', 'postopUre', 'postopCreatinin', 'postopeGFR', 'Thận (T)', 'Thận (P)',
+    'Số lượng đài thận trên  ', 'Số lượng đài thận giữa', 'Số lượng đài thận dưới ', 'Số lượng sỏi ',
+    'Kích thước sỏi 3 chiều (khối lớn nhất) ', 'Vị trí các viên còn lại (kích thước nếu > 4mm)', 'HU',
+    'Sỏi có nhánh vào đài thận ', 'Sỏi có nhánh vào đài thận trên (bao nhiêu đài) ',
+    'Sỏi có nhánh vào đài thận giữa (bao nhiêu đài) ', 'Sỏi có nhánh vào đài thận dưới (bao nhiêu đài) ',
+    'Loại sỏi ', 'Đã có double-J', 'Kháng sinh dự phòng ', 'Kháng sinh trước PT (số ngày):', 'Ngày PT', 'Tư thế',
+    'Chọc dò bằng ', 'Nong đường hầm', 'Kích thước', 'Vị trí đài chọc dò', 'Vị trí chọc dò so với xương sườn',
+    'Thời gian tán sỏi (phút)', 'Thời gian phẫu thuật (phút)', 'Tạo thêm đường hầm',
+    'Tạo thêm đường hầm(số lượng/vị trí) ', 'Tổng thời gian C-arm (giây)', 'Dẫn lưu thận', 'Loại ống',
+    'Kích thước (Fr)', 'Thông double-J ', 'Cấy nước tiểu ', 'Truyền máu',
+    'Nếu có truyền máu (số lượng bao nhiêu đơn vị)', 'Biến chứng ', 'Cách xử trí biến chứng ',
+    'Sạch sỏi trên C-arm ngay sau mổ ', 'Nếu sót sỏi trên C-arm ngay sau mổ (số lượng/vị trí/kích thước) ',
+    'Clavien', 'Sốt', 'Đau hông lưng', 'Ngày rút thông thận ', 'Ngày rút thông niệu đạo  ', 'Tiểu máu đại thể',
+    'Thời gian dùng thuốc giảm đau chích sau mổ (ngày)', 'Thời gian điều trị KS (ngày)', 'Biến chứng hậu phẫu ',
+    'Biến chứng hậu phẫu ', 'Xử trí biến chứng (nội khoa)', 'Xử trí biến chứng (ngoại khoa)', 'Đặt JJ sau mổ',
+    'Lý do đặt JJ sau mổ ', 'KUB sau mổ', 'KUB sau mổ - Sót sỏi (số lượng/vị trí/kích thước) ', 'Siêu âm sau mổ ',
+    'Kháng sinh sau PT (số ngày):', 'Siêu âm sau mổ - Sót sỏi (số lượng/vị trí/kích thước) ',
+    'Tán sỏi thận qua da lần hai', 'Ngày xuất viện', 'Tái khám sau bao nhiêu tuần', 'Điều trị bổ sung ', 'Siêu âm',
+    'Siêu âm - Sót sỏi (số lượng/vị trí/kích thước) ', 'Thận (T) ', 'Thận (P) ', 'KUB/CT',
+    'KUB/CT - Sót sỏi (số lượng/vị trí/kích thước) ', 'Rút JJ ',
+]
+
+STONE_TYPES = ['Sỏi bể thận/sỏi niệu quản đơn thuần', 'Sỏi đài đơn thuần', 'Sỏi san hô bán phần',
+               'Sỏi bể/sỏi niệu quản +sỏi đài', 'Sỏi nhiều đài', 'Sỏi san hô toàn phần']
+MEDICAL_HISTORY = ['THA', 'ĐTĐ', 'THA, Suy tim', 'THA, ĐTĐ', 'Viêm gan B']
+RESIDUAL_STONES = ['sỏi đài dưới 5mm', '2 sỏi 4mm đài giữa', 'sỏi đài trên 6mm']
+FIRST_DAY = date(2024, 1, 1).toordinal()
+LAST_DAY = date(2025, 12, 31).toordinal()
+
+
+def _pick(rng: np.random.Generator, choices: List[str], size: int, weights=None) -> np.ndarray:
+    return np.asarray(choices, dtype=object)[rng.choice(len(choices), size=size, p=weights)]
+
+
+def _format_numbers(values: np.ndarray, decimals: int) -> np.ndarray:
+    """Số -> chuỗi kiểu OK-2.csv (dấu phẩy thập phân), định dạng trên các giá trị khác nhau"""
+    values = np.round(values, decimals)
+    uniques, inverse = np.unique(values, return_inverse=True)
+    labels = np.array([f"{u:.{decimals}f}".replace('.', ',') for u in uniques], dtype=object)
+    return labels[inverse]
+
+
+def _format_days(days: np.ndarray) -> np.ndarray:
+    """Số ngày (ordinal) -> chuỗi d/m/yy như trong OK-2.csv"""
+    uniques, inverse = np.unique(days, return_inverse=True)
+    labels = np.array([f"{d.day}/{d.month}/{d.strftime('%y')}" for d in map(date.fromordinal, uniques)],
+                      dtype=object)
+    return labels[inverse]
+
+
+def synthetic_frame(rows: int, seed: int = 0, missing_rate: float = 0.03, error_rate: float = 0.001) -> pd.DataFrame:
+    """DataFrame giả lập theo schema OK-2.csv (cột theo vị trí, đều là chuỗi)
+
+    Có các ô trống ngẫu nhiên (`missing_rate`) ở các cột lâm sàng và một tỷ lệ
+    nhỏ ô sai định dạng (`error_rate`, ví dụ ngày nằm trong cột chiều cao) để
+    báo cáo chất lượng dữ liệu có việc để đếm.
+    """
+    rng = np.random.default_rng(seed)
+    gender = _pick(rng, ['Nam', 'Nữ'], rows, [0.55, 0.45])
+    height = np.where(gender == 'Nam', rng.normal(166, 6, rows), rng.normal(155, 6, rows)).round()
+    weight = (rng.normal(22.5, 3.5, rows) * (height / 100) ** 2).round(1)
+    admission = rng.integers(FIRST_DAY, LAST_DAY, rows)
+    result = _pick(rng, ['Có', 'Sót sỏi'], rows, [0.78, 0.22])
+
+    columns = {
+        'Năm sinh ': rng.integers(1940, 2006, rows).astype(str).astype(object),
+        'Giới tính': gender,
+        'Ngày nhập viện ': _format_days(admission),
+        'Chiều cao': height.astype(int).astype(str).astype(object),
+        'Cân nặng ': _format_numbers(weight, 1),
+        'BMI': np.where(rng.random(rows) < 0.2, _format_numbers(weight / (height / 100) ** 2, 1), ''),
+        'Tiền căn đã mổ sỏi thận ': np.where(rng.random(rows) < 0.2, _pick(rng, ['Phải', 'Trái'], rows), ''),
+        'Tiền căn nội khoa ': np.where(rng.random(rows) < 0.35, _pick(rng, MEDICAL_HISTORY, rows), ''),
+        'PLT (K/uL)': rng.integers(150, 400, rows).astype(str).astype(object),
+        'Hb (g/dL)': _format_numbers(rng.normal(13, 1.5, rows), 1),
+        'Creatinin ': rng.integers(50, 160, rows).astype(str).astype(object),
+        'eGFR': rng.integers(30, 120, rows).astype(str).astype(object),
+        'Số lượng sỏi ': rng.integers(1, 6, rows).astype(str).astype(object),
+        'Kích thước sỏi 3 chiều (khối lớn nhất) ': np.char.add(
+            np.char.add(rng.integers(8, 40, rows).astype(str), ' x '),
+            rng.integers(5, 30, rows).astype(str)).astype(object),
+        'HU': (rng.integers(4, 16, rows) * 100).astype(str).astype(object),
+        'Loại sỏi ': _pick(rng, STONE_TYPES, rows, [0.35, 0.25, 0.15, 0.12, 0.1, 0.03]),
+        'Ngày PT': _format_days(admission + rng.integers(0, 4, rows)),
+        'Tư thế': _pick(rng, ['Nằm sấp', 'Nằm ngửa'], rows, [0.85, 0.15]),
+        'Thời gian phẫu thuật (phút)': (rng.integers(6, 36, rows) * 5).astype(str).astype(object),
+        'Biến chứng ': np.where(rng.random(rows) < 0.08, _pick(rng, ['Sốt', 'Chảy máu', 'Nhiễm trùng'], rows), ''),
+        'Sạch sỏi trên C-arm ngay sau mổ ': result,
+        'Nếu sót sỏi trên C-arm ngay sau mổ (số lượng/vị trí/kích thước) ': np.where(
+            result == 'Sót sỏi', _pick(rng, RESIDUAL_STONES, rows), ''),
+    }
+    for name, values in columns.items():
+        if name not in ('Giới tính', 'Ngày nhập viện '):
+            values[rng.random(rows) < missing_rate] = ''
+    errors = rng.random(rows) < error_rate
+    columns['Chiều cao'][errors] = _format_days(admission[errors])
+
+    frame = pd.DataFrame({position: columns.get(name, '') for position, name in enumerate(OK2_HEADER)})
+    return frame
+
+
+def generate_csv(path: str, rows: int, seed: int = 0, chunk_rows: int = 200000) -> str:
+    """Ghi file CSV giả lập `rows` dòng (theo từng khối để giới hạn bộ nhớ)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerow(OK2_HEADER)
+        for start in range(0, rows, chunk_rows):
+            frame = synthetic_frame(min(chunk_rows, rows - start), seed=seed + start)
+            frame.to_csv(f, header=False, index=False)
+    return path
+
+
+def run_generate(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='yte_bench.py generate', description="Sinh CSV giả lập theo schema OK-2.csv")
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='OK-2-synthetic.csv')
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    generate_csv(args.out, args.rows, args.seed)
+    print(f"✅ Đã sinh {args.rows} dòng vào {args.out} ({time.perf_counter() - start:.1f}s)")
+    return 0
+
+
+# Các câu hỏi đo độ trễ yte(): mỗi intent một câu, thêm tra cứu ID, danh sách và câu có bộ lọc
+LATENCY_QUERIES = {
+    'overview': "tổng quan bệnh nhân",
+    'gender': "phân tích giới tính",
+    'stone': "loại sỏi phổ biến",
+    'surgery': "phẫu thuật",
+    'bmi': "bmi",
+    'patient_id': "bệnh nhân 3 và 500",
+    'patient_list': "bệnh nhân",
+    'filtered': "kết quả phẫu thuật nữ trên 60 tuổi",
+}
+SUITE_ROWS = (1000, 100000, 1000000)
+BENCH_DATA_DIR = '.yte_bench'
+RESULTS_DIR = 'bench_results'
+# Chậm hơn lần trước quá tỷ lệ này (và quá ngưỡng nhiễu đo tuyệt đối theo loại số đo) thì báo là hồi quy
+REGRESSION_THRESHOLD = 0.2
+NOISE_FLOOR = {'load_seconds': 0.05, 'peak_rss_mb': 10.0, 'latency_ms': 1.0}
+
+
+def _median_ms(func, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def measure(csv_path: str, repeat: int = 20) -> Dict[str, Any]:
+    """Đo trong process hiện tại: load (thời gian, RSS đỉnh) rồi độ trễ yte() theo intent"""
+    import yte_tool
+
+    yte_tool.set_data_path(csv_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        rows = yte_tool.warm_up()
+        load_seconds = time.perf_counter() - start
+        # ru_maxrss tính theo KiB trên Linux
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        latency = {}
+        cached = {}
+        for name, query in LATENCY_QUERIES.items():
+            yte_tool.configure_report_cache(maxsize=0)
+            latency[name] = _median_ms(lambda: yte_tool.yte(query), repeat)
+            yte_tool.configure_report_cache(maxsize=yte_tool.REPORT_CACHE_SIZE)
+            yte_tool.yte(query)
+            cached[name] = _median_ms(lambda: yte_tool.yte(query), repeat * 5)
+    return {'rows': rows, 'load_seconds': load_seconds, 'peak_rss_mb': peak_rss_mb,
+            'latency_ms': latency, 'cached_latency_ms': cached}
+
+
+def _measure_in_subprocess(csv_path: str, cache_dir: str, snapshot: bool) -> Dict[str, Any]:
+    """Chạy measure() trong process riêng để thời gian load và RSS đỉnh không lẫn giữa các lần đo"""
+    env = dict(os.environ, YTE_CACHE_DIR=cache_dir, YTE_SNAPSHOT='1' if snapshot else '0')
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), 'measure', '--csv', csv_path],
+                            env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_measure(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='yte_bench.py measure')
+    parser.add_argument('--csv', required=True)
+    args = parser.parse_args(argv)
+    print(json.dumps(measure(args.csv)))
+    return 0
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _flatten(result: Dict[str, Any]) -> Dict[str, float]:
+    """Các số đo dạng phẳng 'rows/phase/metric' để so sánh giữa hai lần chạy"""
+    flat = {}
+    for scale in result['scales']:
+        for phase in ('cold', 'snapshot'):
+            measured = scale[phase]
+            prefix = f"{scale['rows']}/{phase}"
+            flat[f"{prefix}/load_seconds"] = measured['load_seconds']
+            flat[f"{prefix}/peak_rss_mb"] = measured['peak_rss_mb']
+            for name, value in measured['latency_ms'].items():
+                flat[f"{prefix}/latency_ms/{name}"] = value
+    return flat
+
+
+def compare_results(previous: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Các số đo chậm/tốn hơn lần trước quá `threshold`"""
+    before, after = _flatten(previous), _flatten(current)
+    regressions = []
+    for key, value in after.items():
+        old = before.get(key)
+        floor = NOISE_FLOOR[key.split('/')[2]]
+        if old is not None and value > old * (1 + threshold) and value - old > floor:
+            regressions.append(f"{key}: {old:.3f} -> {value:.3f} (+{(value / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def run_suite(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='yte_bench.py suite', description="Benchmark load/bộ nhớ/độ trễ yte()")
+    parser.add_argument('--rows', default=','.join(str(rows) for rows in SUITE_ROWS),
+                        help="Các kích thước dữ liệu, cách nhau bởi dấu phẩy")
+    parser.add_argument('--data-dir', default=BENCH_DATA_DIR, help="Nơi giữ các CSV giả lập (tái sử dụng giữa các lần)")
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    args = parser.parse_args(argv)
+
+    result = {'revision': _git_revision(), 'timestamp': datetime.now().isoformat(timespec='seconds'),
+              'python': sys.version.split()[0], 'scales': []}
+    for rows in (int(value) for value in args.rows.split(',') if value):
+        csv_path = os.path.join(args.data_dir, f'synthetic-{rows}.csv')
+        if not os.path.exists(csv_path):
+            print(f"🧬 Sinh dữ liệu giả lập {rows} dòng...")
+            generate_csv(csv_path, rows)
+        cache_dir = os.path.join(args.data_dir, f'cache-{rows}')
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        # Lần đầu parse CSV (và ghi snapshot), lần sau load từ snapshot
+        cold = _measure_in_subprocess(csv_path, cache_dir, snapshot=True)
+        warm = _measure_in_subprocess(csv_path, cache_dir, snapshot=True)
+        result['scales'].append({'rows': rows, 'cold': cold, 'snapshot': warm})
+        print(f"📊 {rows} dòng: load CSV {cold['load_seconds']:.2f}s ({cold['peak_rss_mb']:.0f} MB), "
+              f"snapshot {warm['load_seconds']:.3f}s ({warm['peak_rss_mb']:.0f} MB)")
+        for name, value in warm['latency_ms'].items():
+            print(f"   ⏱️ {name}: {value:.2f} ms (cache: {warm['cached_latency_ms'][name]:.3f} ms)")
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    latest = os.path.join(args.results_dir, 'latest.json')
+    previous = None
+    if os.path.exists(latest):
+        with open(latest, encoding='utf-8') as f:
+            previous = json.load(f)
+    path = os.path.join(args.results_dir, f"{result['timestamp'].replace(':', '')}-{result['revision']}.json")
+    for target in (path, latest):
+        with open(target, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"💾 Đã lưu kết quả: {path}")
+
+    if previous is None:
+        return 0
+    regressions = compare_results(previous, result)
+    print(f"🔁 So với {previous['revision']} ({previous['timestamp']}): "
+          f"{len(regressions)} số đo chậm hơn quá {REGRESSION_THRESHOLD * 100:.0f}%")
+    for regression in regressions:
+        print(f"   ⚠️ {regression}")
+    return 1 if regressions else 0
+
+
+COMMANDS = {
+    'intents': run_intents,
+    'generate': run_generate,
+    'measure': run_measure,
+    'suite': run_suite,
+}
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'intents'
+    if command not in COMMANDS:
+        print(f"Dùng: python yte_bench.py [{'|'.join(COMMANDS)}]")
+        sys.exit(2)
+    sys.exit(COMMANDS[command](sys.argv[2:]))
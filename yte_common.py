@@ -0,0 +1,101 @@
+"""
+Tiện ích dùng chung cho các tool (yte_tool, city_tool)
+- ReportCache: cache LRU có TTL, đếm hit/miss
+- fold_text: chữ thường, bỏ dấu tiếng Việt để so khớp không phân biệt dấu
+
+Chỉ dùng thư viện chuẩn, nên import module này không kéo theo pandas hay dữ liệu y tế.
+"""
+
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class ReportCache:
+    """Cache LRU có TTL, đếm hit/miss (an toàn khi gọi đồng thời)
+
+    Khóa do nơi dùng quyết định; vd. yte_tool gộp intent đã chuẩn hóa với phiên
+    bản dữ liệu để dữ liệu load lại không bao giờ dùng nhầm báo cáo cũ.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        """Lấy kết quả trong cache, hoặc tính bằng `compute()` rồi lưu lại"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (not self.ttl or now - entry[0] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = compute()
+        if self.maxsize <= 0:
+            return value
+        with self._lock:
+            self._entries[key] = (now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def configure(self, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        """Đổi kích thước/TTL, bỏ bớt mục cũ nếu cần"""
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            while len(self._entries) > max(self.maxsize, 0):
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+def _build_fold_table() -> Dict[int, str]:
+    """Bảng translate: chữ Latin có dấu (Latin-1, Latin Extended, tiếng Việt) -> chữ gốc"""
+    table = {ord('đ'): 'd', ord('Đ'): 'd'}
+    for start, end in ((0x00C0, 0x0250), (0x1E00, 0x1F00)):
+        for code in range(start, end):
+            base = unicodedata.normalize('NFD', chr(code))[0]
+            if base != chr(code) and base.isascii():
+                table[code] = base
+    return table
+
+
+FOLD_TABLE = _build_fold_table()
+
+
+def fold_text(text: str) -> str:
+    """Chữ thường, bỏ dấu tiếng Việt (đ -> d) để so khớp không phân biệt dấu
+
+    Mỗi ký tự (dạng NFC) được thay bằng đúng một ký tự, nên vị trí trong chuỗi
+    đã bỏ dấu khớp với vị trí trong chuỗi gốc.
+    """
+    return unicodedata.normalize('NFC', text.lower()).translate(FOLD_TABLE)
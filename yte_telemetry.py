@@ -0,0 +1,401 @@
+"""
+Telemetry cho Tool Y Tế
+- Span thời gian lồng nhau (load, parse, chuẩn hóa, định tuyến intent, tổng hợp, trình bày)
+- Histogram độ trễ theo tool/intent và theo loại span
+- Profiler lấy mẫu (tùy chọn): đếm stack của các luồng theo chu kỳ, xuất dạng collapsed stack
+- Xuất OpenTelemetry JSON (OTLP/JSON) cho span và Prometheus text cho histogram
+
+Mặc định tắt: span() trả về một đối tượng rỗng dùng chung nên gần như không tốn gì.
+Bật bằng YTE_TELEMETRY=1 (hoặc enable()); YTE_TELEMETRY_DIR để ghi file xuất khi thoát;
+YTE_PROFILE_INTERVAL (giây) để chạy profiler lấy mẫu; YTE_LOG_LEVEL để in log trạng thái.
+"""
+
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional
+
+TELEMETRY_ENABLED = os.environ.get('YTE_TELEMETRY', '0') == '1'
+TELEMETRY_DIR = os.environ.get('YTE_TELEMETRY_DIR', '')
+PROFILE_INTERVAL = float(os.environ.get('YTE_PROFILE_INTERVAL', '0'))
+# Số span đã kết thúc giữ lại trong bộ nhớ để xuất (bỏ span cũ nhất khi đầy)
+MAX_SPANS = int(os.environ.get('YTE_TELEMETRY_MAX_SPANS', '10000'))
+# Ngưỡng bucket (giây) của các histogram độ trễ
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SERVICE_NAME = 'yte'
+
+log = logging.getLogger('yte')
+
+_enabled = TELEMETRY_ENABLED
+_current: contextvars.ContextVar = contextvars.ContextVar('yte_span', default=None)
+_spans: deque = deque(maxlen=MAX_SPANS)
+_lock = threading.Lock()
+
+
+class Span:
+    """Một khoảng thời gian có tên, thuộc tính và sự kiện; dùng như context manager"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'events', 'error', '_start_perf', '_token')
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        parent = _current.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.events: List[tuple] = []
+        self.error: Optional[str] = None
+        self.start_ns = 0
+        self.end_ns = 0
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes):
+        self.events.append((time.time_ns(), name, attributes))
+
+    @property
+    def duration(self) -> float:
+        """Thời lượng (giây)"""
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._start_perf
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self._token)
+        _spans.append(self)
+        SPAN_DURATION.observe(self.duration, span=self.name)
+        return False
+
+
+class _NoopSpan:
+    """Span rỗng khi telemetry tắt"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def add_event(self, name: str, **attributes):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Histogram:
+    """Histogram tích lũy kiểu Prometheus, tách theo bộ nhãn"""
+
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> Dict[tuple, tuple]:
+        """{nhãn: (số đếm tích lũy theo bucket, tổng, số lần)}"""
+        with self._lock:
+            result = {}
+            for key, (counts, total, count) in self._series.items():
+                cumulative, running = [], 0
+                for bucket_count in counts:
+                    running += bucket_count
+                    cumulative.append(running)
+                result[key] = (cumulative, total, count)
+            return result
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+TOOL_DURATION = Histogram('yte_tool_duration_seconds', "Độ trễ mỗi lần gọi tool, theo tool và intent")
+SPAN_DURATION = Histogram('yte_span_duration_seconds', "Thời lượng span theo loại (load, parse, aggregate, ...)")
+HISTOGRAMS = [TOOL_DURATION, SPAN_DURATION]
+
+
+def enable(enabled: bool = True):
+    """Bật/tắt telemetry lúc chạy"""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, **attributes):
+    """Context manager đo một đoạn xử lý; đối tượng rỗng dùng chung khi telemetry tắt"""
+    if not _enabled:
+        return _NOOP
+    return Span(name, attributes)
+
+
+def current_span():
+    """Span đang mở trong ngữ cảnh hiện tại (span rỗng nếu không có)"""
+    if not _enabled:
+        return _NOOP
+    return _current.get() or _NOOP
+
+
+def event(message: str, level: int = logging.INFO, **attributes):
+    """Ghi log trạng thái (thay cho print) và gắn thành sự kiện của span hiện tại"""
+    log.log(level, message)
+    if _enabled:
+        current = _current.get()
+        if current is not None:
+            current.add_event(message, **attributes)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator cho tool: mở span `tool.<tên>` và ghi độ trễ vào yte_tool_duration_seconds
+
+    Intent được lấy từ thuộc tính 'intent' mà tool gắn vào span (nếu có).
+    Giữ nguyên tên, docstring và chữ ký hàm (cần cho việc đăng ký tool với agent).
+    """
+    def decorate(func):
+        tool = name or func.__name__
+
+        def finish(current, start):
+            if isinstance(current, Span):
+                labels = {'tool': tool, 'intent': str(current.attributes.get('intent', ''))}
+                TOOL_DURATION.observe(time.perf_counter() - start, **labels)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                start = time.perf_counter()
+                with span(f'tool.{tool}', tool=tool) as current:
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        finish(current, start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            with span(f'tool.{tool}', tool=tool) as current:
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    finish(current, start)
+        return wrapper
+    return decorate
+
+
+# Profiler lấy mẫu: một luồng nền chụp stack của mọi luồng khác theo chu kỳ
+class SamplingProfiler:
+    """Đếm stack (dạng collapsed 'a;b;c') của các luồng, mỗi `interval` giây một mẫu"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='yte-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """Định dạng collapsed stack (flamegraph.pl, speedscope)"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+_profiler: Optional[SamplingProfiler] = None
+
+
+def start_profiler(interval: float = 0.005) -> SamplingProfiler:
+    """Bật profiler lấy mẫu (chỉ dùng khi cần, mỗi mẫu duyệt stack của mọi luồng)"""
+    global _profiler
+    with _lock:
+        if _profiler is None or not _profiler.running:
+            _profiler = SamplingProfiler(interval)
+            _profiler.start()
+        return _profiler
+
+
+def stop_profiler() -> Optional[SamplingProfiler]:
+    """Dừng profiler; các mẫu đã lấy vẫn được giữ để write_exports() ghi ra"""
+    with _lock:
+        profiler = _profiler
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items()]
+
+
+def export_otlp_json() -> Dict[str, Any]:
+    """Các span đã kết thúc theo định dạng OTLP/JSON (ExportTraceServiceRequest)"""
+    spans = []
+    for item in list(_spans):
+        spans.append({
+            'traceId': item.trace_id,
+            'spanId': item.span_id,
+            'parentSpanId': item.parent_id or '',
+            'name': item.name,
+            'kind': 1,
+            'startTimeUnixNano': str(item.start_ns),
+            'endTimeUnixNano': str(item.end_ns),
+            'attributes': _otlp_attributes(item.attributes),
+            'events': [{'timeUnixNano': str(at), 'name': name, 'attributes': _otlp_attributes(attrs)}
+                       for at, name, attrs in item.events],
+            'status': {'code': 2, 'message': item.error} if item.error else {'code': 1},
+        })
+    return {'resourceSpans': [{
+        'resource': {'attributes': _otlp_attributes({'service.name': SERVICE_NAME})},
+        'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+    }]}
+
+
+def _prometheus_labels(labels: tuple, extra: Optional[tuple] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + '}'
+
+
+def export_prometheus() -> str:
+    """Các histogram theo định dạng Prometheus text exposition"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.append(f"# HELP {histogram.name} {histogram.help}")
+        lines.append(f"# TYPE {histogram.name} histogram")
+        for labels, (cumulative, total, count) in sorted(histogram.snapshot().items()):
+            for bound, bucket_count in zip(histogram.buckets, cumulative):
+                lines.append(f"{histogram.name}_bucket{_prometheus_labels(labels, ('le', repr(bound)))} {bucket_count}")
+            lines.append(f"{histogram.name}_bucket{_prometheus_labels(labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{histogram.name}_sum{_prometheus_labels(labels)} {total}")
+            lines.append(f"{histogram.name}_count{_prometheus_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def write_exports(directory: str = TELEMETRY_DIR) -> List[str]:
+    """Ghi spans.json (OTLP/JSON), metrics.prom và profile.folded (nếu có profiler) vào `directory`"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    path = os.path.join(directory, 'spans.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(export_otlp_json(), f, ensure_ascii=False)
+    paths.append(path)
+    path = os.path.join(directory, 'metrics.prom')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(export_prometheus())
+    paths.append(path)
+    if _profiler is not None and _profiler.samples:
+        path = os.path.join(directory, 'profile.folded')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(_profiler.collapsed() + "\n")
+        paths.append(path)
+    return paths
+
+
+def reset():
+    """Xóa các span và histogram đã ghi"""
+    _spans.clear()
+    for histogram in HISTOGRAMS:
+        histogram.clear()
+
+
+def _write_on_exit():
+    if _enabled and TELEMETRY_DIR:
+        try:
+            write_exports(TELEMETRY_DIR)
+        except OSError as e:
+            log.warning(f"⚠️ Không ghi được telemetry: {e}")
+
+
+def _configure_logging():
+    level = os.environ.get('YTE_LOG_LEVEL')
+    if level and not log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        log.addHandler(handler)
+        log.setLevel(level.upper())
+
+
+_configure_logging()
+atexit.register(_write_on_exit)
+if PROFILE_INTERVAL > 0:
+    start_profiler(PROFILE_INTERVAL)
@@ -4,213 +4,2242 @@ Tool chuyên biệt để phân tích dữ liệu bệnh nhân sỏi thận PCNL
 """
 
 import pandas as pd
+import numpy as np
+import argparse
+import asyncio
+import base64
+import functools
+import glob
+import hashlib
+import inspect
+import itertools
+import contextvars
+import json
+import logging
 import os
-from typing import Dict, List, Any, Optional
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Dict, List, Any, NamedTuple, Optional
+
+import yte_telemetry as telemetry
+from yte_common import FOLD_TABLE, ReportCache, fold_text
+from yte_telemetry import traced
+
+# Năm tham chiếu để tính tuổi từ năm sinh
+REFERENCE_YEAR = 2025
+
+# File dữ liệu mặc định; có thể đổi bằng biến môi trường YTE_CSV_PATH hoặc set_data_path()
+DEFAULT_CSV_NAME = 'OK-2.csv'
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Snapshot nhị phân của dữ liệu đã chuẩn hóa (tắt bằng YTE_SNAPSHOT=0)
+SNAPSHOT_FORMAT = 3
+SNAPSHOT_DIR_NAME = '.yte_cache'
+# Registry khoảng ID của từng file khi nguồn là thư mục/glob nhiều file, lưu cạnh snapshot
+ID_REGISTRY_NAME = 'id_ranges.json'
+
+# Đọc theo khối cho file lớn: số dòng mỗi khối, và kích thước file bắt đầu dùng chế độ streaming
+CHUNK_ROWS = int(os.environ.get('YTE_CHUNK_ROWS', '100000'))
+STREAMING_THRESHOLD_BYTES = int(os.environ.get('YTE_STREAMING_THRESHOLD', str(256 * 1024 * 1024)))
+
+# Số process đọc song song khi nguồn dữ liệu là thư mục/glob nhiều file CSV (0 = theo số CPU)
+INGEST_WORKERS = int(os.environ.get('YTE_INGEST_WORKERS', '0'))
+
+# Các trường số: (tên trường, tên cột trong CSV theo thứ tự ưu tiên)
+# Một số cột trong OK-2.csv có dấu cách ở cuối tên, nên giữ cả hai cách viết
+NUMERIC_FIELDS = [
+    ('birth_year', ('Năm sinh ', 'Năm sinh')),
+    ('height', ('Chiều cao',)),
+    ('weight', ('Cân nặng ', 'Cân nặng')),
+    ('bmi', ('BMI',)),
+    ('num_stones', ('Số lượng sỏi ', 'Số lượng sỏi')),
+    ('hu', ('HU',)),
+    ('surgery_time_minutes', ('Thời gian phẫu thuật (phút)',)),
+    ('hb', ('Hb (g/dL)',)),
+    ('plt', ('PLT (K/uL)',)),
+    ('creatinin', ('Creatinin ', 'Creatinin')),
+    ('egfr', ('eGFR',)),
+]
+
+# Các trường văn bản, lưu dạng mã hóa từ điển (codes + categories)
+TEXT_FIELDS = [
+    ('gender', ('Giới tính',)),
+    ('admission_date', ('Ngày nhập viện ', 'Ngày nhập viện')),
+    ('medical_history', ('Tiền căn nội khoa ', 'Tiền căn nội khoa')),
+    ('previous_surgery', ('Tiền căn đã mổ sỏi thận ', 'Tiền căn đã mổ sỏi thận')),
+    ('stone_type', ('Loại sỏi ', 'Loại sỏi')),
+    ('stone_size', ('Kích thước sỏi 3 chiều (khối lớn nhất) ', 'Kích thước sỏi 3 chiều (khối lớn nhất)')),
+    ('surgery_date', ('Ngày PT',)),
+    ('surgery_position', ('Tư thế',)),
+    ('surgery_result', ('Sạch sỏi trên C-arm ngay sau mổ ', 'Sạch sỏi trên C-arm ngay sau mổ')),
+    ('residual_stones', ('Nếu sót sỏi trên C-arm ngay sau mổ (số lượng/vị trí/kích thước) ',
+                         'Nếu sót sỏi trên C-arm ngay sau mổ (số lượng/vị trí/kích thước)')),
+    ('complications', ('Biến chứng ', 'Biến chứng')),
+]
+
+# File CSV gốc của mỗi bệnh nhân (mỗi bệnh viện/tháng một file), lưu như một cột văn bản
+SOURCE_FIELD = 'source'
+
+# Các trường phân loại dùng để nhóm/thống kê
+CATEGORICAL_FIELDS = ('gender', 'stone_type', 'surgery_position', 'surgery_result')
+
+# Các trường ngày có index phụ, và các định dạng ngày gặp trong dữ liệu
+DATE_FIELDS = ('admission_date', 'surgery_date')
+DATE_FORMATS = ('%d/%m/%y', '%d/%m/%Y', '%Y-%m-%d')
+
+# Cache báo cáo tổng hợp: số mục tối đa và thời gian sống (giây, 0 = không hết hạn)
+REPORT_CACHE_SIZE = int(os.environ.get('YTE_REPORT_CACHE_SIZE', '128'))
+REPORT_CACHE_TTL = float(os.environ.get('YTE_REPORT_CACHE_TTL', '0'))
+
+# Các trường có index danh sách dòng theo mã, và các cột số có index khoảng
+POSTING_FIELDS = CATEGORICAL_FIELDS + (SOURCE_FIELD,)
+RANGE_FIELDS = ('age', 'hu')
+
+# Số ID gợi ý khi không tìm thấy bệnh nhân
+NEAREST_ID_HINTS = 5
+
+# Báo cáo hàng loạt: số luồng xử lý các nhóm song song (0 = theo số CPU) và các chiều chia nhóm
+BATCH_WORKERS = int(os.environ.get('YTE_BATCH_WORKERS', '0'))
+PARTITION_FIELDS = ('source', 'month')
+
+# Khối tổng hợp (cohort cube) dựng lúc load: các chiều, và ngưỡng chia nhóm tuổi / mật độ HU.
+# Không có chiều thời gian: số tháng tăng theo dữ liệu làm số ô gần bằng số dòng; nhóm theo tháng quét dòng
+CUBE_DIMENSIONS = ('gender', 'age_band', 'bmi_class', 'stone_type', 'surgery_position', 'surgery_result',
+                   'complications', 'hu_band')
+AGE_BANDS = (30, 40, 50, 60, 70)
+HU_BANDS = (500, 1000)
+
+# Kết quả dạng danh sách: số dòng tối đa mỗi trang và giới hạn độ dài mỗi câu trả lời (ký tự)
+LIST_PAGE_SIZE = int(os.environ.get('YTE_LIST_PAGE_SIZE', '50'))
+RESPONSE_CHAR_BUDGET = int(os.environ.get('YTE_RESPONSE_BUDGET', '4000'))
+
+# Tool bất đồng bộ: số luồng phân tích tối đa và thời gian chờ mặc định (giây, 0 = không giới hạn)
+ASYNC_WORKERS = int(os.environ.get('YTE_ASYNC_WORKERS', '4'))
+ASYNC_TIMEOUT = float(os.environ.get('YTE_ASYNC_TIMEOUT', '30'))
+
+# Tự load lại khi file CSV nguồn thay đổi: chu kỳ kiểm tra (giây, 0 = tắt)
+RELOAD_INTERVAL = float(os.environ.get('YTE_RELOAD_INTERVAL', '0'))
+
+# Thứ tự khóa của một bản ghi bệnh nhân (giữ như định dạng dict cũ)
+RECORD_FIELDS = [
+    'id', 'birth_year', 'age', 'gender', 'admission_date', 'height', 'weight', 'bmi',
+    'medical_history', 'previous_surgery', 'stone_type', 'stone_size', 'num_stones', 'hu',
+    'surgery_date', 'surgery_position', 'surgery_time_minutes', 'surgery_result',
+    'residual_stones', 'complications', 'hb', 'plt', 'creatinin', 'egfr', SOURCE_FIELD,
+]
+
+
+class PatientStore:
+    """Kho dữ liệu bệnh nhân dạng cột
+
+    - Cột số: mảng float64, giá trị thiếu là NaN
+    - Cột văn bản: mã hóa từ điển, `codes` int32 (-1 là thiếu) + danh sách `categories`
+    """
+
+    def __init__(self, ids: np.ndarray, numeric: Dict[str, np.ndarray],
+                 codes: Dict[str, np.ndarray], categories: Dict[str, List[str]]):
+        self.ids = ids
+        self.numeric = numeric
+        self.codes = codes
+        self.categories = categories
+        self.index: Optional["PatientIndex"] = None
+        self.stats: Optional["CohortStats"] = None
+        # Chất lượng dữ liệu lúc parse: theo từng trường, cột nguồn, số ô thiếu và số ô không parse được
+        self.quality: Optional[Dict[str, Dict[str, Any]]] = None
+        # Phiên bản dữ liệu và thời điểm kho được đưa vào dùng (gán khi publish)
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        self.cube: Optional["CohortCube"] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def build_index(self) -> "PatientIndex":
+        """Dựng các index tra cứu (gọi một lần lúc load)"""
+        self.index = PatientIndex(self)
+        return self.index
+
+    def build_stats(self) -> "CohortStats":
+        """Tính toàn bộ thống kê cho các báo cáo trong một lượt (gọi một lần lúc load)"""
+        self.stats = CohortStats()
+        self.stats.update(self)
+        return self.stats
+
+    def build_cube(self) -> "CohortCube":
+        """Dựng khối tổng hợp theo CUBE_DIMENSIONS (gọi một lần lúc load, sau build_index)"""
+        self.cube = CohortCube(self)
+        return self.cube
+
+    def extended(self, chunk: "PatientStore") -> "PatientStore":
+        """Kho mới gồm kho hiện tại + `chunk`; index và thống kê chỉ cập nhật phần thêm vào"""
+        start = len(self)
+        ids = np.concatenate([self.ids, chunk.ids])
+        numeric = {field: np.concatenate([values, chunk.numeric[field]]) for field, values in self.numeric.items()}
+        codes = {}
+        categories = {}
+        for field, values in self.codes.items():
+            categories[field], remap = _merge_categories(self.categories[field], chunk.categories[field])
+            codes[field] = np.concatenate([values, _remap_codes(chunk.codes[field], remap)])
+
+        store = PatientStore(ids, numeric, codes, categories)
+        if self.index is not None:
+            store.index = self.index.extended(store, start)
+        if self.stats is not None:
+            store.stats = self.stats.copy()
+            store.stats.update(store, slice(start, None))
+        store.quality = merge_quality([self.quality, chunk.quality])
+        if self.cube is not None and store.index is not None:
+            store.cube = self.cube.extended(store, start)
+        return store
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]], first_id: int = 1, source: str = '') -> "PatientStore":
+        """Dựng kho từ các bản ghi dict (cùng khóa với YTE_DATA), ID đánh từ `first_id`"""
+        numeric = {}
+        for field, _ in NUMERIC_FIELDS:
+            values = [record.get(field) for record in records]
+            numeric[field] = np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+        codes = {}
+        categories = {}
+        for field, _ in TEXT_FIELDS:
+            values = np.array([str(record.get(field) or '').strip() for record in records], dtype=object)
+            codes[field], categories[field] = _encode_text(values)
+        values = np.array([str(record.get(SOURCE_FIELD) or source) for record in records], dtype=object)
+        codes[SOURCE_FIELD], categories[SOURCE_FIELD] = _encode_text(values)
+
+        _derive_columns(numeric)
+        ids = np.arange(first_id, first_id + len(records), dtype=np.int64)
+        return cls(ids, numeric, codes, categories)
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, first_id: int = 1, source: str = '') -> "PatientStore":
+        """Chuẩn hóa DataFrame đọc từ OK-2.csv thành kho dạng cột, ID đánh từ `first_id`
+
+        Mọi bước chạy theo cột: tên cột được chọn một lần, cột số được ép kiểu
+        vector hóa (đếm số ô không parse được), cột văn bản chỉ làm sạch trên
+        các giá trị khác nhau.
+        """
+        columns = _resolve_columns(tuple(df.columns))
+        quality = {}
+        numeric = {}
+        for field, _ in NUMERIC_FIELDS:
+            column = columns[field]
+            if column is None:
+                numeric[field] = np.full(len(df), np.nan)
+                quality[field] = {'column': None}
+            else:
+                numeric[field], quality[field] = _coerce_numeric(df[column])
+                quality[field]['column'] = column
+
+        codes = {}
+        categories = {}
+        for field, _ in TEXT_FIELDS:
+            column = columns[field]
+            if column is None:
+                codes[field], categories[field] = np.full(len(df), -1, dtype=np.int32), []
+                quality[field] = {'column': None}
+            else:
+                codes[field], categories[field] = _encode_series(df[column])
+                quality[field] = {'column': column, 'missing': int(np.count_nonzero(codes[field] < 0))}
+        codes[SOURCE_FIELD] = np.full(len(df), 0 if source else -1, dtype=np.int32)
+        categories[SOURCE_FIELD] = [source] if source else []
+
+        _derive_columns(numeric)
+        ids = np.arange(first_id, first_id + len(df), dtype=np.int64)
+        store = cls(ids, numeric, codes, categories)
+        store.quality = quality
+        return store
+
+    def code_of(self, field: str, label: str) -> int:
+        """Mã của một giá trị phân loại, -2 nếu không tồn tại (không trùng mã thiếu -1)"""
+        try:
+            return self.categories[field].index(label)
+        except ValueError:
+            return -2
+
+    def decode(self, field: str) -> np.ndarray:
+        """Giải mã một cột văn bản thành mảng chuỗi ('' là thiếu)"""
+        lookup = np.array(self.categories[field] + [''], dtype=object)
+        return lookup[self.codes[field]]
+
+    def category_counts(self, field: str, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Đếm số bệnh nhân theo từng giá trị phân loại (bỏ qua giá trị thiếu)"""
+        codes = self.codes[field] if mask is None else self.codes[field][mask]
+        return np.bincount(codes[codes >= 0], minlength=len(self.categories[field]))
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """Dựng lại một bản ghi dict theo định dạng cũ của YTE_DATA"""
+        patient = {}
+        for field in RECORD_FIELDS:
+            if field == 'id':
+                patient['id'] = int(self.ids[row])
+            elif field in self.numeric:
+                value = self.numeric[field][row]
+                patient[field] = None if np.isnan(value) else float(value)
+            else:
+                code = self.codes[field][row]
+                patient[field] = self.categories[field][code] if code >= 0 else ''
+        return patient
+
+
+class PatientRecords(Sequence):
+    """View tương thích: truy cập kho dạng cột như list of dict (YTE_DATA cũ)"""
+
+    def __init__(self, store: PatientStore):
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store.record(i) for i in range(*index.indices(len(self.store)))]
+        if index < 0:
+            index += len(self.store)
+        if not 0 <= index < len(self.store):
+            raise IndexError("patient index out of range")
+        return self.store.record(index)
+
+
+class PatientIndex:
+    """Các index tra cứu trên kho dạng cột
+
+    - Khóa chính: ID -> vị trí dòng (dict, O(1))
+    - Index phụ theo ngày (admission_date, surgery_date): số ngày đã sắp xếp, tra theo khoảng
+    - Index phụ theo các trường phân loại (giới tính, loại sỏi, ...): danh sách dòng cho từng mã
+    - Index khoảng cho các cột số (tuổi, HU): thứ tự sắp xếp + giá trị đã sắp xếp
+    """
+
+    def __init__(self, store: PatientStore):
+        self.store = store
+        # Khóa chính dạng mảng (ID đã sắp xếp + vị trí dòng), tra bằng searchsorted: không tạo
+        # đối tượng Python cho từng dòng nên worker fork dùng chung trang nhớ mà không chép lại
+        self.id_order = np.argsort(store.ids, kind='stable')
+        self.sorted_ids = np.asarray(store.ids)[self.id_order]
+
+        # Ngày chỉ parse một lần cho mỗi giá trị khác nhau nhờ mã hóa từ điển
+        self.category_days = {}
+        self.days = {}
+        self.day_order = {}
+        for field in DATE_FIELDS:
+            self.category_days[field] = _category_days(store.categories[field])
+            days = _row_days(self.category_days[field], store.codes[field])
+            self.days[field] = days
+            order = np.argsort(days, kind='stable')
+            self.day_order[field] = order[~np.isnan(days[order])]
+        self.sorted_days = {field: self.days[field][order] for field, order in self.day_order.items()}
+
+        self.postings = {field: _postings(store.codes[field], len(store.categories[field]))
+                         for field in POSTING_FIELDS}
+
+        self.value_order = {}
+        self.sorted_values = {}
+        for field in RANGE_FIELDS:
+            values = store.numeric[field]
+            order = np.argsort(values, kind='stable')
+            self.value_order[field] = order[~np.isnan(values[order])]
+            self.sorted_values[field] = values[self.value_order[field]]
+
+    def extended(self, store: PatientStore, start: int) -> "PatientIndex":
+        """Index mới cho `store` = kho cũ + các dòng từ `start`, chỉ xử lý phần thêm vào"""
+        index = PatientIndex.__new__(PatientIndex)
+        index.store = store
+        new_rows = np.arange(start, len(store))
+        new_ids = store.ids[start:]
+
+        order = np.argsort(new_ids, kind='stable')
+        positions = np.searchsorted(self.sorted_ids, new_ids[order])
+        index.id_order = np.insert(self.id_order, positions, new_rows[order])
+        index.sorted_ids = np.insert(self.sorted_ids, positions, new_ids[order])
+
+        index.category_days = {}
+        index.days = {}
+        index.day_order = {}
+        for field in DATE_FIELDS:
+            known = self.category_days[field]
+            added = _category_days(store.categories[field][len(known):])
+            index.category_days[field] = np.concatenate([known, added])
+            new_days = _row_days(index.category_days[field], store.codes[field][start:])
+            index.days[field] = np.concatenate([self.days[field], new_days])
+
+            # Chèn các dòng mới vào thứ tự ngày đã sắp xếp sẵn
+            order = np.argsort(new_days, kind='stable')
+            order = order[~np.isnan(new_days[order])]
+            old_order = self.day_order[field]
+            positions = np.searchsorted(self.sorted_days[field], new_days[order], side='right')
+            index.day_order[field] = np.insert(old_order, positions, new_rows[order])
+        index.sorted_days = {field: index.days[field][order] for field, order in index.day_order.items()}
+
+        index.value_order = {}
+        index.sorted_values = {}
+        for field in RANGE_FIELDS:
+            values = store.numeric[field][start:]
+            order = np.argsort(values, kind='stable')
+            order = order[~np.isnan(values[order])]
+            positions = np.searchsorted(self.sorted_values[field], values[order], side='right')
+            index.value_order[field] = np.insert(self.value_order[field], positions, new_rows[order])
+            index.sorted_values[field] = np.insert(self.sorted_values[field], positions, values[order])
+
+        index.postings = {}
+        for field, lists in self.postings.items():
+            added = _postings(store.codes[field][start:], len(store.categories[field]))
+            empty = np.empty(0, dtype=np.int64)
+            index.postings[field] = [
+                np.concatenate([lists[code] if code < len(lists) else empty, rows + start])
+                for code, rows in enumerate(added)
+            ]
+        return index
+
+    def row_of(self, patient_id: int) -> Optional[int]:
+        """Vị trí dòng của một ID, None nếu không có"""
+        pos = int(np.searchsorted(self.sorted_ids, patient_id))
+        if pos < len(self.sorted_ids) and self.sorted_ids[pos] == patient_id:
+            return int(self.id_order[pos])
+        return None
+
+    def rows_of(self, patient_ids) -> List[Optional[int]]:
+        """Tra cứu nhiều ID trong một lần gọi (một lần searchsorted cho cả lô)"""
+        wanted = np.asarray(patient_ids, dtype=np.int64)
+        if not len(self.sorted_ids) or not wanted.size:
+            return [None] * wanted.size
+        pos = np.minimum(np.searchsorted(self.sorted_ids, wanted), len(self.sorted_ids) - 1)
+        found = self.sorted_ids[pos] == wanted
+        rows = self.id_order[pos]
+        return [int(row) if hit else None for row, hit in zip(rows.tolist(), found.tolist())]
+
+    def nearest_ids(self, patient_id: int, limit: int = NEAREST_ID_HINTS) -> List[int]:
+        """Tối đa `limit` ID có sẵn gần nhất với ID cần tìm"""
+        ids = self.sorted_ids
+        pos = int(np.searchsorted(ids, patient_id))
+        window = ids[max(0, pos - limit):pos + limit]
+        nearest = sorted(window.tolist(), key=lambda candidate: (abs(candidate - patient_id), candidate))
+        return sorted(nearest[:limit])
+
+    def rows_for_category(self, field: str, label: str) -> np.ndarray:
+        """Các dòng có giá trị phân loại `label`"""
+        code = self.store.code_of(field, label)
+        if code < 0:
+            return np.empty(0, dtype=np.int64)
+        return self.rows_for_codes(field, [code])
+
+    def rows_for_codes(self, field: str, codes: List[int]) -> np.ndarray:
+        """Các dòng có mã phân loại thuộc `codes`"""
+        if field in self.postings:
+            lists = [self.postings[field][code] for code in codes]
+            return np.concatenate(lists) if lists else np.empty(0, dtype=np.int64)
+        return np.flatnonzero(np.isin(self.store.codes[field], codes))
+
+    def rows_in_date_range(self, field: str, start: Optional[date] = None,
+                           end: Optional[date] = None) -> np.ndarray:
+        """Các dòng có ngày nằm trong [start, end] (đã sắp xếp theo ngày)"""
+        lo, hi = self._bounds(self.sorted_days[field],
+                              None if start is None else start.toordinal(),
+                              None if end is None else end.toordinal())
+        return self.day_order[field][lo:hi]
+
+    def rows_in_range(self, field: str, low: Optional[float] = None,
+                      high: Optional[float] = None) -> np.ndarray:
+        """Các dòng có giá trị cột số nằm trong [low, high]"""
+        lo, hi = self._bounds(self.sorted_values[field], low, high)
+        return self.value_order[field][lo:hi]
+
+    def count_in_range(self, field: str, low: Optional[float] = None,
+                       high: Optional[float] = None) -> int:
+        """Số dòng trong khoảng, không cần tạo danh sách dòng"""
+        lo, hi = self._bounds(self.sorted_values[field], low, high)
+        return hi - lo
+
+    @staticmethod
+    def _bounds(sorted_values: np.ndarray, low, high):
+        lo = 0 if low is None else int(np.searchsorted(sorted_values, low, side='left'))
+        hi = len(sorted_values) if high is None else int(np.searchsorted(sorted_values, high, side='right'))
+        return lo, max(lo, hi)
+
+
+def parse_date(value: str) -> Optional[date]:
+    """Parse ngày dạng d/m/yy như trong OK-2.csv"""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _category_days(labels: List[str]) -> np.ndarray:
+    """Số ngày (ordinal) cho từng giá trị của cột ngày, NaN nếu không parse được"""
+    days = np.full(len(labels), np.nan)
+    for code, label in enumerate(labels):
+        parsed = parse_date(label)
+        if parsed is not None:
+            days[code] = parsed.toordinal()
+    return days
+
+
+def _row_days(category_days: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Số ngày theo từng dòng, mã thiếu -1 trỏ vào NaN ở cuối bảng tra"""
+    return np.append(category_days, np.nan)[codes]
+
+
+def _postings(codes: np.ndarray, size: int) -> List[np.ndarray]:
+    """Danh sách dòng cho từng mã phân loại, dựng bằng một lần sắp xếp"""
+    order = np.argsort(codes, kind='stable')
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(codes[codes >= 0], minlength=size))))
+    order = order[np.count_nonzero(codes < 0):]
+    return [order[bounds[code]:bounds[code + 1]] for code in range(size)]
+
+
+class RunningStat:
+    """Số lượng, tổng, min/max cập nhật tăng dần"""
+
+    __slots__ = ('count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, count: int, total: float, lo: float, hi: float):
+        if not count:
+            return
+        self.count += int(count)
+        self.total += float(total)
+        self.min = float(lo) if self.min is None else min(self.min, float(lo))
+        self.max = float(hi) if self.max is None else max(self.max, float(hi))
+
+    def update(self, values: np.ndarray):
+        if values.size:
+            self.add(values.size, values.sum(), values.min(), values.max())
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0
+
+    def copy(self) -> "RunningStat":
+        other = RunningStat()
+        other.count, other.total, other.min, other.max = self.count, self.total, self.min, self.max
+        return other
+
+
+# Ngưỡng phân loại BMI theo WHO: thiếu cân / bình thường / thừa cân / béo phì
+BMI_BINS = (18.5, 25, 30)
+
+
+class CohortStats:
+    """Thống kê cho tất cả báo cáo, tính trong một lượt và cập nhật tăng dần
+
+    `update()` quét mỗi cột của phần dữ liệu mới đúng một lần; các báo cáo
+    chỉ đọc lại các bộ đếm nên không cần quét lại toàn bộ dữ liệu.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.gender: Dict[str, int] = {}
+        self.age = RunningStat()
+        self.age_by_gender: Dict[str, RunningStat] = {}
+        self.stone_type: Dict[str, int] = {}
+        self.surgery_result: Dict[str, int] = {}
+        self.surgery_result_missing = 0
+        self.surgery_time = RunningStat()
+        self.complications = 0
+        self.bmi = RunningStat()
+        self.bmi_classes = [0] * (len(BMI_BINS) + 1)
+        self.height = RunningStat()
+        self.weight = RunningStat()
+
+    def update(self, store: PatientStore, rows: slice = slice(None)):
+        """Cộng dồn thống kê của các dòng `rows` trong `store`"""
+        self.total += len(store.ids[rows])
+
+        gender = store.codes['gender'][rows]
+        ages = store.numeric['age'][rows]
+        _add_counts(self.gender, store.categories['gender'], gender)
+        self.age.update(_valid(ages))
+        for label, group in zip(store.categories['gender'], _group_stats(gender, ages, len(store.categories['gender']))):
+            self.age_by_gender.setdefault(label, RunningStat()).add(*group)
+
+        _add_counts(self.stone_type, store.categories['stone_type'], store.codes['stone_type'][rows])
+
+        surgery_result = store.codes['surgery_result'][rows]
+        _add_counts(self.surgery_result, store.categories['surgery_result'], surgery_result)
+        self.surgery_result_missing += int(np.count_nonzero(surgery_result < 0))
+
+        surgery_time = store.numeric['surgery_time_minutes'][rows]
+        self.surgery_time.update(surgery_time[_nonzero(surgery_time)])
+        self.complications += int(np.count_nonzero(store.codes['complications'][rows] >= 0))
+
+        # Báo cáo BMI tính từ chiều cao/cân nặng (không làm tròn) trên các ca có đủ cả hai,
+        # không dùng cột BMI đã làm tròn 1 chữ số: ca sát ngưỡng 25/30 sẽ bị xếp sai nhóm
+        height = store.numeric['height'][rows]
+        weight = store.numeric['weight'][rows]
+        usable = _nonzero(height) & _nonzero(weight)
+        height, weight = height[usable], weight[usable]
+        self.height.update(height)
+        self.weight.update(weight)
+        bmi = weight / (height / 100) ** 2
+        self.bmi.update(bmi)
+        classes = np.bincount(np.searchsorted(BMI_BINS, bmi, side='right'), minlength=len(self.bmi_classes))
+        self.bmi_classes = [a + int(b) for a, b in zip(self.bmi_classes, classes)]
+
+    def copy(self) -> "CohortStats":
+        other = CohortStats()
+        for name, value in vars(self).items():
+            if isinstance(value, RunningStat):
+                value = value.copy()
+            elif isinstance(value, dict):
+                value = {k: v.copy() if isinstance(v, RunningStat) else v for k, v in value.items()}
+            elif isinstance(value, list):
+                value = list(value)
+            setattr(other, name, value)
+        return other
+
+
+def _add_counts(target: Dict[str, int], labels: List[str], codes: np.ndarray):
+    """Cộng số lần xuất hiện của từng giá trị phân loại vào `target` (giữ thứ tự xuất hiện)"""
+    counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+    for label, count in zip(labels, counts):
+        if count:
+            target[label] = target.get(label, 0) + int(count)
+
+
+def _group_stats(codes: np.ndarray, values: np.ndarray, size: int):
+    """(count, total, min, max) của `values` theo từng mã nhóm, trong một lượt"""
+    valid = (codes >= 0) & ~np.isnan(values)
+    groups = codes[valid]
+    values = values[valid]
+    counts = np.bincount(groups, minlength=size)
+    totals = np.bincount(groups, weights=values, minlength=size)
+    lows = np.full(size, np.inf)
+    highs = np.full(size, -np.inf)
+    np.minimum.at(lows, groups, values)
+    np.maximum.at(highs, groups, values)
+    return list(zip(counts, totals, lows, highs))
+
+
+class CategoryDictionary:
+    """Từ điển giá trị -> mã, gộp dần từ nhiều khối hoặc nhiều file"""
+
+    def __init__(self, labels: List[str] = ()):
+        self.labels = list(labels)
+        self._lookup = {label: code for code, label in enumerate(self.labels)}
+
+    def remap(self, labels: List[str]) -> np.ndarray:
+        """Thêm các giá trị mới và trả về bảng ánh xạ mã cục bộ -> mã chung"""
+        remap = np.empty(len(labels), dtype=np.int32)
+        for code, label in enumerate(labels):
+            if label not in self._lookup:
+                self._lookup[label] = len(self.labels)
+                self.labels.append(label)
+            remap[code] = self._lookup[label]
+        return remap
+
+
+def _merge_categories(base: List[str], labels: List[str]):
+    """Gộp từ điển `labels` vào `base`; trả về từ điển mới và bảng ánh xạ mã cũ -> mã mới"""
+    merged = CategoryDictionary(base)
+    remap = merged.remap(labels)
+    return merged.labels, remap
+
+
+def _remap_codes(codes: np.ndarray, remap: np.ndarray) -> np.ndarray:
+    """Đổi mã theo bảng ánh xạ, giữ nguyên mã thiếu -1"""
+    if not remap.size:
+        return np.full(len(codes), -1, dtype=np.int32)
+    return np.where(codes >= 0, remap[np.maximum(codes, 0)], -1).astype(np.int32)
+
+
+@functools.lru_cache(maxsize=32)
+def _resolve_columns(columns: tuple) -> Dict[str, Optional[str]]:
+    """Tên cột nguồn cho từng trường (alias đầu tiên có trong CSV), tính một lần cho mỗi bộ tiêu đề"""
+    present = set(columns)
+    return {field: next((alias for alias in aliases if alias in present), None)
+            for field, aliases in NUMERIC_FIELDS + TEXT_FIELDS}
+
+
+# Số ví dụ giá trị lỗi giữ lại cho mỗi cột trong báo cáo chất lượng dữ liệu
+QUALITY_EXAMPLES = 3
+
+
+def _coerce_numeric(series: pd.Series):
+    """Ép một cột sang float64 (vector hóa), trả về (giá trị, thống kê thiếu/lỗi parse)
+
+    Cột pandas đã đọc được là số (decimal comma xử lý trong read_csv) được dùng
+    thẳng; cột lẫn chữ được mã hóa từ điển trước, rồi chỉ các giá trị khác nhau
+    được bỏ khoảng trắng, đổi dấu phẩy thập phân và ép bằng
+    pd.to_numeric(errors='coerce'). Ô có nội dung nhưng không thành số là lỗi.
+    """
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        return values, {'missing': int(np.count_nonzero(np.isnan(values))), 'failed': 0, 'examples': []}
+
+    codes, uniques = pd.factorize(series)
+    text = pd.Series(np.asarray(uniques, dtype=str)).str.strip()
+    present = (text != '').to_numpy()
+    parsed = pd.to_numeric(text.str.replace(',', '.', regex=False).where(present),
+                           errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    failed = present & np.isnan(parsed)
+    # Mã -1 (ô trống) trỏ vào phần tử thêm ở cuối bảng tra
+    values = np.append(parsed, np.nan)[codes]
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    return values, {
+        'missing': int(len(series) - counts[present].sum()),
+        'failed': int(counts[failed].sum()),
+        'examples': text[failed].tolist()[:QUALITY_EXAMPLES],
+    }
+
+
+def _encode_series(series: pd.Series):
+    """Mã hóa từ điển một cột văn bản; chỉ làm sạch (str + strip) trên các giá trị khác nhau"""
+    codes, uniques = pd.factorize(series)
+    labels = np.array([str(value).strip() for value in uniques], dtype=object)
+    label_codes, categories = _encode_text(labels)
+    return _remap_codes(codes.astype(np.int32), label_codes), categories
+
+
+def merge_quality(parts: List[Optional[Dict[str, Dict[str, Any]]]]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Cộng dồn báo cáo chất lượng của nhiều khối/file (bỏ qua phần không có báo cáo)"""
+    parts = [part for part in parts if part]
+    if not parts:
+        return None
+    merged: Dict[str, Dict[str, Any]] = {}
+    for part in parts:
+        for field, entry in part.items():
+            target = merged.setdefault(field, {'column': None})
+            if entry.get('column') and not target['column']:
+                target['column'] = entry['column']
+            for key in ('missing', 'failed'):
+                if key in entry:
+                    target[key] = target.get(key, 0) + entry[key]
+            if 'examples' in entry:
+                examples = target.setdefault('examples', [])
+                examples.extend(e for e in entry['examples'] if e not in examples)
+                del examples[QUALITY_EXAMPLES:]
+    return merged
+
+
+def _encode_text(values: np.ndarray):
+    """Mã hóa từ điển một cột chuỗi, giữ thứ tự xuất hiện đầu tiên"""
+    values = values.copy()
+    values[values == ''] = None
+    codes, uniques = pd.factorize(values)
+    return codes.astype(np.int32), [str(u) for u in uniques]
+
+
+def _derive_columns(numeric: Dict[str, np.ndarray]):
+    """Tính tuổi và BMI cho toàn bộ cột trong một lượt vector hóa"""
+    numeric['age'] = REFERENCE_YEAR - numeric['birth_year']
+
+    height = numeric['height']
+    weight = numeric['weight']
+    bmi = numeric['bmi']
+    # Tính BMI nếu có chiều cao và cân nặng và chưa có BMI
+    missing = np.isnan(bmi) | (bmi == 0)
+    usable = missing & (np.nan_to_num(height) != 0) & (np.nan_to_num(weight) != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        derived = np.round(weight / (height / 100) ** 2, 1)
+    numeric['bmi'] = np.where(usable, derived, bmi)
+
+
+# Snapshot nhị phân: mỗi cột là một file thô đọc bằng np.memmap, kèm meta.json
+def csv_fingerprint(path: str, with_hash: bool = True) -> Dict[str, Any]:
+    """Dấu vân tay của file CSV: kích thước, mtime và (tùy chọn) sha256 nội dung"""
+    st = os.stat(path)
+    fingerprint = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
+
+
+def snapshot_dir(path: str) -> str:
+    """Thư mục snapshot của một file CSV (YTE_CACHE_DIR hoặc .yte_cache cạnh file CSV)
+
+    Trong YTE_CACHE_DIR dùng chung, tên snapshot kèm mã băm của thư mục chứa file
+    để hai file cùng tên ở hai thư mục (vd. hospA/2025-01.csv, hospB/2025-01.csv)
+    không ghi đè snapshot của nhau.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    cache_root = os.environ.get('YTE_CACHE_DIR')
+    if not cache_root:
+        return os.path.join(directory, SNAPSHOT_DIR_NAME, os.path.basename(path) + '.snapshot')
+    tag = hashlib.sha1(directory.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_root, f"{os.path.basename(path)}-{tag}.snapshot")
+
+
+def _snapshot_enabled() -> bool:
+    return os.environ.get('YTE_SNAPSHOT', '1') not in ('0', 'false', 'no')
+
+
+def _store_columns(store: PatientStore) -> Dict[str, np.ndarray]:
+    """Tất cả các cột của kho, đặt tên phẳng để ghi ra đĩa"""
+    columns = {'ids': store.ids}
+    columns.update({f'numeric.{name}': values for name, values in store.numeric.items()})
+    columns.update({f'codes.{name}': values for name, values in store.codes.items()})
+    return columns
+
+
+class SnapshotWriter:
+    """Ghi snapshot theo từng khối: các cột được nối thẳng vào file trên đĩa
+
+    Từ điển của các cột văn bản được gộp dần qua các khối, nên mã của mọi
+    khối đều trỏ vào cùng một danh sách categories trong meta.json.
+    """
+
+    def __init__(self, path: str):
+        self.target = snapshot_dir(path)
+        os.makedirs(os.path.dirname(self.target), exist_ok=True)
+        self.staging = tempfile.mkdtemp(prefix='.staging-', dir=os.path.dirname(self.target))
+        self.rows = 0
+        self.dtypes: Dict[str, str] = {}
+        self.dictionaries: Dict[str, CategoryDictionary] = {}
+        self.quality: Optional[Dict[str, Dict[str, Any]]] = None
+        self._files = {}
+
+    def append(self, store: PatientStore):
+        """Nối một khối dữ liệu vào snapshot đang ghi"""
+        codes = {}
+        for field, values in store.codes.items():
+            remap = self.dictionaries.setdefault(field, CategoryDictionary()).remap(store.categories[field])
+            codes[field] = _remap_codes(values, remap)
+
+        chunk = PatientStore(store.ids, store.numeric, codes, store.categories)
+        for name, values in _store_columns(chunk).items():
+            handle = self._files.get(name)
+            if handle is None:
+                handle = self._files[name] = open(os.path.join(self.staging, name + '.bin'), 'ab')
+            values = np.ascontiguousarray(values)
+            values.tofile(handle)
+            self.dtypes[name] = values.dtype.str
+        self.rows += len(store)
+        self.quality = merge_quality([self.quality, store.quality])
+
+    def commit(self, fingerprint: Dict[str, Any]) -> str:
+        """Ghi meta.json và thay snapshot cũ một cách nguyên tử"""
+        try:
+            self._close()
+            meta = {
+                'format': SNAPSHOT_FORMAT,
+                'source': fingerprint,
+                'rows': self.rows,
+                'columns': self.dtypes,
+                'categories': {field: d.labels for field, d in self.dictionaries.items()},
+                'quality': self.quality,
+            }
+            with open(os.path.join(self.staging, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            _replace_dir(self.staging, self.target)
+        except Exception:
+            self.abort()
+            raise
+        return self.target
+
+    def abort(self):
+        self._close()
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def _close(self):
+        for handle in self._files.values():
+            handle.close()
+        self._files.clear()
+
+
+def save_snapshot(store: PatientStore, path: str, fingerprint: Dict[str, Any]) -> str:
+    """Ghi snapshot của kho dữ liệu; thay thế nguyên tử bản cũ"""
+    writer = SnapshotWriter(path)
+    try:
+        writer.append(store)
+    except Exception:
+        writer.abort()
+        raise
+    return writer.commit(fingerprint)
+
+
+def _replace_dir(source: str, target: str):
+    """Đổi tên thư mục `source` thành `target`, bỏ bản cũ nếu có"""
+    if os.path.exists(target):
+        trash = tempfile.mkdtemp(prefix='.old-', dir=os.path.dirname(target))
+        os.replace(target, os.path.join(trash, 'snapshot'))
+        os.replace(source, target)
+        shutil.rmtree(trash, ignore_errors=True)
+    else:
+        os.replace(source, target)
+
+
+def _read_snapshot_meta(target: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(target, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('format') == SNAPSHOT_FORMAT else None
+
+
+def _snapshot_is_fresh(meta: Dict[str, Any], path: str, target: str) -> bool:
+    """Snapshot còn khớp với CSV: so nhanh size+mtime, nếu lệch thì so sha256"""
+    source = meta['source']
+    current = csv_fingerprint(path, with_hash=False)
+    if current['size'] != source['size']:
+        return False
+    if current['mtime_ns'] == source['mtime_ns']:
+        return True
+    # mtime đổi nhưng nội dung có thể giữ nguyên (copy, touch, checkout lại)
+    current = csv_fingerprint(path)
+    if current['sha256'] != source['sha256']:
+        return False
+    meta['source'] = current
+    # Ghi file tạm rồi os.replace: tiến trình khác đang đọc không bao giờ thấy meta.json dở dang
+    fd, staging = tempfile.mkstemp(prefix='.meta-', dir=target)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(staging, os.path.join(target, 'meta.json'))
+    except BaseException:
+        os.unlink(staging)
+        raise
+    return True
+
+
+def load_snapshot(path: str) -> Optional[PatientStore]:
+    """Memory-map snapshot của CSV nếu còn mới, ngược lại trả về None"""
+    target = snapshot_dir(path)
+    meta = _read_snapshot_meta(target)
+    if meta is None or not _snapshot_is_fresh(meta, path, target):
+        return None
+
+    rows = meta['rows']
+    columns = {}
+    for name, dtype in meta['columns'].items():
+        if rows:
+            columns[name] = np.memmap(os.path.join(target, name + '.bin'), dtype=np.dtype(dtype),
+                                      mode='r', shape=(rows,))
+        else:
+            columns[name] = np.empty(0, dtype=np.dtype(dtype))
+
+    numeric = {name[len('numeric.'):]: values for name, values in columns.items() if name.startswith('numeric.')}
+    codes = {name[len('codes.'):]: values for name, values in columns.items() if name.startswith('codes.')}
+    store = PatientStore(columns['ids'], numeric, codes, meta['categories'])
+    store.quality = meta.get('quality')
+    return store
+
+
+class IdRegistry:
+    """Cấp khoảng ID cố định cho từng file nguồn khi gộp nhiều file CSV
+
+    Mỗi file (theo tên) giữ danh sách khoảng [ID đầu, số dòng] đã được cấp. File
+    mới, hoặc các dòng mới thêm vào cuối một file cũ, được cấp khoảng tiếp theo
+    sau ID lớn nhất đã cấp; ID đã cấp không bao giờ được dùng lại. Nhờ vậy thêm
+    một file (kể cả file đứng trước các file cũ khi sắp xếp) không làm đổi ID của
+    bệnh nhân đã có. Registry được lưu cạnh snapshot (ID_REGISTRY_NAME).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.extents: Dict[str, List[List[int]]] = {}
+        self.next_id = 1
+        self.dirty = False
+        if path is not None:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+                self.extents = data['extents']
+                self.next_id = data['next_id']
+            except (OSError, ValueError, KeyError):
+                pass
+
+    def assign(self, source: str, rows: int) -> np.ndarray:
+        """ID cho `rows` dòng đầu của file `source`, cấp thêm khoảng mới nếu file dài ra"""
+        extents = self.extents.setdefault(source, [])
+        reserved = sum(count for _, count in extents)
+        if rows > reserved:
+            extents.append([self.next_id, rows - reserved])
+            self.next_id += rows - reserved
+            self.dirty = True
+        ids = [np.arange(first, first + count, dtype=np.int64) for first, count in extents]
+        return np.concatenate(ids)[:rows] if ids else np.empty(0, dtype=np.int64)
+
+    def save(self):
+        """Ghi registry (nguyên tử) nếu có khoảng mới được cấp"""
+        if self.path is None or not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, staging = tempfile.mkstemp(prefix='.ids-', dir=os.path.dirname(self.path))
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'next_id': self.next_id, 'extents': self.extents}, f, ensure_ascii=False)
+        os.replace(staging, self.path)
+        self.dirty = False
+
+
+# Registry ID của từng nguồn nhiều file khi không ghi snapshot (chỉ giữ trong process)
+_id_registries: Dict[str, IdRegistry] = {}
+
+
+def source_root(path: str) -> str:
+    """Thư mục gốc cố định của một nguồn: chính thư mục, hoặc phần đầu không có ký tự glob của mẫu
+
+    Vd. 'data/*/2025-*.csv' -> 'data'. Nhãn nguồn và khóa registry ID là đường dẫn
+    tương đối so với thư mục này, nên không đổi khi có thêm file khớp mẫu.
+    """
+    path = os.path.abspath(path)
+    if os.path.isdir(path):
+        return path
+    parts = path.split(os.sep)
+    fixed = list(itertools.takewhile(lambda part: not any(char in part for char in '*?['), parts))
+    if len(fixed) == len(parts):
+        fixed.pop()
+    return os.sep.join(fixed) or os.sep
+
+
+def source_label(path: str, root: str) -> str:
+    """Nhãn nguồn của một file: đường dẫn tương đối so với `root` (dấu '/'), vd. 'hospA/2025-01.csv'"""
+    return os.path.relpath(os.path.abspath(path), root).replace(os.sep, '/')
+
+
+def id_registry_path(path: str) -> str:
+    """File registry ID của một nguồn thư mục/glob (YTE_CACHE_DIR hoặc .yte_cache trong thư mục gốc của nguồn)"""
+    cache_root = os.environ.get('YTE_CACHE_DIR') or os.path.join(source_root(path), SNAPSHOT_DIR_NAME)
+    return os.path.join(cache_root, ID_REGISTRY_NAME)
+
+
+def _id_registry(path: str) -> IdRegistry:
+    """Registry ID của nguồn: đọc từ đĩa nếu dùng snapshot, ngược lại giữ trong bộ nhớ"""
+    registry_path = id_registry_path(path)
+    if _snapshot_enabled():
+        return IdRegistry(registry_path)
+    return _id_registries.setdefault(registry_path, IdRegistry())
+
+
+def resolve_csv_paths(path: str) -> List[str]:
+    """Danh sách file CSV của một nguồn: một file, một thư mục, hoặc một mẫu glob"""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, '*.csv')))
+    if any(char in path for char in '*?['):
+        return sorted(glob.glob(path))
+    return [path]
+
+
+def _is_multi_source(path: str) -> bool:
+    return os.path.isdir(path) or any(char in path for char in '*?[')
+
 
 # Load dữ liệu trực tiếp từ OK-2.csv
-def load_yte_data():
-    """Load dữ liệu y tế trực tiếp từ OK-2.csv"""
+def load_patient_store(path: str = DEFAULT_CSV_NAME) -> Optional[PatientStore]:
+    """Load dữ liệu y tế từ một file CSV, hoặc từ thư mục/glob nhiều file cùng định dạng OK-2.csv"""
+    if _is_multi_source(path):
+        return load_csv_files(resolve_csv_paths(path), registry=_id_registry(path), root=source_root(path))
+    return _load_csv_file(path)
+
+
+def _load_csv_file(path: str) -> Optional[PatientStore]:
+    """Load một file CSV thành kho dạng cột (dùng snapshot nếu còn mới)"""
     try:
-        if os.path.exists('OK-2.csv'):
+        if os.path.exists(path):
+            if _snapshot_enabled():
+                store = _load_snapshot_safely(path)
+                if store is not None:
+                    telemetry.event(f"✅ Đã load {len(store)} bệnh nhân từ snapshot của {os.path.basename(path)}")
+                    return store
+
+            # File lớn: đọc theo khối, ghi thẳng xuống snapshot thay vì giữ cả file trong RAM
+            if _snapshot_enabled() and os.path.getsize(path) >= STREAMING_THRESHOLD_BYTES:
+                return ingest_csv_streaming(path)
+
+            # Lấy dấu vân tay trước khi đọc để không bỏ sót thay đổi trong lúc parse
+            fingerprint = csv_fingerprint(path) if _snapshot_enabled() else None
             # Đọc CSV với pandas, xử lý decimal separator
-            df = pd.read_csv('OK-2.csv', decimal=',')
-            
-            # Chuyển đổi DataFrame thành list of dict
-            patients = []
-            for index, row in df.iterrows():
-                # Tính tuổi từ năm sinh
-                birth_year = safe_convert(row.get('Năm sinh ', row.get('Năm sinh')))
-                age = 2025 - birth_year if birth_year else None
-                
-                patient = {
-                    'id': index + 1,
-                    'birth_year': birth_year,
-                    'age': age,
-                    'gender': str(row.get('Giới tính', '')).strip(),
-                    'admission_date': str(row.get('Ngày nhập viện ', row.get('Ngày nhập viện', ''))).strip(),
-                    'height': safe_convert(row.get('Chiều cao', '')),
-                    'weight': safe_convert(row.get('Cân nặng ', row.get('Cân nặng', ''))),
-                    'bmi': safe_convert(row.get('BMI', '')),
-                    'medical_history': str(row.get('Tiền căn nội khoa ', row.get('Tiền căn nội khoa', ''))).strip(),
-                    'previous_surgery': str(row.get('Tiền căn đã mổ sỏi thận ', row.get('Tiền căn đã mổ sỏi thận', ''))).strip(),
-                    'stone_type': str(row.get('Loại sỏi ', row.get('Loại sỏi', ''))).strip(),
-                    'stone_size': str(row.get('Kích thước sỏi 3 chiều (khối lớn nhất) ', row.get('Kích thước sỏi 3 chiều (khối lớn nhất)', ''))).strip(),
-                    'num_stones': safe_convert(row.get('Số lượng sỏi ', row.get('Số lượng sỏi', ''))),
-                    'hu': safe_convert(row.get('HU', '')),
-                    'surgery_date': str(row.get('Ngày PT', '')).strip(),
-                    'surgery_position': str(row.get('Tư thế', '')).strip(),
-                    'surgery_time_minutes': safe_convert(row.get('Thời gian phẫu thuật (phút)', '')),
-                    'surgery_result': str(row.get('Sạch sỏi trên C-arm ngay sau mổ ', row.get('Sạch sỏi trên C-arm ngay sau mổ', ''))).strip(),
-                    'residual_stones': str(row.get('Nếu sót sỏi trên C-arm ngay sau mổ (số lượng/vị trí/kích thước) ', '')).strip(),
-                    'complications': str(row.get('Biến chứng ', row.get('Biến chứng', ''))).strip(),
-                    'hb': safe_convert(row.get('Hb (g/dL)', '')),
-                    'plt': safe_convert(row.get('PLT (K/uL)', '')),
-                    'creatinin': safe_convert(row.get('Creatinin ', row.get('Creatinin', ''))),
-                    'egfr': safe_convert(row.get('eGFR', '')),
-                }
-                
-                # Tính BMI nếu có chiều cao và cân nặng và chưa có BMI
-                if not patient['bmi'] and patient['height'] and patient['weight']:
-                    height_m = patient['height'] / 100
-                    patient['bmi'] = round(patient['weight'] / (height_m ** 2), 1)
-                
-                patients.append(patient)
-            
-            print(f"✅ Đã load {len(patients)} bệnh nhân từ OK-2.csv")
-            return patients
-            
+            with telemetry.span('parse', file=os.path.basename(path)):
+                df = pd.read_csv(path, decimal=',')
+            with telemetry.span('normalize', rows=len(df)):
+                store = PatientStore.from_dataframe(df, source=os.path.basename(path))
+            telemetry.event(f"✅ Đã load {len(store)} bệnh nhân từ {os.path.basename(path)}")
+
+            if fingerprint is not None:
+                try:
+                    with telemetry.span('snapshot.save'):
+                        save_snapshot(store, path, fingerprint)
+                except OSError as e:
+                    telemetry.event(f"⚠️ Không ghi được snapshot: {e}", logging.WARNING)
+            return store
+
         else:
-            print("⚠️ Không tìm thấy file OK-2.csv")
-            return []
-            
+            telemetry.event(f"⚠️ Không tìm thấy file {path}", logging.WARNING)
+            return None
+
     except Exception as e:
-        print(f"❌ Lỗi đọc file OK-2.csv: {e}")
+        telemetry.event(f"❌ Lỗi đọc file {path}: {e}", logging.ERROR)
+        return None
+
+
+def load_csv_files(paths: List[str], workers: Optional[int] = None,
+                   registry: Optional[IdRegistry] = None, root: Optional[str] = None) -> Optional[PatientStore]:
+    """Parse nhiều file CSV song song trên một process pool rồi gộp thành một kho
+
+    Mỗi worker trả về một kho dạng cột gọn (mảng numpy + từ điển) của một file;
+    ID được cấp theo khoảng của từng file trong `registry` nên không bị trùng giữa
+    các file và không đổi khi thêm file mới. Cột `source` (cũng là khóa trong
+    registry) là đường dẫn file tương đối so với `root` (mặc định: thư mục chung
+    của các file), nên hai file cùng tên ở hai thư mục là hai nguồn khác nhau.
+    """
+    if not paths:
+        telemetry.event("⚠️ Không tìm thấy file CSV nào", logging.WARNING)
+        return None
+
+    workers = min(len(paths), workers or INGEST_WORKERS or os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            stores = list(pool.map(_load_csv_file, paths))
+    else:
+        stores = [_load_csv_file(path) for path in paths]
+
+    root = root or os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    labelled = []
+    for path, store in zip(paths, stores):
+        if store is not None:
+            store.categories = {**store.categories, SOURCE_FIELD: [source_label(path, root)]}
+            labelled.append(store)
+    stores = labelled
+    if not stores:
+        return None
+    store = merge_stores(stores, registry)
+    if registry is not None:
+        try:
+            registry.save()
+        except OSError as e:
+            telemetry.event(f"⚠️ Không ghi được registry ID: {e}", logging.WARNING)
+    telemetry.event(f"✅ Đã gộp {len(store)} bệnh nhân từ {len(stores)} file CSV")
+    return store
+
+
+def merge_stores(stores: List[PatientStore], registry: Optional[IdRegistry] = None) -> PatientStore:
+    """Gộp nhiều kho thành một; ID lấy theo khoảng của từng file nguồn trong `registry`
+
+    Không có registry thì ID được đánh 1..N theo thứ tự các kho.
+    """
+    registry = registry if registry is not None else IdRegistry()
+    ids = np.concatenate([
+        registry.assign(store.categories[SOURCE_FIELD][0] if store.categories[SOURCE_FIELD] else '', len(store))
+        for store in stores
+    ])
+    numeric = {field: np.concatenate([np.asarray(store.numeric[field]) for store in stores])
+               for field in stores[0].numeric}
+    codes = {}
+    categories = {}
+    for field in stores[0].codes:
+        merged = CategoryDictionary()
+        codes[field] = np.concatenate([
+            _remap_codes(np.asarray(store.codes[field]), merged.remap(store.categories[field]))
+            for store in stores
+        ])
+        categories[field] = merged.labels
+    store = PatientStore(ids, numeric, codes, categories)
+    store.quality = merge_quality([part.quality for part in stores])
+    return store
+
+
+def ingest_csv_streaming(path: str, chunk_rows: int = CHUNK_ROWS, progress=None) -> PatientStore:
+    """Đọc CSV lớn theo từng khối với bộ nhớ giới hạn
+
+    Mỗi khối được chuẩn hóa (decimal comma, tên cột có dấu cách ở cuối như khi
+    đọc thường), cộng dồn vào thống kê và nối vào snapshot trên đĩa; cuối cùng
+    snapshot được memory-map nên không khối nào phải nằm lại trong RAM.
+
+    `progress(rows, bytes_read, total_bytes)` được gọi sau mỗi khối; mặc định in
+    tiến độ ra màn hình.
+    """
+    progress = progress or _print_progress
+    fingerprint = csv_fingerprint(path)
+    total_bytes = fingerprint['size']
+    writer = SnapshotWriter(path)
+    stats = CohortStats()
+    try:
+        with open(path, 'rb') as f:
+            for df in pd.read_csv(f, decimal=',', chunksize=chunk_rows):
+                chunk = PatientStore.from_dataframe(df, first_id=writer.rows + 1, source=os.path.basename(path))
+                stats.update(chunk)
+                writer.append(chunk)
+                progress(writer.rows, f.tell(), total_bytes)
+    except Exception:
+        writer.abort()
+        raise
+    writer.commit(fingerprint)
+
+    store = load_snapshot(path)
+    if store is None:
+        raise RuntimeError(f"Snapshot của {path} thay đổi trong lúc đọc")
+    store.stats = stats
+    telemetry.event(f"✅ Đã load {len(store)} bệnh nhân từ {os.path.basename(path)} (streaming)")
+    return store
+
+
+def _print_progress(rows: int, bytes_read: int, total_bytes: int):
+    percent = bytes_read / total_bytes * 100 if total_bytes else 100
+    telemetry.event(f"⏳ Đã xử lý {rows} dòng ({percent:.0f}%)")
+
+
+def _load_snapshot_safely(path: str) -> Optional[PatientStore]:
+    """Snapshot hỏng hoặc không đọc được thì bỏ qua và parse lại CSV"""
+    try:
+        with telemetry.span('snapshot.load', file=os.path.basename(path)):
+            return load_snapshot(path)
+    except (OSError, ValueError, KeyError) as e:
+        telemetry.event(f"⚠️ Bỏ qua snapshot lỗi: {e}", logging.WARNING)
+        return None
+
+
+def load_yte_data():
+    """Load dữ liệu y tế trực tiếp từ OK-2.csv (view list of dict tương thích)"""
+    store = get_store()
+    return PatientRecords(store) if store is not None else []
+
+
+def _valid(values: np.ndarray) -> np.ndarray:
+    """Lọc bỏ giá trị thiếu (NaN)"""
+    return values[~np.isnan(values)]
+
+
+def _nonzero(values: np.ndarray) -> np.ndarray:
+    """Mặt nạ giá trị có mặt và khác 0 (tương đương kiểm tra truthy cũ)"""
+    return ~np.isnan(values) & (values != 0)
+
+
+# Dữ liệu y tế được load lười: chỉ parse CSV ở lần gọi yte()/yte_info() đầu tiên
+_csv_path: Optional[str] = None
+_store: Optional[PatientStore] = None
+_loaded = False
+_load_lock = threading.Lock()
+_dataset_version = 0
+_report_cache = ReportCache(REPORT_CACHE_SIZE, REPORT_CACHE_TTL)
+# Dấu vân tay (kích thước, mtime) các file nguồn của kho đang dùng, để phát hiện thay đổi
+_sources: Dict[str, tuple] = {}
+_reload_lock = threading.Lock()
+# Lock riêng cho luồng theo dõi: get_store() khởi động luồng mà không phải chờ một lần load lại đang chạy
+_reloader_lock = threading.Lock()
+_reloader_thread: Optional[threading.Thread] = None
+_reloader_stop = threading.Event()
+_reloader_pid: Optional[int] = None
+
+
+def default_csv_path() -> str:
+    """Đường dẫn CSV mặc định: YTE_CSV_PATH, ./OK-2.csv, rồi multi_tool_agent/OK-2.csv"""
+    env_path = os.environ.get('YTE_CSV_PATH')
+    if env_path:
+        return env_path
+    if os.path.exists(DEFAULT_CSV_NAME):
+        return DEFAULT_CSV_NAME
+    return os.path.join(_MODULE_DIR, 'multi_tool_agent', DEFAULT_CSV_NAME)
+
+
+def get_data_path() -> str:
+    """Đường dẫn CSV đang được dùng"""
+    return _csv_path or default_csv_path()
+
+
+def set_data_path(path: str):
+    """Đổi file CSV nguồn; dữ liệu sẽ được load lại ở lần gọi tiếp theo"""
+    global _csv_path, _store, _loaded
+    with _load_lock:
+        _csv_path = path
+        _store = None
+        _loaded = False
+        _report_cache.clear()
+
+
+def get_store() -> Optional[PatientStore]:
+    """Trả về kho dữ liệu, load ở lần gọi đầu tiên (an toàn khi gọi đồng thời)
+
+    Kho trả về không bao giờ bị sửa tại chỗ: load lại hay thêm bệnh nhân đều thay
+    bằng kho mới, nên lời gọi đang giữ kho cũ vẫn thấy dữ liệu nhất quán.
+    """
+    global _loaded
+    if not _loaded:
+        with _load_lock:
+            # Kiểm tra lại trong lock để các lời gọi đồng thời chỉ parse một lần
+            if not _loaded:
+                path = get_data_path()
+                sources = _source_fingerprints(path)
+                _publish(_build_store(path), sources)
+                _loaded = True
+    # Luồng theo dõi không sống qua fork, nên mỗi process tự khởi động luồng của mình
+    if RELOAD_INTERVAL > 0 and _reloader_pid != os.getpid():
+        start_reloader()
+    return _store
+
+
+def _build_store(path: str) -> Optional[PatientStore]:
+    """Load và dựng index/thống kê cho một kho mới (chưa đưa vào dùng)"""
+    with telemetry.span('load', path=path):
+        store = load_patient_store(path)
+        if store is not None:
+            _print_quality_warning(store)
+            with telemetry.span('index'):
+                store.build_index()
+                if store.stats is None:
+                    store.build_stats()
+            with telemetry.span('cube'):
+                store.build_cube()
+    return store
+
+
+def _publish(store: Optional[PatientStore], sources: Dict[str, tuple]):
+    """Đưa kho vào dùng với phiên bản mới (gọi trong _load_lock)
+
+    Kho được gán phiên bản trước rồi mới thay vào bằng một phép gán, nên không
+    lời gọi nào thấy kho mới với phiên bản cũ. Cache báo cáo và cursor đều khóa
+    theo phiên bản của kho nên mục của kho cũ không bị dùng lại.
+    """
+    global _store, _dataset_version, _sources
+    _dataset_version += 1
+    if store is not None:
+        store.version = _dataset_version
+        store.loaded_at = time.time()
+    _store = store
+    _sources = sources
+    _report_cache.clear()
+
+
+def _source_fingerprints(path: str) -> Dict[str, tuple]:
+    """(kích thước, mtime) của từng file CSV nguồn; sửa, thêm hay xóa file đều làm kết quả đổi"""
+    paths = resolve_csv_paths(path) if _is_multi_source(path) else [path]
+    fingerprints = {}
+    for csv_path in paths:
+        try:
+            stat = os.stat(csv_path)
+        except OSError:
+            continue
+        fingerprints[csv_path] = (stat.st_size, stat.st_mtime_ns)
+    return fingerprints
+
+
+def reload_dataset(force: bool = False) -> bool:
+    """Load lại dữ liệu nếu file CSV nguồn đã thay đổi (hoặc `force`), thay kho mới vào nguyên tử
+
+    Kho mới được dựng ngoài _load_lock nên yte() vẫn trả lời bằng kho cũ trong lúc
+    dựng. Nếu load lỗi (vd. file đang được ghi dở) thì giữ kho cũ và thử lại ở lần
+    kiểm tra sau. Bệnh nhân thêm bằng append_patients() không có trong CSV nên sẽ
+    mất khi load lại. Trả về True nếu đã thay kho.
+    """
+    # Load lần đầu (và khởi động luồng theo dõi) ngoài _reload_lock: get_store() có thể gọi start_reloader()
+    get_store()
+    with _reload_lock:
+        path = get_data_path()
+        # Lấy dấu vân tay trước khi đọc để thay đổi trong lúc parse được phát hiện ở lần sau
+        sources = _source_fingerprints(path)
+        if not force and sources == _sources:
+            return False
+        store = _build_store(path)
+        if store is None:
+            telemetry.event(f"⚠️ Không load lại được {path}, tiếp tục dùng dữ liệu cũ", logging.WARNING)
+            return False
+        with _load_lock:
+            # Nguồn dữ liệu đã bị đổi (set_data_path) trong lúc dựng: bỏ kho vừa dựng
+            if not _loaded or path != get_data_path():
+                return False
+            _publish(store, sources)
+    telemetry.event(f"🔄 Đã load lại {len(store)} bệnh nhân (phiên bản dữ liệu {store.version})")
+    return True
+
+
+def start_reloader(interval: Optional[float] = None) -> threading.Thread:
+    """Chạy luồng nền kiểm tra file CSV nguồn mỗi `interval` giây (mặc định RELOAD_INTERVAL)"""
+    global _reloader_thread, _reloader_stop, _reloader_pid
+    interval = interval or RELOAD_INTERVAL or 5.0
+    with _reloader_lock:
+        if _reloader_thread is not None and _reloader_thread.is_alive() and _reloader_pid == os.getpid():
+            return _reloader_thread
+        _reloader_stop = threading.Event()
+        _reloader_thread = threading.Thread(target=_poll_sources, args=(interval, _reloader_stop),
+                                            name='yte-reloader', daemon=True)
+        _reloader_pid = os.getpid()
+        _reloader_thread.start()
+        return _reloader_thread
+
+
+def stop_reloader():
+    """Dừng luồng theo dõi file CSV (không tự khởi động lại trong process này)"""
+    _reloader_stop.set()
+
+
+def _poll_sources(interval: float, stop: threading.Event):
+    while not stop.wait(interval):
+        try:
+            reload_dataset()
+        except Exception as e:
+            telemetry.event(f"❌ Lỗi load lại dữ liệu: {e}", logging.ERROR)
+
+
+def dataset_version() -> int:
+    """Phiên bản dữ liệu hiện tại, tăng mỗi lần load lại"""
+    return _dataset_version
+
+
+def report_cache_stats() -> Dict[str, Any]:
+    """Thống kê hit/miss của cache báo cáo tổng hợp"""
+    return _report_cache.stats()
+
+
+def configure_report_cache(maxsize: Optional[int] = None, ttl: Optional[float] = None):
+    """Đổi kích thước (số mục) và TTL (giây) của cache báo cáo"""
+    _report_cache.configure(maxsize, ttl)
+
+
+def append_patients(records: List[Dict[str, Any]]) -> int:
+    """Thêm bệnh nhân mới (dict cùng khóa với YTE_DATA) mà không cần load lại CSV
+
+    Index và thống kê chỉ được cập nhật cho các dòng mới; kho mới được thay vào
+    nguyên tử. Trả về tổng số bệnh nhân sau khi thêm.
+    """
+    get_store()
+    with _load_lock:
+        if _store is None:
+            raise RuntimeError("Chưa có dữ liệu y tế để thêm bệnh nhân")
+        first_id = int(_store.index.sorted_ids[-1]) + 1 if len(_store) else 1
+        chunk = PatientStore.from_records(records, first_id)
+        _publish(_store.extended(chunk), _sources)
+        return len(_store)
+
+
+def lookup_patients(patient_ids) -> List[Optional[Dict[str, Any]]]:
+    """Tra cứu nhiều bệnh nhân theo ID trong một lần gọi (None nếu không có)"""
+    store = get_store()
+    if store is None:
+        return [None for _ in patient_ids]
+    return [store.record(row) if row is not None else None for row in store.index.rows_of(patient_ids)]
+
+
+def _quality_failures(store: PatientStore) -> Dict[str, int]:
+    return {field: entry['failed'] for field, entry in (store.quality or {}).items() if entry.get('failed')}
+
+
+def _print_quality_warning(store: PatientStore):
+    failures = _quality_failures(store)
+    if failures:
+        telemetry.event(f"⚠️ {sum(failures.values())} ô số không parse được: "
+                        + ', '.join(f"{field} ({count})" for field, count in failures.items()), logging.WARNING)
+
+
+def data_quality_report(store: Optional[PatientStore] = None) -> str:
+    """Báo cáo chất lượng dữ liệu: cột nguồn, số ô thiếu và số ô không parse được theo từng trường"""
+    store = store if store is not None else get_store()
+    if store is None:
+        return "❌ Không có dữ liệu y tế"
+    if not store.quality:
+        return "ℹ️ Không có báo cáo chất lượng cho dữ liệu này (dữ liệu không đọc từ CSV)"
+
+    lines = [f"🧪 CHẤT LƯỢNG DỮ LIỆU ({os.path.basename(get_data_path())}, {len(store)} dòng)", ""]
+    missing_columns = []
+    for field, entry in store.quality.items():
+        if not entry.get('column'):
+            missing_columns.append(field)
+            continue
+        line = f"▪️ {field} ← '{entry['column'].strip()}': thiếu {entry.get('missing', 0)}"
+        if 'failed' in entry:
+            line += f", lỗi parse {entry['failed']}"
+            if entry.get('examples'):
+                line += f" (vd. {', '.join(repr(e) for e in entry['examples'])})"
+        lines.append(line)
+    if missing_columns:
+        lines.append(f"\n⚠️ Không tìm thấy cột cho: {', '.join(missing_columns)}")
+    failures = _quality_failures(store)
+    lines.append(f"\n📊 Tổng số ô không parse được: {sum(failures.values())}")
+    return "\n".join(lines)
+
+
+def warm_up(path: Optional[str] = None) -> int:
+    """Load trước dữ liệu (dùng cho server pre-fork), trả về số bệnh nhân"""
+    if path is not None:
+        set_data_path(path)
+    store = get_store()
+    return len(store) if store is not None else 0
+
+
+def __getattr__(name: str):
+    # YTE_DATA / YTE_STORE giữ tương thích nhưng chỉ load khi được truy cập
+    if name == 'YTE_DATA':
+        return load_yte_data()
+    if name == 'YTE_STORE':
+        return get_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Truy vấn có cấu trúc: lọc trên index trước, rồi mới tổng hợp trên các dòng đã chọn
+GENDER_ALIASES = {'nam': 'Nam', 'male': 'Nam', 'm': 'Nam', 'nu': 'Nữ', 'female': 'Nữ', 'f': 'Nữ'}
+GROUP_BY_FIELDS = POSTING_FIELDS + tuple(field for field in CUBE_DIMENSIONS if field not in POSTING_FIELDS) + ('month',)
+QUERY_METRICS = ('count', 'stone_free_rate', 'complication_rate') + tuple(
+    f'mean_{field}' for field in ['age'] + [name for name, _ in NUMERIC_FIELDS])
+METRIC_LABELS = {
+    'count': 'Số ca',
+    'stone_free_rate': 'Tỷ lệ sạch sỏi (%)',
+    'complication_rate': 'Tỷ lệ biến chứng (%)',
+}
+UNKNOWN_GROUP = 'Không xác định'
+
+
+def _match_codes(store: PatientStore, field: str, value: str) -> List[int]:
+    """Các mã phân loại khớp `value`: khớp đúng (không phân biệt dấu/hoa thường), nếu không có thì khớp chuỗi con"""
+    wanted = fold_text(value.strip())
+    if field == 'gender':
+        wanted = fold_text(GENDER_ALIASES.get(wanted, wanted))
+    folded = [fold_text(label) for label in store.categories[field]]
+    exact = [code for code, label in enumerate(folded) if label == wanted]
+    return exact or [code for code, label in enumerate(folded) if wanted in label]
+
+
+def _categorical_filter(store: PatientStore, field: str, codes: List[int]):
+    postings = store.index.postings[field]
+    return (sum(len(postings[code]) for code in codes),
+            lambda: store.index.rows_for_codes(field, codes),
+            lambda rows: np.isin(store.codes[field][rows], codes))
+
+
+def _range_filter(store: PatientStore, field: str, low: Optional[float], high: Optional[float]):
+    def mask(rows):
+        values = store.numeric[field][rows]
+        keep = ~np.isnan(values)
+        if low is not None:
+            keep &= values >= low
+        if high is not None:
+            keep &= values <= high
+        return keep
+    return (store.index.count_in_range(field, low, high),
+            lambda: store.index.rows_in_range(field, low, high),
+            mask)
+
+
+def _date_filter(store: PatientStore, field: str, start: Optional[date], end: Optional[date]):
+    index = store.index
+    lo, hi = index._bounds(index.sorted_days[field],
+                           None if start is None else start.toordinal(),
+                           None if end is None else end.toordinal())
+    low = index.sorted_days[field][lo] if hi > lo else np.inf
+    high = index.sorted_days[field][hi - 1] if hi > lo else -np.inf
+
+    def mask(rows):
+        days = index.days[field][rows]
+        return (days >= low) & (days <= high)
+    return hi - lo, lambda: index.day_order[field][lo:hi], mask
+
+
+def select_patients(store: PatientStore, gender: Optional[str] = None,
+                    age_min: Optional[float] = None, age_max: Optional[float] = None,
+                    stone_type: Optional[str] = None,
+                    date_from: Optional[date] = None, date_to: Optional[date] = None,
+                    date_field: str = 'surgery_date',
+                    hu_min: Optional[float] = None, hu_max: Optional[float] = None) -> np.ndarray:
+    """Các dòng thỏa mọi bộ lọc, đánh giá trên index trước khi tổng hợp
+
+    Bộ lọc có ít ứng viên nhất (ước lượng từ index, không cần tạo danh sách)
+    sinh tập ứng viên; các bộ lọc còn lại chỉ kiểm tra trên tập đó.
+    """
+    filters = []
+    if gender:
+        filters.append(_categorical_filter(store, 'gender', _match_codes(store, 'gender', gender)))
+    if stone_type:
+        filters.append(_categorical_filter(store, 'stone_type', _match_codes(store, 'stone_type', stone_type)))
+    if age_min is not None or age_max is not None:
+        filters.append(_range_filter(store, 'age', age_min, age_max))
+    if hu_min is not None or hu_max is not None:
+        filters.append(_range_filter(store, 'hu', hu_min, hu_max))
+    if date_from is not None or date_to is not None:
+        filters.append(_date_filter(store, date_field, date_from, date_to))
+
+    if not filters:
+        return np.arange(len(store))
+    filters.sort(key=lambda f: f[0])
+    rows = filters[0][1]()
+    for _, _, mask in filters[1:]:
+        if not rows.size:
+            break
+        rows = rows[mask(rows)]
+    return np.sort(rows)
+
+
+def _metric_terms(store: PatientStore, metric: str, rows: np.ndarray):
+    """Tử số và mẫu số theo từng dòng cho một chỉ số; giá trị = tổng tử / tổng mẫu"""
+    if metric == 'count':
+        return np.ones(len(rows)), None
+    if metric == 'stone_free_rate':
+        flags = np.array(["Có" in label for label in store.categories['surgery_result']] + [False])
+        codes = store.codes['surgery_result'][rows]
+        return flags[codes] * 100.0, (codes >= 0).astype(np.float64)
+    if metric == 'complication_rate':
+        return (store.codes['complications'][rows] >= 0) * 100.0, np.ones(len(rows))
+    values = store.numeric[metric[len('mean_'):]][rows]
+    known = ~np.isnan(values)
+    return np.where(known, values, 0.0), known.astype(np.float64)
+
+
+def _metric_value(numerator: float, denominator: Optional[float]):
+    if denominator is None:
+        return int(numerator)
+    return round(float(numerator / denominator), 2) if denominator else None
+
+
+def group_fields(group_by) -> List[str]:
+    """Các trường nhóm: chuỗi cách nhau bởi dấu phẩy hoặc danh sách"""
+    if not group_by:
         return []
+    if isinstance(group_by, str):
+        return [field.strip() for field in group_by.split(',') if field.strip()]
+    return list(group_by)
+
+
+def _grouped(keys: np.ndarray, labels: List[List[str]], counts: np.ndarray, numerator: np.ndarray,
+             denominator: Optional[np.ndarray]) -> List[Dict[str, Any]]:
+    """Các nhóm khác rỗng theo thứ tự mã; `keys` là mã nhóm gộp (ravel_multi_index) của từng phần tử"""
+    group_keys, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse, weights=counts)
+    sums = np.bincount(inverse, weights=numerator)
+    dens = None if denominator is None else np.bincount(inverse, weights=denominator)
+    positions = np.unravel_index(group_keys, [len(field_labels) for field_labels in labels])
+    return [
+        {'group': ' / '.join(field_labels[code[i]] for field_labels, code in zip(labels, positions)),
+         'count': int(counts[i]), 'value': _metric_value(sums[i], None if dens is None else dens[i])}
+        for i in range(len(group_keys))
+    ]
+
+
+def aggregate_patients(store: PatientStore, rows: np.ndarray, metric: str = 'count',
+                       group_by=None) -> Dict[str, Any]:
+    """Tính `metric` trên các dòng đã lọc, tùy chọn nhóm theo một hoặc nhiều trường (GROUP_BY_FIELDS)"""
+    numerator, denominator = _metric_terms(store, metric, rows)
+    result = {
+        'metric': metric,
+        'count': int(len(rows)),
+        'value': _metric_value(numerator.sum(), None if denominator is None else denominator.sum()),
+    }
+    fields = group_fields(group_by)
+    if fields:
+        columns = [_partition_codes(store, field, 'surgery_date') for field in fields]
+        keys = np.ravel_multi_index([codes[rows] for codes, _ in columns], [len(labels) for _, labels in columns])
+        result['groups'] = _grouped(keys, [labels for _, labels in columns], np.ones(len(rows)),
+                                    numerator, denominator)
+    return result
+
+
+class CohortCube:
+    """Khối tổng hợp thưa theo CUBE_DIMENSIONS, dựng một lần lúc load/load lại
+
+    Mỗi ô là một tổ hợp mã các chiều (mã hóa từ điển, số nguyên nhỏ) có ít nhất
+    một bệnh nhân; mỗi ô lưu số ca và tử/mẫu của mọi chỉ số trong QUERY_METRICS.
+    Truy vấn chỉ đọc các ô, không quét lại dữ liệu: lần đầu một tổ hợp chiều được
+    hỏi, khối được gộp về đúng các chiều đó (cuboid, O(số ô)) rồi giữ lại, nên các
+    lần roll-up/slice sau trên cùng các chiều chỉ đọc vài chục ô.
+    Khi thêm dòng (extended) chỉ các dòng mới được gộp vào các ô sẵn có.
+    """
+
+    def __init__(self, store: PatientStore, date_field: str = 'surgery_date'):
+        self.date_field = date_field
+        rows = np.arange(len(store))
+        codes, self.labels = self._columns(store, rows)
+        self._set_cells(codes, np.ones(len(rows)), self._row_measures(store, rows))
+
+    def _columns(self, store: PatientStore, rows: np.ndarray):
+        """Mã theo từng chiều của các dòng `rows` và nhãn các chiều (theo toàn bộ từ điển của kho)"""
+        columns = [_partition_codes(store, field, self.date_field, rows) for field in CUBE_DIMENSIONS]
+        return [codes for codes, _ in columns], {field: labels for field, (_, labels) in zip(CUBE_DIMENSIONS, columns)}
+
+    @staticmethod
+    def _row_measures(store: PatientStore, rows: np.ndarray) -> Dict[str, tuple]:
+        return {metric: _metric_terms(store, metric, rows) for metric in QUERY_METRICS if metric != 'count'}
+
+    def _set_cells(self, codes: List[np.ndarray], counts: np.ndarray, measures: Dict[str, tuple]):
+        """Gộp các phần tử (mã theo từng chiều, số ca, tử/mẫu mỗi chỉ số) thành các ô khác rỗng"""
+        shape = [len(self.labels[field]) for field in CUBE_DIMENSIONS]
+        cell_keys, inverse = np.unique(np.ravel_multi_index(codes, shape), return_inverse=True)
+        size = len(cell_keys)
+        dtype = np.int16 if max(shape) < np.iinfo(np.int16).max else np.int32
+        self.cells = np.stack(np.unravel_index(cell_keys, shape), axis=1).astype(dtype)
+        self.counts = np.bincount(inverse, weights=counts, minlength=size)
+        self.measures = {metric: tuple(np.bincount(inverse, weights=values, minlength=size) for values in terms)
+                         for metric, terms in measures.items()}
+        self._codes = {field: {label: code for code, label in enumerate(labels)}
+                       for field, labels in self.labels.items()}
+        self._cuboids: Dict[tuple, Dict[str, Any]] = {}
+
+    def extended(self, store: PatientStore, start: int) -> "CohortCube":
+        """Khối cho `store` (kho hiện tại + các dòng từ `start`), gộp ô của các dòng mới vào bản sao các ô cũ
+
+        Chỉ đọc các dòng mới và các ô sẵn có, không quét lại toàn bộ dữ liệu; cần store.index đã cập nhật.
+        """
+        rows = np.arange(start, len(store))
+        cube = CohortCube.__new__(CohortCube)
+        cube.date_field = self.date_field
+        codes, cube.labels = cube._columns(store, rows)
+        # Nhãn có thể tăng (vd. loại sỏi mới) và nhóm 'Không xác định' luôn cuối: đổi mã các ô cũ
+        for i, field in enumerate(CUBE_DIMENSIONS):
+            position = {label: code for code, label in enumerate(cube.labels[field])}
+            remap = np.array([position[label] for label in self.labels[field]], dtype=np.int64)
+            codes[i] = np.concatenate([remap[self.cells[:, i]], codes[i]])
+        added = self._row_measures(store, rows)
+        measures = {metric: tuple(np.concatenate(pair) for pair in zip(self.measures[metric], added[metric]))
+                    for metric in added}
+        cube._set_cells(codes, np.concatenate([self.counts, np.ones(len(rows))]), measures)
+        return cube
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def _cuboid(self, fields: tuple) -> Dict[str, Any]:
+        """Khối gộp về các chiều `fields` (theo thứ tự CUBE_DIMENSIONS), dựng ở lần dùng đầu"""
+        cuboid = self._cuboids.get(fields)
+        if cuboid is None:
+            if fields:
+                shape = [len(self.labels[field]) for field in fields]
+                columns = [self.cells[:, CUBE_DIMENSIONS.index(field)] for field in fields]
+                keys, inverse = np.unique(np.ravel_multi_index(columns, shape), return_inverse=True)
+                cells = np.stack(np.unravel_index(keys, shape), axis=1)
+            else:
+                inverse = np.zeros(len(self.cells), dtype=np.int64)
+                cells = np.zeros((1, 0), dtype=np.int64)
+            cuboid = {'cells': cells, 'inverse': inverse, 'measures': {
+                'count': (np.bincount(inverse, weights=self.counts, minlength=len(cells)), None)}}
+            # Ghi đè khi hai luồng cùng dựng cũng vô hại: kết quả như nhau
+            self._cuboids[fields] = cuboid
+        return cuboid
+
+    def _measure(self, cuboid: Dict[str, Any], metric: str):
+        measure = cuboid['measures'].get(metric)
+        if measure is None:
+            size = len(cuboid['cells'])
+            measure = cuboid['measures'][metric] = tuple(
+                np.bincount(cuboid['inverse'], weights=values, minlength=size) for values in self.measures[metric])
+        return measure
+
+    def rollup(self, metric: str = 'count', by=None, where: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+        """`metric` trên các ô thỏa `where` ({chiều: [nhãn]}), tùy chọn nhóm theo các chiều `by`
+
+        Kết quả cùng dạng với aggregate_patients().
+        """
+        by = group_fields(by)
+        where = where or {}
+        fields = tuple(field for field in CUBE_DIMENSIONS if field in where or field in by)
+        cuboid = self._cuboid(fields)
+        cells = cuboid['cells']
+        mask = np.ones(len(cells), dtype=bool)
+        for field, labels in where.items():
+            codes = [self._codes[field][label] for label in labels if label in self._codes[field]]
+            mask &= np.isin(cells[:, fields.index(field)], codes)
+        counts = cuboid['measures']['count'][0][mask]
+        if metric == 'count':
+            numerator, denominator = counts, None
+        else:
+            numerator, denominator = (values[mask] for values in self._measure(cuboid, metric))
+        result = {
+            'metric': metric,
+            'count': int(counts.sum()),
+            'value': _metric_value(numerator.sum(), None if denominator is None else denominator.sum()),
+        }
+        if by:
+            labels = [self.labels[field] for field in by]
+            keys = np.ravel_multi_index([cells[mask, fields.index(field)] for field in by],
+                                        [len(field_labels) for field_labels in labels])
+            result['groups'] = _grouped(keys, labels, counts, numerator, denominator)
+        return result
+
+
+def _parse_query_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f"Ngày không hợp lệ: '{value}' (dùng YYYY-MM-DD hoặc d/m/yy)")
+    return parsed
+
+
+@traced()
+def yte_query(gender: Optional[str] = None, age_min: Optional[float] = None, age_max: Optional[float] = None,
+              stone_type: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None,
+              hu_min: Optional[float] = None, hu_max: Optional[float] = None,
+              group_by: Optional[str] = None, metric: str = 'count') -> dict:
+    """Truy vấn có cấu trúc trên dữ liệu bệnh nhân sỏi thận: lọc, nhóm và tính một chỉ số.
+
+    Args:
+        gender (str): Giới tính cần lọc ("Nam" hoặc "Nữ").
+        age_min (float): Tuổi tối thiểu (tính cả).
+        age_max (float): Tuổi tối đa (tính cả).
+        stone_type (str): Loại sỏi (khớp đúng hoặc một phần tên, không phân biệt dấu).
+        date_from (str): Từ ngày phẫu thuật, dạng YYYY-MM-DD hoặc d/m/yy.
+        date_to (str): Đến ngày phẫu thuật, dạng YYYY-MM-DD hoặc d/m/yy.
+        hu_min (float): Mật độ HU tối thiểu.
+        hu_max (float): Mật độ HU tối đa.
+        group_by (str): Nhóm theo một hoặc nhiều trường, cách nhau bởi dấu phẩy: gender, stone_type,
+            surgery_position, surgery_result, source, age_band, bmi_class, complications, hu_band, month.
+        metric (str): count, stone_free_rate, complication_rate hoặc mean_<cột số> (vd. mean_age, mean_bmi).
+
+    Returns:
+        dict: status và report/result hoặc error_message.
+    """
+    store = get_store()
+    if not store:
+        return {"status": "error", "error_message": "Không có dữ liệu y tế để phân tích"}
+    if metric not in QUERY_METRICS:
+        return {"status": "error",
+                "error_message": f"Chỉ số '{metric}' không hỗ trợ. Chọn một trong: {', '.join(QUERY_METRICS)}"}
+    fields = group_fields(group_by)
+    unknown = [field for field in fields if field not in GROUP_BY_FIELDS]
+    if unknown:
+        return {"status": "error",
+                "error_message": f"Không thể nhóm theo '{', '.join(unknown)}'. Chọn trong: {', '.join(GROUP_BY_FIELDS)}"}
+    try:
+        start, end = _parse_query_date(date_from), _parse_query_date(date_to)
+    except ValueError as e:
+        return {"status": "error", "error_message": str(e)}
+
+    telemetry.current_span().set_attribute('intent', f"query:{metric}")
+    # Lọc theo giới tính/loại sỏi và nhóm theo các chiều của cube: đọc cube thay vì quét dữ liệu
+    cube_ready = (store.cube is not None and all(field in CUBE_DIMENSIONS for field in fields)
+                  and all(value is None for value in (age_min, age_max, start, end, hu_min, hu_max)))
+    with telemetry.span('aggregate', metric=metric, group_by=','.join(fields), cube=cube_ready):
+        if cube_ready:
+            where = {field: [store.categories[field][code] for code in _match_codes(store, field, value)]
+                     for field, value in (('gender', gender), ('stone_type', stone_type)) if value}
+            result = store.cube.rollup(metric, fields, where)
+        else:
+            rows = select_patients(store, gender=gender, age_min=age_min, age_max=age_max, stone_type=stone_type,
+                                   date_from=start, date_to=end, hu_min=hu_min, hu_max=hu_max)
+            result = aggregate_patients(store, rows, metric, fields)
+    filters = {name: value for name, value in [
+        ('gender', gender), ('age_min', age_min), ('age_max', age_max), ('stone_type', stone_type),
+        ('date_from', date_from), ('date_to', date_to), ('hu_min', hu_min), ('hu_max', hu_max),
+    ] if value not in (None, '')}
+    result['filters'] = filters
+    return {"status": "success", "report": _format_query_result(result, ', '.join(fields)), "result": result}
+
+
+def _format_query_result(result: Dict[str, Any], group_by: Optional[str]) -> str:
+    label = METRIC_LABELS.get(result['metric'], f"Trung bình {result['metric'][len('mean_'):]}")
+    filters = ', '.join(f"{name}={value}" for name, value in result['filters'].items()) or 'toàn bộ'
+    lines = [f"🔎 TRUY VẤN ({filters})", f"▪️ Số bệnh nhân: {result['count']}"]
+    if result['metric'] != 'count':
+        lines.append(f"▪️ {label}: {result['value'] if result['value'] is not None else 'N/A'}")
+    if group_by:
+        lines.append(f"📊 Theo {group_by}:")
+        for group in result['groups']:
+            value = '' if result['metric'] == 'count' else f" - {label}: {group['value'] if group['value'] is not None else 'N/A'}"
+            lines.append(f"▪️ {group['group']}: {group['count']} ca{value}")
+    return "\n".join(lines)
+
+
+# Phân loại intent của câu hỏi: bảng tra theo từ đầu tiên, dựng một lần lúc import
+# (tên intent, các từ khóa) theo thứ tự ưu tiên khi hòa điểm. Khác router cũ, 'patient'
+# đứng cuối: "bệnh nhân" xuất hiện trong hầu hết câu hỏi nên chỉ thắng khi có điểm cao hơn
+INTENT_KEYWORDS = [
+    ('overview', ["tổng quan", "overview", "thống kê"]),
+    ('gender', ["giới tính", "gender", "nam nữ"]),
+    ('stone', ["loại sỏi", "sỏi", "stone"]),
+    ('surgery', ["phẫu thuật", "pt", "surgery"]),
+    ('bmi', ["bmi", "cân nặng", "béo phì"]),
+    ('patient', ["bệnh nhân", "patient", "id"]),
+]
+INTENT_ORDER = [intent for intent, _ in INTENT_KEYWORDS]
+# Số câu hỏi đã phân loại giữ trong cache định tuyến
+INTENT_CACHE_SIZE = int(os.environ.get('YTE_INTENT_CACHE_SIZE', '4096'))
+# Điểm cộng thêm cho intent 'patient' khi câu hỏi có ID: tra cứu ID luôn được ưu tiên
+PATIENT_ID_BONUS = 10
+# Intent của chủ ngữ chung ("bệnh nhân", "patient", "id"): chỉ thắng khi câu hỏi có ID
+# hoặc không có từ khóa báo cáo nào ("bmi của bệnh nhân" là báo cáo BMI)
+SUBJECT_INTENT = 'patient'
+GENDER_WORDS = {'nam': 'Nam', 'male': 'Nam', 'nữ': 'Nữ', 'nu': 'Nữ', 'female': 'Nữ'}
+# Từ khóa của intent 'patient' mà số đứng ngay sau được hiểu là ID bệnh nhân
+PATIENT_ID_WORDS = ["id", "bệnh nhân", "patient"]
+# Số ngay sau "bệnh nhân"/"patient" trong khoảng này có thể là năm ("tổng quan bệnh nhân 2025"):
+# chỉ coi là ID khi câu hỏi không có từ khóa của báo cáo nào khác (hoặc viết rõ "ID 2025")
+YEAR_RANGE = (1900, 2100)
+
+
+class IntentResult(NamedTuple):
+    """Kết quả phân loại: intent thắng (None nếu không khớp), điểm từng intent và tham số trích ra"""
+    intent: Optional[str]
+    scores: Dict[str, int]
+    ids: List[int]
+    filters: Dict[str, Any]
+
+
+# Loại mục trong bảng tra theo từ đầu tiên
+_ID_WORD, _KEYWORD, _AGE_BOUND, _GENDER = range(4)
+_TOKEN_PATTERN = re.compile(r'\w+|>=|<=|[<>-]')
+
+
+@functools.lru_cache(maxsize=8192)
+def _word_tokens(word: str) -> tuple:
+    """Các từ (đã bỏ dấu) của một từ trong câu hỏi, cache vì vốn từ của các câu hỏi nhỏ
+
+    Dấu câu được tách ra ("id:5" -> "id", "5"). Từ chỉ giới tính được thay bằng
+    giới tính ("nữ" -> "Nữ") vì sau khi bỏ dấu "năm" cũng thành "nam".
+    """
+    word = unicodedata.normalize('NFC', word)
+    return tuple(GENDER_WORDS.get(part) or part.translate(FOLD_TABLE) for part in _TOKEN_PATTERN.findall(word))
+
+
+def _tokenize(text: str) -> List[str]:
+    return [token for word in text.lower().split() for token in _word_tokens(word)]
 
-def safe_convert(value):
-    """Chuyển đổi an toàn giá trị sang số"""
-    if pd.isna(value) or value == '' or value is None:
-        return None
-    try:
-        # Xử lý decimal comma
-        if isinstance(value, str):
-            value = value.replace(',', '.')
-        return float(value)
-    except:
-        return None
 
-# Dữ liệu y tế load trực tiếp từ CSV
-YTE_DATA = load_yte_data()
+def _build_first_token_table() -> Dict[str, List[tuple]]:
+    """Bảng tra từ đầu tiên -> các mục (loại, các từ tiếp theo, số từ, tham số)
 
-def yte(query: str) -> str:
+    Mục của cùng một từ được xếp theo cụm dài nhất trước; từ khóa ID đứng trước
+    từ khóa thường nên "bệnh nhân 5" được nhận là tra cứu ID.
     """
-    Tool Y Tế - Phân tích dữ liệu bệnh nhân sỏi thận từ OK-2.csv
-    
-    Args:
-        query (str): Câu hỏi phân tích y tế
-        
-    Returns:
-        str: Kết quả phân tích dữ liệu y tế
+    table: Dict[str, List[tuple]] = {}
+
+    def add(phrase: str, kind: int, value):
+        words = _tokenize(phrase)
+        table.setdefault(words[0], []).append((kind, words[1:], len(words), value))
+
+    for phrase in PATIENT_ID_WORDS:
+        add(phrase, _ID_WORD, fold_text(phrase) != 'id')
+    for intent, keywords in INTENT_KEYWORDS:
+        for keyword in keywords:
+            add(keyword, _KEYWORD, intent)
+    for operator in _AGE_BOUNDS:
+        add(operator, _AGE_BOUND, operator)
+    for gender in set(GENDER_WORDS.values()):
+        add(gender, _GENDER, gender)
+    for entries in table.values():
+        entries.sort(key=lambda entry: (-entry[2], entry[0]))
+    return table
+
+
+# Tuổi theo năm nên là số nguyên: "trên 60" nghĩa là từ 61 tuổi
+_AGE_BOUNDS = {
+    'tren': lambda n: {'age_min': n + 1}, '>': lambda n: {'age_min': n + 1},
+    '>=': lambda n: {'age_min': n}, 'tu': lambda n: {'age_min': n},
+    'duoi': lambda n: {'age_max': n - 1}, '<': lambda n: {'age_max': n - 1},
+    '<=': lambda n: {'age_max': n},
+}
+AGE_RANGE_WORDS = {'den', 'toi', '-'}
+# Từ đứng sau một số cho biết số đó không phải ID (tuổi, tháng, năm, đầu một khoảng)
+NOT_ID_WORDS = {'tuoi', 'thang', 'nam'} | AGE_RANGE_WORDS
+# Đơn vị đứng sau "trên/dưới N" cho biết N không phải tuổi ("trên 100 kg")
+NOT_AGE_WORDS = {'kg', 'cm', 'mm', 'hu', 'phut'}
+ID_LIST_WORDS = {'va', 'and'}
+_FIRST_TOKEN = _build_first_token_table()
+_NO_SCORES = dict.fromkeys(INTENT_ORDER, 0)
+
+
+@functools.lru_cache(maxsize=INTENT_CACHE_SIZE)
+def classify_intent(query: str) -> IntentResult:
+    """Phân loại câu hỏi (cache theo câu hỏi, xem _classify_intent)
+
+    Agent thường hỏi lại cùng một câu, nên định tuyến lần sau chỉ là một lần tra
+    cache. Kết quả dùng chung giữa các lời gọi: không sửa dict/list trong kết quả.
+    """
+    return _classify_intent(query)
+
+
+def _classify_intent(query: str) -> IntentResult:
+    """Phân loại câu hỏi trong một lượt quét: điểm các intent, ID bệnh nhân và bộ lọc tuổi/giới tính
+
+    Câu hỏi được tách từ một lần (mỗi từ bỏ dấu một lần rồi cache); chỉ các từ có
+    trong bảng tra theo từ đầu tiên (hoặc là số) mới được xét tiếp, nên so khớp
+    theo nguyên từ và không phân biệt dấu: "pt" không khớp bên trong từ khác và
+    "tong quan" tương đương "tổng quan". Số chỉ là ID khi đứng ngay sau "id",
+    "bệnh nhân" hoặc "patient". Mỗi từ khóa báo cáo được một điểm; "bệnh nhân"
+    (SUBJECT_INTENT) chỉ thắng khi có ID hoặc không có từ khóa báo cáo nào.
+    """
+    tokens = _tokenize(query)
+    scores = _NO_SCORES.copy()
+    # Phần tử canh cuối: các bước nhìn tiếp từ sau không cần kiểm tra độ dài
+    tokens.append('')
+    ids: List[int] = []
+    years: List[int] = []
+    filters: Dict[str, Any] = {}
+    genders = []
+
+    end = 0
+    for i, token in enumerate(tokens):
+        if i < end:
+            continue
+        entries = _FIRST_TOKEN.get(token)
+        if entries is None:
+            if token.isdigit():
+                end = _match_age_at(tokens, i, filters)
+            continue
+
+        for kind, rest, size, value in entries:
+            end = i + size
+            if rest and tokens[i + 1:end] != rest:
+                continue
+            if kind == _KEYWORD:
+                # Mỗi từ khóa một điểm, dù từ khóa dài bao nhiêu từ ("phẫu thuật" = "pt")
+                scores[value] += 1
+            elif kind == _ID_WORD:
+                # Không có ID: xét tiếp như từ khóa thường ("bệnh nhân trên 60")
+                if not tokens[end].isdigit() and tokens[end] != 'so':
+                    continue
+                after, numbers = _match_ids(tokens, end)
+                if not numbers:
+                    continue
+                scores[SUBJECT_INTENT] += 1
+                for number in numbers:
+                    is_year = value and YEAR_RANGE[0] <= number <= YEAR_RANGE[1]
+                    (years if is_year else ids).append(number)
+                end = after
+            elif kind == _AGE_BOUND:
+                bound = tokens[end]
+                if not bound.isdigit() or tokens[end + 1] in NOT_AGE_WORDS:
+                    continue
+                if token == 'tu':
+                    # "từ 40 đến 60 tuổi" là khoảng; "từ" đứng một mình cần "tuổi" ("tư thế" cũng thành "tu")
+                    if tokens[end + 1] in AGE_RANGE_WORDS:
+                        end = _match_age_at(tokens, end, filters)
+                        break
+                    if tokens[end + 1] != 'tuoi':
+                        continue
+                filters.update(_AGE_BOUNDS[token](int(bound)))
+                end += 2 if tokens[end + 1] == 'tuoi' else 1
+            else:
+                genders.append(value)
+            break
+        else:
+            end = i + 1
+
+    reports = any(score for intent, score in scores.items() if intent != SUBJECT_INTENT)
+    if years and not reports:
+        ids.extend(years)
+    if ids:
+        scores[SUBJECT_INTENT] += PATIENT_ID_BONUS
+    elif reports:
+        scores[SUBJECT_INTENT] = 0
+    if genders and genders.count(genders[0]) == len(genders):
+        filters['gender'] = genders[0]
+
+    # Điểm cao nhất thắng; hòa điểm thì intent đứng trước trong INTENT_ORDER thắng
+    values = list(scores.values())
+    best = max(values)
+    intent = INTENT_ORDER[values.index(best)] if best else None
+    return IntentResult(intent, scores, list(dict.fromkeys(ids)) if len(ids) > 1 else ids, filters)
+
+
+def _match_ids(tokens: List[str], i: int):
+    """Danh sách ID bắt đầu tại `tokens[i]` ("5", "số 5", "2 và 4"): (vị trí sau danh sách, các ID)"""
+    numbers = []
+    if tokens[i] == 'so' and tokens[i + 1].isdigit():
+        i += 1
+    while tokens[i].isdigit() and tokens[i + 1] not in NOT_ID_WORDS:
+        numbers.append(int(tokens[i]))
+        i += 1
+        if tokens[i] in ID_LIST_WORDS and tokens[i + 1].isdigit():
+            i += 1
+    return i, numbers
+
+
+def _match_age_at(tokens: List[str], i: int, filters: Dict[str, Any]) -> int:
+    """Tuổi bắt đầu bằng số tại `tokens[i]`: "60 tuổi", "40-60 tuổi", "40 đến 60 tuổi"
+
+    Ghi vào `filters` và trả về vị trí sau cụm; không khớp thì bỏ qua số đó.
     """
-    print(f"\n🏥 YTE Tool Call: yte(query='{query}')")
-    
-    if not YTE_DATA:
+    low = int(tokens[i])
+    if tokens[i + 1] == 'tuoi':
+        filters['age_min'] = filters['age_max'] = low
+        return i + 2
+    if tokens[i + 1] in AGE_RANGE_WORDS and tokens[i + 2].isdigit() and tokens[i + 3] == 'tuoi':
+        filters.update(zip(('age_min', 'age_max'), sorted((low, int(tokens[i + 2])))))
+        return i + 4
+    return i + 1
+
+
+# Các báo cáo tổng hợp theo intent: bước tính (dict số liệu) và bước trình bày (văn bản)
+# được cache riêng, nên cùng một kết quả dùng được cho cả agent lẫn báo cáo hàng loạt
+def _cached_summary(intent: str, store: PatientStore, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Số liệu tổng hợp cho `intent`, cache theo (intent, bộ lọc, phiên bản dữ liệu)"""
+    filters = filters or {}
+    key = ('summary', intent, tuple(sorted(filters.items())), store.version)
+    return _report_cache.get_or_compute(key, lambda: compute_summary(intent, store, filters))
+
+
+def _cached_report(intent: str, store: PatientStore, filters: Optional[Dict[str, Any]] = None) -> str:
+    """Báo cáo văn bản cho `intent`, dựng từ số liệu đã cache và cũng được cache"""
+    filters = filters or {}
+    key = ('text', intent, tuple(sorted(filters.items())), store.version)
+    return _report_cache.get_or_compute(key, lambda: render_summary(_cached_summary(intent, store, filters)))
+
+
+def compute_summary(intent: str, store: PatientStore, filters: Optional[Dict[str, Any]] = None,
+                    rows: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Số liệu của một báo cáo tổng hợp trên toàn bộ dữ liệu, hoặc trên các dòng thỏa `filters`/`rows`"""
+    filters = filters or {}
+    with telemetry.span('aggregate', intent=intent):
+        if rows is None and filters:
+            rows = select_patients(store, **filters)
+        return _summaries_for(store, [intent], rows, filters)[intent]
+
+
+def _summaries_for(store: PatientStore, intents: List[str], rows: Optional[np.ndarray] = None,
+                   filters: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """Số liệu của nhiều báo cáo trên cùng một tập dòng: thống kê chỉ quét dữ liệu một lần"""
+    if rows is None:
+        stats = store.stats
+    else:
+        stats = CohortStats()
+        stats.update(store, rows)
+    summaries = {}
+    for intent in intents:
+        summary = {'intent': intent, 'filters': dict(filters or {}), 'total': stats.total}
+        if stats.total:
+            summary.update(_SUMMARIES[intent](store, stats, rows))
+        summaries[intent] = summary
+    return summaries
+
+
+def render_summary(summary: Dict[str, Any]) -> str:
+    """Trình bày số liệu của compute_summary() thành báo cáo tiếng Việt"""
+    with telemetry.span('render', intent=summary['intent']):
+        return _render_summary(summary)
+
+
+def _render_summary(summary: Dict[str, Any]) -> str:
+    filters = summary['filters']
+    if not summary['total']:
+        if filters:
+            return f"❌ Không có bệnh nhân nào thỏa điều kiện lọc: {_describe_filters(filters)}"
         return "❌ Không có dữ liệu y tế để phân tích"
-    
-    query_lower = query.lower()
-    total_patients = len(YTE_DATA)
-    
-    # Phân tích tổng quan
-    if any(keyword in query_lower for keyword in ["tổng quan", "overview", "thống kê", "tong quan"]):
-        male_count = sum(1 for p in YTE_DATA if p.get("gender") == "Nam")
-        female_count = sum(1 for p in YTE_DATA if p.get("gender") == "Nữ")
-        
-        ages = [p.get("age") for p in YTE_DATA if p.get("age") is not None]
-        avg_age = sum(ages) / len(ages) if ages else 0
-        
-        # Phân tích kết quả phẫu thuật
-        sach_soi = sum(1 for p in YTE_DATA if "Có" in str(p.get("surgery_result", "")))
-        sot_soi = sum(1 for p in YTE_DATA if "Sót" in str(p.get("surgery_result", "")))
-        
-        # Tính tỷ lệ Nam/Nữ an toàn
-        ratio_text = f"{male_count/female_count:.1f}:1" if female_count > 0 else f"{male_count}:0"
-        
-        result = f"""🏥 THỐNG KÊ TỔNG QUAN Y TẾ (Dữ liệu OK-2.csv)
+    report = _RENDERERS[summary['intent']](summary)
+    return f"🔎 Lọc: {_describe_filters(filters)}\n\n{report}" if filters else report
 
-📊 TỔNG SỐ BỆNH NHÂN: {total_patients}
 
-👫 PHÂN BỐ GIỚI TÍNH:
-▪️ Nam: {male_count} bệnh nhân ({male_count/total_patients*100:.1f}%)
-▪️ Nữ: {female_count} bệnh nhân ({female_count/total_patients*100:.1f}%)
-▪️ Tỷ lệ Nam/Nữ: {ratio_text}
+def _describe_filters(filters: Dict[str, Any]) -> str:
+    parts = []
+    if 'gender' in filters:
+        parts.append(f"giới tính {filters['gender']}")
+    if 'age_min' in filters or 'age_max' in filters:
+        parts.append(f"tuổi {filters.get('age_min', '')}-{filters.get('age_max', '')}")
+    return ', '.join(parts)
 
-📈 THÔNG TIN TUỔI:
-▪️ Tuổi trung bình: {avg_age:.1f} tuổi"""
-        
-        if ages:
-            result += f"""
-▪️ Tuổi thấp nhất: {min(ages)} tuổi
-▪️ Tuổi cao nhất: {max(ages)} tuổi"""
-        
-        result += f"""
 
-🎯 KẾT QUẢ PHẪU THUẬT PCNL:
-▪️ Sạch sỏi: {sach_soi} ca ({sach_soi/total_patients*100:.1f}%)
-▪️ Sót sỏi: {sot_soi} ca ({sot_soi/total_patients*100:.1f}%)
+def _list_hint(count: int, list_query: str) -> str:
+    """Câu hỏi để xem danh sách ID theo trang, thay vì liệt kê toàn bộ trong báo cáo
 
-📅 Dữ liệu: Train từ OK-2.csv - {total_patients} bệnh nhân sỏi thận PCNL"""
-        
-        return result
-    
-    # Phân tích giới tính
-    elif any(keyword in query_lower for keyword in ["giới tính", "gender", "nam nữ", "gioi tinh"]):
-        male_patients = [p for p in YTE_DATA if p.get("gender") == "Nam"]
-        female_patients = [p for p in YTE_DATA if p.get("gender") == "Nữ"]
-        
-        male_ages = [p.get("age") for p in male_patients if p.get("age") is not None]
-        female_ages = [p.get("age") for p in female_patients if p.get("age") is not None]
-        
-        male_avg = sum(male_ages) / len(male_ages) if male_ages else 0
-        female_avg = sum(female_ages) / len(female_ages) if female_ages else 0
-        
-        # Tính tỷ lệ Nam/Nữ an toàn
-        gender_ratio = f"{len(male_patients)/len(female_patients):.1f}:1" if len(female_patients) > 0 else f"{len(male_patients)}:0"
-        
-        result = f"""👫 PHÂN TÍCH GIỚI TÍNH (Dữ liệu OK-2.csv)
-
-👨 NAM GIỚI: {len(male_patients)} bệnh nhân
-▪️ Tuổi trung bình: {male_avg:.1f} tuổi
-▪️ ID bệnh nhân: {[p.get("id") for p in male_patients]}
-▪️ Chiếm tỷ lệ: {len(male_patients)/total_patients*100:.1f}%
+    Không in khoảng min-max: ID của một nhóm thường xen kẽ với nhóm khác nên khoảng
+    đó dễ bị đọc nhầm thành một dải ID liên tục.
+    """
+    if not count:
+        return "không có"
+    return f"yte(\"{list_query}\")"
 
-👩 NỮ GIỚI: {len(female_patients)} bệnh nhân
-▪️ Tuổi trung bình: {female_avg:.1f} tuổi  
-▪️ ID bệnh nhân: {[p.get("id") for p in female_patients]}
-▪️ Chiếm tỷ lệ: {len(female_patients)/total_patients*100:.1f}%
 
-📊 SO SÁNH:
-▪️ Tỷ lệ Nam/Nữ: {gender_ratio}
-▪️ Chênh lệch tuổi TB: {abs(male_avg - female_avg):.1f} tuổi"""
-        
-        return result
-    
-    # Phân tích sỏi
-    elif any(keyword in query_lower for keyword in ["sỏi", "stone", "loại sỏi", "soi"]):
-        stone_types = {}
-        for patient in YTE_DATA:
-            stone_type = patient.get('stone_type', 'Không xác định')
-            if stone_type and stone_type != 'Không xác định':
-                stone_types[stone_type] = stone_types.get(stone_type, 0) + 1
-        
-        result = f"""🪨 PHÂN TÍCH LOẠI SỎI (Dữ liệu OK-2.csv)
-
-📊 PHÂN LOẠI SỎI THẬN:"""
-        
-        for stone_type, count in sorted(stone_types.items(), key=lambda x: x[1], reverse=True):
-            percentage = (count / total_patients) * 100
-            result += f"\n▪️ {stone_type}: {count} ca ({percentage:.1f}%)"
-        
-        most_common = max(stone_types.items(), key=lambda x: x[1]) if stone_types else ("N/A", 0)
-        
-        result += f"""\n\n📈 THỐNG KÊ SỎI:
-▪️ Tổng số loại: {len(stone_types)} loại khác nhau
-▪️ Phổ biến nhất: {most_common[0]} ({most_common[1]} ca)
-▪️ Đa dạng: {len(stone_types)/total_patients*100:.1f}% tỷ lệ đa dạng loại sỏi"""
-        
-        return result
-    
-    # Chi tiết bệnh nhân theo ID
-    elif any(keyword in query_lower for keyword in ["bệnh nhân", "patient", "id", "benh nhan"]):
-        # Tìm ID trong query
-        import re
-        id_match = re.search(r'\b(\d+)\b', query)
-        
-        if id_match:
-            patient_id = int(id_match.group(1))
-            patient = next((p for p in YTE_DATA if p.get("id") == patient_id), None)
-            
-            if patient:
-                result = f"""👤 CHI TIẾT BỆNH NHÂN ID {patient_id} (OK-2.csv)
+def _stat_summary(stat: RunningStat) -> Dict[str, Any]:
+    return {'count': stat.count, 'mean': stat.mean, 'min': stat.min, 'max': stat.max}
+
+
+def encode_cursor(version: int, offset: int) -> str:
+    """Cursor trang tiếp theo: gắn với phiên bản dữ liệu để không lật trang trên dữ liệu đã đổi"""
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """(phiên bản dữ liệu, vị trí bắt đầu) từ cursor, ValueError nếu cursor không hợp lệ"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        version, offset = (int(part) for part in raw.split(':'))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Cursor không hợp lệ: '{cursor}'")
+    if offset < 0:
+        raise ValueError(f"Cursor không hợp lệ: '{cursor}'")
+    return version, offset
+
+
+def _take_within_budget(parts, budget: int, limit: Optional[int] = None) -> List[str]:
+    """Lấy các phần liên tiếp cho tới khi vượt `budget` ký tự hoặc đủ `limit` phần (luôn lấy ít nhất một)"""
+    taken = []
+    size = 0
+    for part in parts:
+        if taken and (size + len(part) + 1 > budget or (limit is not None and len(taken) >= limit)):
+            break
+        taken.append(part)
+        size += len(part) + 1
+    return taken
+
+
+def _patient_list_page(store: PatientStore, filters: Dict[str, Any], cursor: str) -> Dict[str, Any]:
+    """Một trang (tối đa LIST_PAGE_SIZE) danh sách bệnh nhân theo bộ lọc, bắt đầu từ `cursor`"""
+    offset = 0
+    if cursor:
+        version, offset = decode_cursor(cursor)
+        if version != store.version:
+            raise ValueError("Cursor đã hết hạn vì dữ liệu vừa được cập nhật, hãy hỏi lại từ trang đầu")
+
+    rows = select_patients(store, **filters) if filters else np.arange(len(store))
+    page = rows[offset:offset + LIST_PAGE_SIZE]
+    genders = store.categories['gender'] + ['']
+    stone_types = store.categories['stone_type'] + ['']
+    ages = store.numeric['age'][page]
+    patients = [
+        {'id': int(patient_id), 'gender': genders[gender], 'age': None if np.isnan(age) else float(age),
+         'stone_type': stone_types[stone]}
+        for patient_id, gender, age, stone in zip(store.ids[page], store.codes['gender'][page], ages,
+                                                   store.codes['stone_type'][page])
+    ]
+    end = offset + len(patients)
+    return {
+        'total': len(rows),
+        'offset': offset,
+        'version': store.version,
+        'patients': patients,
+        'next_cursor': encode_cursor(store.version, end) if end < len(rows) else None,
+    }
+
+
+def _render_patient_list(query: str, filters: Dict[str, Any], page: Dict[str, Any]) -> str:
+    """Trình bày một trang danh sách, cắt thêm theo RESPONSE_CHAR_BUDGET (văn bản dựng tuyến tính)"""
+    total, offset = page['total'], page['offset']
+    header = ["👥 DANH SÁCH BỆNH NHÂN (OK-2.csv)\n"]
+    if filters:
+        header.insert(0, f"🔎 Lọc: {_describe_filters(filters)}\n")
+    header.append(f"📋 {total} BỆNH NHÂN SỎI THẬN PCNL:")
+    if not page['patients']:
+        return "\n".join(header + ["▪️ Không còn bệnh nhân nào" if total else "▪️ Không có bệnh nhân nào"])
+
+    budget = RESPONSE_CHAR_BUDGET - sum(len(line) + 1 for line in header)
+    lines = _take_within_budget((f"▪️ ID {p['id']}: {p['gender']} {p['age']} tuổi - {p['stone_type']}"
+                                 for p in page['patients']), budget)
+    end = offset + len(lines)
+    if end < total:
+        lines.append(f"\n➡️ Đang hiển thị {offset + 1}-{end}/{total}. "
+                     f"Trang tiếp: yte(\"{query}\", cursor=\"{encode_cursor(page['version'], end)}\")")
+    return "\n".join(header + lines)
+
+
+def _patient_details(store: PatientStore, patient_ids: List[int]) -> Dict[str, Any]:
+    """Bản ghi các ID được hỏi (tra cứu một lần qua index khóa chính), kèm gợi ý cho ID không có"""
+    patients = []
+    id_range = [int(store.index.sorted_ids[0]), int(store.index.sorted_ids[-1])] if len(store) else None
+    for patient_id, row in zip(patient_ids, store.index.rows_of(patient_ids)):
+        if row is not None:
+            patients.append({'id': patient_id, 'found': True, 'record': store.record(row)})
+        else:
+            patients.append({'id': patient_id, 'found': False, 'nearest': store.index.nearest_ids(patient_id),
+                             'total': len(store), 'id_range': id_range})
+    return {'patients': patients}
+
+
+def _render_patient_details(result: Dict[str, Any]) -> str:
+    parts = (_format_patient_detail(p['id'], p['record']) if p['found'] else _format_patient_miss(p)
+             for p in result['patients'])
+    shown = _take_within_budget(parts, RESPONSE_CHAR_BUDGET)
+    if len(shown) < len(result['patients']):
+        rest = [p['id'] for p in result['patients'][len(shown):]]
+        shown.append(f"➡️ Còn {len(rest)} ID chưa hiển thị do giới hạn độ dài: "
+                     f"{rest[:NEAREST_ID_HINTS]}{' ...' if len(rest) > NEAREST_ID_HINTS else ''}")
+    return "\n\n".join(shown)
+
+
+def _format_patient_detail(patient_id: int, patient: Dict[str, Any]) -> str:
+    """Định dạng chi tiết một bệnh nhân"""
+    return f"""👤 CHI TIẾT BỆNH NHÂN ID {patient_id} (OK-2.csv)
 
 🏷️ THÔNG TIN CÁ NHÂN:
 ▪️ Tuổi: {patient.get('age', 'N/A')} tuổi ({patient.get('birth_year', 'N/A')})
@@ -221,7 +2250,7 @@ def yte(query: str) -> str:
 ▪️ BMI: {patient.get('bmi', 'N/A')}
 
 🏥 TIỀN CĂN BỆNH LÝ:
-▪️ Bệnh lý nội khoa: {patient.get('medical_history', 'Không có')}
+▪️ Bệnh lý nội khoa: {patient.get('medical_history') or 'Không có'}
 ▪️ Tiền sử PT sỏi: {patient.get('previous_surgery', 'Chưa mổ') if patient.get('previous_surgery') else 'Chưa mổ'}
 
 🪨 THÔNG TIN SỎI:
@@ -240,116 +2269,279 @@ def yte(query: str) -> str:
 
 🔬 XÉT NGHIỆM:
 ▪️ Hb: {patient.get('hb', 'N/A')} g/dL
-▪️ PLT: {patient.get('plt', 'N/A')} K/uL  
+▪️ PLT: {patient.get('plt', 'N/A')} K/uL
 ▪️ Creatinin: {patient.get('creatinin', 'N/A')} μmol/L
 ▪️ eGFR: {patient.get('egfr', 'N/A')} mL/min"""
-                
-                return result
-            else:
-                available_ids = [p.get("id") for p in YTE_DATA]
-                return f"❌ Không tìm thấy bệnh nhân ID {patient_id}\n📋 ID có sẵn: {available_ids}"
-        else:
-            # Liệt kê tất cả bệnh nhân
-            result = f"""👥 DANH SÁCH BỆNH NHÂN (OK-2.csv)
-
-📋 {total_patients} BỆNH NHÂN SỎI THẬN PCNL:"""
-            
-            for patient in YTE_DATA:
-                result += f"\n▪️ ID {patient.get('id')}: {patient.get('gender')} {patient.get('age')} tuổi - {patient.get('stone_type', 'N/A')}"
-                
-            return result
-    
-    # Phân tích phẫu thuật
-    elif any(keyword in query_lower for keyword in ["phẫu thuật", "pt", "surgery", "phau thuat"]):
-        surgery_results = {}
-        surgery_times = []
-        complications = []
-        
-        for patient in YTE_DATA:
-            # Kết quả PT
-            result = patient.get('surgery_result', 'Không xác định')
-            surgery_results[result] = surgery_results.get(result, 0) + 1
-            
-            # Thời gian PT
-            if patient.get('surgery_time_minutes'):
-                surgery_times.append(patient.get('surgery_time_minutes'))
-            
-            # Biến chứng
-            if patient.get('complications'):
-                complications.append(patient.get('complications'))
-        
-        avg_time = sum(surgery_times) / len(surgery_times) if surgery_times else 0
-        
-        result = f"""⚕️ PHÂN TÍCH PHẪU THUẬT PCNL (OK-2.csv)
-
-🎯 KẾT QUẢ PHẪU THUẬT:"""
-        
-        for surg_result, count in surgery_results.items():
-            percentage = (count / total_patients) * 100
-            result += f"\n▪️ {surg_result}: {count} ca ({percentage:.1f}%)"
-        
-        result += f"""\n\n⏱️ THỜI GIAN PHẪU THUẬT:
-▪️ Thời gian TB: {avg_time:.1f} phút
-▪️ Thời gian ngắn nhất: {min(surgery_times) if surgery_times else 'N/A'} phút
-▪️ Thời gian dài nhất: {max(surgery_times) if surgery_times else 'N/A'} phút
+
+
+def _format_patient_miss(miss: Dict[str, Any]) -> str:
+    """Thông báo không tìm thấy ID kèm gợi ý giới hạn các ID gần nhất"""
+    id_range = f"{miss['id_range'][0]}-{miss['id_range'][1]}" if miss['id_range'] else "N/A"
+    return (f"❌ Không tìm thấy bệnh nhân ID {miss['id']}\n"
+            f"📋 ID gần nhất: {miss['nearest']} (tổng {miss['total']} bệnh nhân, ID {id_range})")
+
+
+def _summary_overview(store: PatientStore, stats: CohortStats, rows: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Số liệu thống kê tổng quan"""
+    return {
+        'gender': {'Nam': stats.gender.get('Nam', 0), 'Nữ': stats.gender.get('Nữ', 0)},
+        'age': _stat_summary(stats.age),
+        # Phân tích kết quả phẫu thuật
+        'stone_free': sum(count for label, count in stats.surgery_result.items() if "Có" in label),
+        'residual': sum(count for label, count in stats.surgery_result.items() if "Sót" in label),
+    }
+
+
+def _render_overview(summary: Dict[str, Any]) -> str:
+    """Báo cáo thống kê tổng quan"""
+    total_patients = summary['total']
+
+    male_count = summary['gender']['Nam']
+    female_count = summary['gender']['Nữ']
+
+    ages = summary['age']
+    sach_soi = summary['stone_free']
+    sot_soi = summary['residual']
+
+    # Tính tỷ lệ Nam/Nữ an toàn
+    ratio_text = f"{male_count/female_count:.1f}:1" if female_count > 0 else f"{male_count}:0"
+
+    parts = [f"""🏥 THỐNG KÊ TỔNG QUAN Y TẾ (Dữ liệu OK-2.csv)
+
+📊 TỔNG SỐ BỆNH NHÂN: {total_patients}
+
+👫 PHÂN BỐ GIỚI TÍNH:
+▪️ Nam: {male_count} bệnh nhân ({male_count/total_patients*100:.1f}%)
+▪️ Nữ: {female_count} bệnh nhân ({female_count/total_patients*100:.1f}%)
+▪️ Tỷ lệ Nam/Nữ: {ratio_text}
+
+📈 THÔNG TIN TUỔI:
+▪️ Tuổi trung bình: {ages['mean']:.1f} tuổi"""]
+
+    if ages['count']:
+        parts.append(f"""
+▪️ Tuổi thấp nhất: {ages['min']} tuổi
+▪️ Tuổi cao nhất: {ages['max']} tuổi""")
+
+    parts.append(f"""
+
+🎯 KẾT QUẢ PHẪU THUẬT PCNL:
+▪️ Sạch sỏi: {sach_soi} ca ({sach_soi/total_patients*100:.1f}%)
+▪️ Sót sỏi: {sot_soi} ca ({sot_soi/total_patients*100:.1f}%)
+
+📅 Dữ liệu: Train từ OK-2.csv - {total_patients} bệnh nhân sỏi thận PCNL""")
+
+    return "".join(parts)
+
+
+def _summary_gender(store: PatientStore, stats: CohortStats, rows: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Số liệu theo giới tính: số ca và tuổi trung bình"""
+    groups = {}
+    for label in ('Nam', 'Nữ'):
+        groups[label] = {
+            'count': stats.gender.get(label, 0),
+            'age_mean': stats.age_by_gender[label].mean if label in stats.age_by_gender else 0,
+        }
+    return {'groups': groups}
+
+
+def _render_gender(summary: Dict[str, Any]) -> str:
+    """Báo cáo phân tích giới tính"""
+    total_patients = summary['total']
+    male, female = summary['groups']['Nam'], summary['groups']['Nữ']
+    male_total, female_total = male['count'], female['count']
+    male_avg, female_avg = male['age_mean'], female['age_mean']
+
+    # Tính tỷ lệ Nam/Nữ an toàn
+    gender_ratio = f"{male_total/female_total:.1f}:1" if female_total > 0 else f"{male_total}:0"
+
+    return f"""👫 PHÂN TÍCH GIỚI TÍNH (Dữ liệu OK-2.csv)
+
+👨 NAM GIỚI: {male_total} bệnh nhân
+▪️ Tuổi trung bình: {male_avg:.1f} tuổi
+▪️ Danh sách ID: {_list_hint(male_total, 'danh sách bệnh nhân nam')}
+▪️ Chiếm tỷ lệ: {male_total/total_patients*100:.1f}%
+
+👩 NỮ GIỚI: {female_total} bệnh nhân
+▪️ Tuổi trung bình: {female_avg:.1f} tuổi
+▪️ Danh sách ID: {_list_hint(female_total, 'danh sách bệnh nhân nữ')}
+▪️ Chiếm tỷ lệ: {female_total/total_patients*100:.1f}%
+
+📊 SO SÁNH:
+▪️ Tỷ lệ Nam/Nữ: {gender_ratio}
+▪️ Chênh lệch tuổi TB: {abs(male_avg - female_avg):.1f} tuổi"""
+
+
+def _summary_stone(store: PatientStore, stats: CohortStats, rows: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Số ca theo loại sỏi, sắp xếp giảm dần"""
+    return {'stone_types': dict(sorted(stats.stone_type.items(), key=lambda x: x[1], reverse=True))}
+
+
+def _render_stone(summary: Dict[str, Any]) -> str:
+    """Báo cáo phân tích loại sỏi"""
+    total_patients = summary['total']
+    stone_types = summary['stone_types']
+
+    lines = ["🪨 PHÂN TÍCH LOẠI SỎI (Dữ liệu OK-2.csv)\n\n📊 PHÂN LOẠI SỎI THẬN:"]
+    for stone_type, count in stone_types.items():
+        percentage = (count / total_patients) * 100
+        lines.append(f"▪️ {stone_type}: {count} ca ({percentage:.1f}%)")
+
+    most_common = max(stone_types.items(), key=lambda x: x[1]) if stone_types else ("N/A", 0)
+
+    lines.append(f"""
+📈 THỐNG KÊ SỎI:
+▪️ Tổng số loại: {len(stone_types)} loại khác nhau
+▪️ Phổ biến nhất: {most_common[0]} ({most_common[1]} ca)
+▪️ Đa dạng: {len(stone_types)/total_patients*100:.1f}% tỷ lệ đa dạng loại sỏi""")
+
+    return "\n".join(lines)
+
+
+def _summary_surgery(store: PatientStore, stats: CohortStats, rows: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Số liệu phẫu thuật: kết quả, thời gian mổ, biến chứng"""
+    surgery_results = dict(stats.surgery_result)
+    if stats.surgery_result_missing:
+        surgery_results[UNKNOWN_GROUP] = stats.surgery_result_missing
+    return {
+        'surgery_result': surgery_results,
+        'surgery_time': _stat_summary(stats.surgery_time),
+        'complications': stats.complications,
+    }
+
+
+def _render_surgery(summary: Dict[str, Any]) -> str:
+    """Báo cáo phân tích phẫu thuật PCNL"""
+    total_patients = summary['total']
+    surgery_times = summary['surgery_time']
+    complication_count = summary['complications']
+
+    lines = ["⚕️ PHÂN TÍCH PHẪU THUẬT PCNL (OK-2.csv)\n\n🎯 KẾT QUẢ PHẪU THUẬT:"]
+    for surg_result, count in summary['surgery_result'].items():
+        percentage = (count / total_patients) * 100
+        lines.append(f"▪️ {surg_result}: {count} ca ({percentage:.1f}%)")
+
+    lines.append(f"""
+⏱️ THỜI GIAN PHẪU THUẬT:
+▪️ Thời gian TB: {surgery_times['mean']:.1f} phút
+▪️ Thời gian ngắn nhất: {surgery_times['min'] if surgery_times['count'] else 'N/A'} phút
+▪️ Thời gian dài nhất: {surgery_times['max'] if surgery_times['count'] else 'N/A'} phút
 
 🚨 BIẾN CHỨNG:
-▪️ Có biến chứng: {len([c for c in complications if c])} ca
-▪️ Không biến chứng: {total_patients - len([c for c in complications if c])} ca
-▪️ Tỷ lệ an toàn: {((total_patients - len([c for c in complications if c]))/total_patients*100):.1f}%"""
-        
-        return result
-    
-    # BMI analysis
-    elif any(keyword in query_lower for keyword in ["bmi", "cân nặng", "béo phì", "can nang"]):
-        bmis = []
-        heights = []
-        weights = []
-        
-        for patient in YTE_DATA:
-            if patient.get('height') and patient.get('weight'):
-                height_m = patient.get('height') / 100
-                weight_kg = patient.get('weight')
-                bmi = weight_kg / (height_m ** 2)
-                bmis.append(bmi)
-                heights.append(patient.get('height'))
-                weights.append(patient.get('weight'))
-        
-        if bmis:
-            avg_bmi = sum(bmis) / len(bmis)
-            avg_height = sum(heights) / len(heights)
-            avg_weight = sum(weights) / len(weights)
-            
-            # Phân loại BMI
-            underweight = len([b for b in bmis if b < 18.5])
-            normal = len([b for b in bmis if 18.5 <= b < 25])
-            overweight = len([b for b in bmis if 25 <= b < 30])
-            obese = len([b for b in bmis if b >= 30])
-            
-            result = f"""⚖️ PHÂN TÍCH BMI VÀ CÂN NẶNG (OK-2.csv)
+▪️ Có biến chứng: {complication_count} ca
+▪️ Không biến chứng: {total_patients - complication_count} ca
+▪️ Tỷ lệ an toàn: {((total_patients - complication_count)/total_patients*100):.1f}%""")
+
+    return "\n".join(lines)
+
+
+BMI_CLASSES = ('underweight', 'normal', 'overweight', 'obese')
+
+
+def _summary_bmi(store: PatientStore, stats: CohortStats, rows: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Số liệu BMI: trung bình, chiều cao/cân nặng TB và phân loại WHO"""
+    return {
+        'bmi': _stat_summary(stats.bmi),
+        'height_mean': stats.height.mean,
+        'weight_mean': stats.weight.mean,
+        'bmi_classes': dict(zip(BMI_CLASSES, stats.bmi_classes)),
+    }
+
+
+def _render_bmi(summary: Dict[str, Any]) -> str:
+    """Báo cáo phân tích BMI và cân nặng"""
+    bmis = summary['bmi']
+    if not bmis['count']:
+        return "❌ Không có đủ dữ liệu chiều cao/cân nặng để tính BMI"
+
+    # Phân loại BMI
+    underweight, normal, overweight, obese = (summary['bmi_classes'][name] for name in BMI_CLASSES)
+    bmi_count = bmis['count']
+    most = max(underweight, normal, overweight, obese)
+
+    return f"""⚖️ PHÂN TÍCH BMI VÀ CÂN NẶNG (OK-2.csv)
 
 📊 THỐNG KÊ CHUNG:
-▪️ BMI trung bình: {avg_bmi:.1f}
-▪️ Chiều cao TB: {avg_height:.1f} cm
-▪️ Cân nặng TB: {avg_weight:.1f} kg
+▪️ BMI trung bình: {bmis['mean']:.1f}
+▪️ Chiều cao TB: {summary['height_mean']:.1f} cm
+▪️ Cân nặng TB: {summary['weight_mean']:.1f} kg
 
 📈 PHÂN LOẠI BMI (WHO):
-▪️ Thiếu cân (<18.5): {underweight} ca ({underweight/len(bmis)*100:.1f}%)
-▪️ Bình thường (18.5-24.9): {normal} ca ({normal/len(bmis)*100:.1f}%)
-▪️ Thừa cân (25-29.9): {overweight} ca ({overweight/len(bmis)*100:.1f}%)
-▪️ Béo phì (≥30): {obese} ca ({obese/len(bmis)*100:.1f}%)
+▪️ Thiếu cân (<18.5): {underweight} ca ({underweight/bmi_count*100:.1f}%)
+▪️ Bình thường (18.5-24.9): {normal} ca ({normal/bmi_count*100:.1f}%)
+▪️ Thừa cân (25-29.9): {overweight} ca ({overweight/bmi_count*100:.1f}%)
+▪️ Béo phì (≥30): {obese} ca ({obese/bmi_count*100:.1f}%)
 
 💡 NHẬN XÉT:
-▪️ Phần lớn bệnh nhân có BMI: {"Bình thường" if normal == max(underweight, normal, overweight, obese) else "Thừa cân" if overweight == max(underweight, normal, overweight, obese) else "Béo phì" if obese == max(underweight, normal, overweight, obese) else "Thiếu cân"}
-▪️ Tỷ lệ thừa cân + béo phì: {(overweight + obese)/len(bmis)*100:.1f}%"""
-            
-            return result
+▪️ Phần lớn bệnh nhân có BMI: {"Bình thường" if normal == most else "Thừa cân" if overweight == most else "Béo phì" if obese == most else "Thiếu cân"}
+▪️ Tỷ lệ thừa cân + béo phì: {(overweight + obese)/bmi_count*100:.1f}%"""
+
+
+_SUMMARIES = {
+    'overview': _summary_overview,
+    'gender': _summary_gender,
+    'stone': _summary_stone,
+    'surgery': _summary_surgery,
+    'bmi': _summary_bmi,
+}
+_RENDERERS = {
+    'overview': _render_overview,
+    'gender': _render_gender,
+    'stone': _render_stone,
+    'surgery': _render_surgery,
+    'bmi': _render_bmi,
+}
+
+
+def _analyze(store: PatientStore, query: str, cursor: str = '',
+             match: Optional[IntentResult] = None) -> Dict[str, Any]:
+    """Kết quả có cấu trúc cho câu hỏi: intent, bộ lọc và số liệu (chưa trình bày)"""
+    match = match or _dispatch(query)
+    payload = {'status': 'success', 'query': query, 'intent': match.intent, 'filters': dict(match.filters)}
+
+    # Phân tích tổng hợp (tổng quan, giới tính, sỏi, phẫu thuật, BMI), áp dụng bộ lọc tuổi/giới tính nếu có
+    if match.intent in _SUMMARIES:
+        payload['result'] = _cached_summary(match.intent, store, match.filters)
+
+    # Chi tiết bệnh nhân theo ID, hoặc danh sách bệnh nhân (theo bộ lọc nếu có) phân trang bằng cursor
+    elif match.intent == 'patient':
+        if match.ids:
+            with telemetry.span('aggregate', intent='patient'):
+                payload['result'] = _patient_details(store, match.ids)
         else:
-            return "❌ Không có đủ dữ liệu chiều cao/cân nặng để tính BMI"
-    
+            try:
+                with telemetry.span('aggregate', intent='patient'):
+                    payload['result'] = _patient_list_page(store, match.filters, cursor)
+            except ValueError as e:
+                return {'status': 'error', 'error_message': str(e)}
+
     # Tìm kiếm chung
     else:
-        result = f"""🔍 TÌM KIẾM Y TẾ: "{query}"
+        payload['result'] = {'total_patients': len(store), 'analyses': list(_SUMMARIES) + ['patient']}
+    return payload
+
+
+def render_result(payload: Dict[str, Any]) -> str:
+    """Trình bày kết quả của yte_result() thành văn bản như yte()"""
+    with telemetry.span('render', intent=payload.get('intent', '')):
+        return _render_payload(payload)
+
+
+def _render_payload(payload: Dict[str, Any]) -> str:
+    if payload['status'] != 'success':
+        return f"❌ {payload['error_message']}"
+    intent, result = payload['intent'], payload['result']
+    if intent in _RENDERERS:
+        return render_summary(result)
+    if intent == 'patient':
+        if 'next_cursor' in result:
+            return _render_patient_list(payload['query'], payload['filters'], result)
+        return _render_patient_details(result)
+    return _render_help(payload['query'], result['total_patients'])
+
+
+def _render_help(query: str, total_patients: int) -> str:
+    return f"""🔍 TÌM KIẾM Y TẾ: "{query}"
 
 📊 DỮ LIỆU CÓ SẴN (OK-2.csv):
 ▪️ {total_patients} bệnh nhân sỏi thận PCNL
@@ -369,18 +2561,103 @@ def yte(query: str) -> str:
 ▪️ yte("phân tích giới tính")
 ▪️ yte("bệnh nhân ID 1")
 ▪️ yte("loại sỏi phổ biến")"""
-        
-        return result
 
+
+def _compact(value):
+    """Làm tròn số thực (2 chữ số) để kết quả gửi cho model gọn hơn"""
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, dict):
+        return {key: _compact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_compact(item) for item in value]
+    return value
+
+
+def _dispatch(query: str) -> IntentResult:
+    """Phân loại câu hỏi và gắn intent vào span của tool đang chạy"""
+    with telemetry.span('dispatch'):
+        match = classify_intent(query)
+    telemetry.current_span().set_attribute('intent', match.intent or 'help')
+    return match
+
+
+@traced()
+def yte_result(query: str, cursor: str = '') -> dict:
+    """Tool Y Tế dạng có cấu trúc - số liệu phân tích bệnh nhân sỏi thận từ OK-2.csv (không kèm văn bản trình bày).
+
+    Args:
+        query (str): Câu hỏi phân tích y tế
+        cursor (str): Cursor trang tiếp theo của danh sách bệnh nhân (để trống cho trang đầu)
+
+    Returns:
+        dict: status, intent, filters và result (số liệu), hoặc error_message.
+    """
+    telemetry.log.debug("🏥 YTE Tool Call: yte_result(query=%r)", query)
+
+    store = get_store()
+    if not store:
+        return {"status": "error", "error_message": "Không có dữ liệu y tế để phân tích"}
+    payload = _analyze(store, query, cursor)
+    payload.pop('query', None)
+    result = payload.get('result')
+    if payload.get('intent') in _SUMMARIES:
+        # intent/bộ lọc đã có ở ngoài, không lặp lại trong result
+        payload['result'] = {key: value for key, value in result.items() if key not in ('intent', 'filters')}
+    elif result is not None and 'next_cursor' not in result and 'patients' in result:
+        # Bản ghi chi tiết: bỏ các trường trống
+        payload['result'] = {'patients': [
+            {**p, 'record': {k: v for k, v in p['record'].items() if v not in (None, '')}} if p['found'] else p
+            for p in result['patients']]}
+    return _compact(payload)
+
+
+@traced()
+def yte(query: str, cursor: str = '') -> str:
+    """
+    Tool Y Tế - Phân tích dữ liệu bệnh nhân sỏi thận từ OK-2.csv
+
+    Args:
+        query (str): Câu hỏi phân tích y tế
+        cursor (str): Cursor trang tiếp theo của kết quả dạng danh sách (để trống cho trang đầu)
+
+    Returns:
+        str: Kết quả phân tích dữ liệu y tế
+    """
+    telemetry.log.debug("🏥 YTE Tool Call: yte(query=%r)", query)
+
+    store = get_store()
+    if not store:
+        return "❌ Không có dữ liệu y tế để phân tích"
+
+    # Báo cáo tổng hợp lấy thẳng văn bản đã cache; các nhánh khác tính rồi trình bày
+    match = _dispatch(query)
+    if match.intent in _RENDERERS:
+        return _cached_report(match.intent, store, match.filters)
+    return render_result(_analyze(store, query, cursor, match))
+
+
+def _describe_version(store: Optional[PatientStore]) -> str:
+    if store is None:
+        return "chưa có"
+    loaded_at = datetime.fromtimestamp(store.loaded_at).strftime('%Y-%m-%d %H:%M:%S')
+    watching = f", tự load lại mỗi {RELOAD_INTERVAL:g}s" if RELOAD_INTERVAL > 0 else ""
+    return f"{store.version} (load lúc {loaded_at}{watching})"
+
+
+@traced()
 def yte_info() -> str:
     """Thông tin về tool y tế"""
+    store = get_store()
     return f"""🏥 YTE TOOL - PHÂN TÍCH Y TẾ
 
 📊 DỮ LIỆU:
-▪️ Nguồn: OK-2.csv
-▪️ Số bệnh nhân: {len(YTE_DATA)}
+▪️ Nguồn: {os.path.basename(get_data_path())}
+▪️ Số bệnh nhân: {len(store) if store is not None else 0}
 ▪️ Loại bệnh: Sỏi thận PCNL
 ▪️ Cột dữ liệu: 107 cột
+▪️ Ô số không parse được: {sum(_quality_failures(store).values()) if store is not None else 0}
+▪️ Phiên bản dữ liệu: {_describe_version(store)}
 
 🔧 CHỨC NĂNG:
 ▪️ Thống kê tổng quan
@@ -395,8 +2672,289 @@ yte("câu hỏi phân tích y tế")
 
 💡 Tool chuyên biệt cho phân tích dữ liệu y tế từ OK-2.csv"""
 
+
+# Phiên bản bất đồng bộ cho event loop của agent: phân tích chạy trong pool luồng
+# giới hạn, các lời gọi giống hệt nhau đang chạy được gộp thành một lần tính.
+# Các tool bọc giữ nguyên tên hàm gốc (yte, yte_result, yte_info, yte_query) khi đăng ký với agent.
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_inflight: Dict[Any, "asyncio.Future"] = {}
+_inflight_waiters: Dict[Any, int] = {}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(ASYNC_WORKERS, 1),
+                                               thread_name_prefix='yte')
+    return _executor
+
+
+def shutdown_executor(wait: bool = True):
+    """Dừng pool luồng của các tool bất đồng bộ (pool mới sẽ được tạo khi cần)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+async def call_async(func, *args, timeout: Optional[float] = None):
+    """Chạy `func(*args)` trong pool luồng mà không chặn event loop
+
+    Các lời gọi đồng thời cùng hàm, cùng tham số và cùng phiên bản dữ liệu dùng
+    chung một lần tính. Hủy hoặc hết `timeout` (mặc định ASYNC_TIMEOUT, 0 = không
+    giới hạn) chỉ bỏ lời gọi hiện tại; phần tính toán chỉ bị hủy khi không còn
+    ai chờ và nó chưa bắt đầu chạy. Hết thời gian thì ném asyncio.TimeoutError.
+    """
+    loop = asyncio.get_running_loop()
+    key = (loop, func, args, _dataset_version)
+    future = _inflight.get(key)
+    if future is None:
+        # Chạy trong bản sao context để span của lời gọi nối vào span của người gọi
+        future = loop.run_in_executor(_get_executor(), contextvars.copy_context().run, func, *args)
+        _inflight[key] = future
+        _inflight_waiters[key] = 0
+        future.add_done_callback(lambda _: _forget_inflight(key, future))
+    _inflight_waiters[key] += 1
+
+    timeout = ASYNC_TIMEOUT if timeout is None else timeout
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout or None)
+    finally:
+        if _inflight.get(key) is future:
+            _inflight_waiters[key] -= 1
+            if not _inflight_waiters[key]:
+                future.cancel()
+
+
+def _forget_inflight(key, future):
+    if _inflight.get(key) is future:
+        del _inflight[key]
+        del _inflight_waiters[key]
+
+
+def _async_tool(func, on_timeout):
+    """Bọc một tool đồng bộ thành coroutine cùng tên, docstring và tham số (cho ADK)"""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def tool(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        try:
+            return await call_async(func, *bound.args)
+        except asyncio.TimeoutError:
+            return on_timeout()
+    return tool
+
+
+def _timeout_message(action: str) -> str:
+    return f"⏱️ {action} quá thời gian chờ ({ASYNC_TIMEOUT:g}s), vui lòng thử lại"
+
+
+yte_async = _async_tool(yte, lambda: _timeout_message("Phân tích y tế"))
+yte_info_async = _async_tool(yte_info, lambda: _timeout_message("Lấy thông tin tool y tế"))
+yte_result_async = _async_tool(yte_result, lambda: {"status": "error",
+                                                    "error_message": _timeout_message("Phân tích y tế")})
+yte_query_async = _async_tool(yte_query, lambda: {"status": "error",
+                                                  "error_message": _timeout_message("Truy vấn y tế")})
+
+# Báo cáo hàng loạt: nhiều phân tích × nhiều nhóm (bệnh viện/nguồn, tháng) trong một lượt.
+# Mỗi dòng được gán mã nhóm một lần (từ mã từ điển sẵn có, không parse lại ngày), các dòng
+# được sắp theo mã nhóm một lần, rồi mỗi nhóm chỉ quét các dòng của nó một lần cho mọi phân tích.
+def _month_codes(store: PatientStore, date_field: str, rows=slice(None)):
+    """Mã tháng (YYYY-MM) theo từng dòng, tính trên từ điển ngày thay vì từng dòng"""
+    category_days = store.index.category_days[date_field]
+    months = [date.fromordinal(int(day)).strftime('%Y-%m') if not np.isnan(day) else UNKNOWN_GROUP
+              for day in category_days]
+    labels = sorted(set(months) - {UNKNOWN_GROUP}) + [UNKNOWN_GROUP]
+    position = {label: code for code, label in enumerate(labels)}
+    remap = np.array([position[month] for month in months] + [position[UNKNOWN_GROUP]], dtype=np.int32)
+    return remap[store.codes[date_field][rows]], labels
+
+
+def _band_labels(bins) -> List[str]:
+    """Nhãn các khoảng chia bởi ngưỡng nguyên `bins`: '<30', '30-39', ..., '≥70'"""
+    return ([f"<{bins[0]:g}"] + [f"{low:g}-{high - 1:g}" for low, high in zip(bins, bins[1:])]
+            + [f"≥{bins[-1]:g}"])
+
+
+def _band_codes(values: np.ndarray, bins, labels: List[str]):
+    """Mã khoảng theo ngưỡng `bins`; giá trị thiếu (NaN) vào nhóm 'Không xác định' cuối cùng"""
+    codes = np.searchsorted(bins, values, side='right')
+    codes[np.isnan(values)] = len(labels)
+    return codes, list(labels) + [UNKNOWN_GROUP]
+
+
+def _partition_codes(store: PatientStore, field: str, date_field: str, rows=slice(None)):
+    """Mã nhóm theo từng dòng (của `rows`) và nhãn (nhóm 'Không xác định' cuối cùng) của một trường GROUP_BY_FIELDS"""
+    if field == 'month':
+        return _month_codes(store, date_field, rows)
+    if field == 'age_band':
+        return _band_codes(store.numeric['age'][rows], AGE_BANDS, _band_labels(AGE_BANDS))
+    if field == 'hu_band':
+        return _band_codes(store.numeric['hu'][rows], HU_BANDS, _band_labels(HU_BANDS))
+    if field == 'bmi_class':
+        bmi = store.numeric['bmi'][rows]
+        return _band_codes(np.where(_nonzero(bmi), bmi, np.nan), BMI_BINS, BMI_CLASSES)
+    if field == 'complications':
+        # Cùng quy ước với CohortStats: có ghi chú biến chứng là có biến chứng
+        return np.where(store.codes['complications'][rows] >= 0, 0, 1), ['Có', 'Không', UNKNOWN_GROUP]
+    if field not in POSTING_FIELDS:
+        raise ValueError(f"Không thể chia nhóm theo '{field}'. Chọn trong: {', '.join(GROUP_BY_FIELDS)}")
+    labels = store.categories[field] + [UNKNOWN_GROUP]
+    codes = store.codes[field][rows]
+    return np.where(codes >= 0, codes, len(labels) - 1), labels
+
+
+def plan_partitions(store: PatientStore, partition_by=PARTITION_FIELDS,
+                    date_field: str = 'surgery_date') -> List[tuple]:
+    """Các nhóm (nhãn theo từng chiều, các dòng) khác rỗng, theo thứ tự nhãn"""
+    if not partition_by:
+        return [({}, np.arange(len(store)))]
+    columns = [_partition_codes(store, field, date_field) for field in partition_by]
+    keys = np.ravel_multi_index([codes for codes, _ in columns], [len(labels) for _, labels in columns])
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+    partitions = []
+    for rows in np.split(order, bounds):
+        if not rows.size:
+            continue
+        position = np.unravel_index(keys[rows[0]], [len(labels) for _, labels in columns])
+        partition = {field: labels[code] for field, (_, labels), code in zip(partition_by, columns, position)}
+        partitions.append((partition, np.sort(rows)))
+    return partitions
+
+
+def run_batch(analyses: Optional[List[str]] = None, partition_by=PARTITION_FIELDS,
+              date_field: str = 'surgery_date', store: Optional[PatientStore] = None,
+              workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Chạy nhiều phân tích trên từng nhóm dữ liệu, các nhóm xử lý song song
+
+    Trả về danh sách {partition, total, summaries} theo thứ tự nhóm; `summaries`
+    chứa số liệu (như compute_summary) của từng phân tích.
+    """
+    store = store if store is not None else get_store()
+    if store is None:
+        raise RuntimeError("Không có dữ liệu y tế để phân tích")
+    analyses = list(analyses or _SUMMARIES)
+    unknown = [intent for intent in analyses if intent not in _SUMMARIES]
+    if unknown:
+        raise ValueError(f"Phân tích không hỗ trợ: {', '.join(unknown)}. Chọn trong: {', '.join(_SUMMARIES)}")
+
+    partitions = plan_partitions(store, partition_by, date_field)
+
+    def run(context, partition):
+        labels, rows = partition
+        with telemetry.span('aggregate', partition=_describe_partition(labels), rows=int(rows.size)):
+            summaries = _summaries_for(store, analyses, rows)
+        return {'partition': labels, 'total': int(rows.size), 'summaries': summaries}
+
+    # Mỗi nhóm chạy trong bản sao context riêng để span nối vào span 'batch'
+    with telemetry.span('batch', analyses=','.join(analyses), partitions=len(partitions)):
+        contexts = [contextvars.copy_context() for _ in partitions]
+        workers = min(len(partitions), workers or BATCH_WORKERS or os.cpu_count() or 1)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='yte-batch') as pool:
+                return list(pool.map(lambda context, partition: context.run(run, context, partition),
+                                     contexts, partitions))
+        return [context.run(run, context, partition) for context, partition in zip(contexts, partitions)]
+
+
+def _describe_partition(partition: Dict[str, str]) -> str:
+    return ', '.join(f"{field}={label}" for field, label in partition.items()) or 'toàn bộ dữ liệu'
+
+
+def write_batch_reports(results: List[Dict[str, Any]], out_dir: str, prefix: str = 'yte_reports') -> List[str]:
+    """Ghi toàn bộ kết quả hàng loạt: một file JSON (số liệu) và một file văn bản (báo cáo)"""
+    os.makedirs(out_dir, exist_ok=True)
+    json_path = os.path.join(out_dir, f'{prefix}.json')
+    text_path = os.path.join(out_dir, f'{prefix}.txt')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(_compact(results), f, ensure_ascii=False, indent=2)
+
+    sections = []
+    for result in results:
+        sections.append(f"{'=' * 50}\n📂 {_describe_partition(result['partition'])} ({result['total']} bệnh nhân)\n{'=' * 50}")
+        sections.extend(render_summary(summary) for summary in result['summaries'].values())
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write("\n\n".join(sections) + "\n")
+    return [json_path, text_path]
+
+
+def _split_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Tool Y Tế - phân tích dữ liệu bệnh nhân sỏi thận")
+    parser.add_argument('--telemetry', metavar='DIR',
+                        help="Bật telemetry và ghi spans.json (OTLP/JSON), metrics.prom vào DIR khi xong")
+    parser.add_argument('--profile', type=float, metavar='GIÂY', default=0,
+                        help="Chạy profiler lấy mẫu với chu kỳ này (cần --telemetry), ghi profile.folded")
+    commands = parser.add_subparsers(dest='command')
+    batch_parser = commands.add_parser('batch', help="Chạy nhiều phân tích × nhóm trong một lượt và ghi báo cáo")
+    batch_parser.add_argument('--csv', help="File/thư mục/glob CSV (mặc định như yte())")
+    batch_parser.add_argument('--analyses', type=_split_list, default=list(_SUMMARIES),
+                              help=f"Các phân tích, cách nhau bởi dấu phẩy ({','.join(_SUMMARIES)})")
+    batch_parser.add_argument('--by', type=_split_list, default=list(PARTITION_FIELDS),
+                              help="Các chiều chia nhóm, trong: " + ', '.join(GROUP_BY_FIELDS) + " (rỗng = toàn bộ)")
+    batch_parser.add_argument('--date-field', default='surgery_date', choices=DATE_FIELDS,
+                              help="Cột ngày dùng cho chiều month")
+    batch_parser.add_argument('--out', default='reports', help="Thư mục ghi báo cáo")
+    batch_parser.add_argument('--workers', type=int, default=None, help="Số luồng xử lý các nhóm")
+    quality_parser = commands.add_parser('quality', help="In báo cáo chất lượng dữ liệu (ô thiếu/lỗi parse theo cột)")
+    quality_parser.add_argument('--csv', help="File/thư mục/glob CSV (mặc định như yte())")
+    args = parser.parse_args(argv)
+
+    # CLI: log trạng thái (load dữ liệu, cảnh báo) in ra màn hình như trước
+    if not telemetry.log.handlers:
+        logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
+    if not args.telemetry:
+        return _run_command(args)
+    telemetry.enable()
+    if args.profile > 0:
+        telemetry.start_profiler(args.profile)
+    try:
+        return _run_command(args)
+    finally:
+        telemetry.stop_profiler()
+        for path in telemetry.write_exports(args.telemetry):
+            print(f"📈 {path}")
+
+
+def _run_command(args) -> int:
+    if args.command == 'quality':
+        if args.csv:
+            set_data_path(args.csv)
+        print(data_quality_report())
+        return 0
+
+    if args.command != 'batch':
+        print(yte_info())
+        print("\n" + "="*50)
+        print("🧪 Test YTE Tool:")
+        print(yte("tổng quan bệnh nhân"))
+        return 0
+
+    if args.csv:
+        set_data_path(args.csv)
+    start = time.perf_counter()
+    try:
+        results = run_batch(args.analyses, args.by, args.date_field, workers=args.workers)
+    except (RuntimeError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    paths = write_batch_reports(results, args.out)
+    print(f"✅ {len(args.analyses)} phân tích × {len(results)} nhóm trong {time.perf_counter() - start:.2f}s")
+    for path in paths:
+        print(f"📄 {path}")
+    return 0
+
+
 if __name__ == "__main__":
-    print(yte_info())
-    print("\n" + "="*50)
-    print("🧪 Test YTE Tool:")
-    print(yte("tổng quan bệnh nhân"))
+    raise SystemExit(main())